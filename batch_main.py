@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import json
+import sys
+import os
+from dotenv import load_dotenv
+from contextlib import AsyncExitStack
+
+from mcp_client import MCPClient
+from core.registry import create_provider
+from core.scheduler import ModelCallScheduler
+from core.batch import BatchRunner
+
+load_dotenv()
+
+# Gemini Configuration
+gemini_model = os.getenv("GEMINI_MODEL", "")
+google_api_key = os.getenv("GOOGLE_API_KEY", "")
+
+# Validate Gemini configuration
+if not gemini_model:
+    raise ValueError("Error: GEMINI_MODEL cannot be empty. Update .env file")
+if not google_api_key:
+    raise ValueError("Error: GOOGLE_API_KEY cannot be empty. Update .env file")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Run a JSONL file of queries through the agent"
+    )
+    parser.add_argument("input", help='JSONL file with one {"id": ..., "query": ...} per line')
+    parser.add_argument("output", help="JSONL file results are appended to; rerunning resumes from it")
+    parser.add_argument("--concurrency", type=int, default=8, help="Queries in flight at once")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+
+    scheduler = ModelCallScheduler(
+        requests_per_minute=float(os.getenv("GEMINI_RPM", "0")) or None,
+        tokens_per_minute=float(os.getenv("GEMINI_TPM", "0")) or None,
+        timeout=float(os.getenv("GEMINI_TIMEOUT", "0")) or None,
+    )
+    command, server_args = (
+        ("uv", ["run", "mcp_server.py"])
+        if os.getenv("USE_UV", "0") == "1"
+        else ("python", ["mcp_server.py"])
+    )
+
+    # Import the SDK and build the client while the MCP server is spawned
+    ai_service_task = asyncio.create_task(
+        asyncio.to_thread(
+            create_provider, "gemini", model=gemini_model, scheduler=scheduler
+        )
+    )
+
+    async with AsyncExitStack() as stack:
+        mcp_client = await stack.enter_async_context(
+            MCPClient(command=command, args=server_args)
+        )
+        ai_service_instance = await ai_service_task
+
+        runner = BatchRunner(
+            ai_service_instance, mcp_client, concurrency=args.concurrency
+        )
+        summary = await runner.run(args.input, args.output)
+        print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    asyncio.run(main())
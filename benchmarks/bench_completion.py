@@ -0,0 +1,68 @@
+# Run from the project root: python -m benchmarks.bench_completion
+import random
+import string
+import sys
+import time
+
+from prompt_toolkit.completion import CompleteEvent
+from prompt_toolkit.document import Document
+
+from core.cli import UnifiedCompleter
+
+# Average completion time per keystroke must stay under this budget
+BUDGET_MS = 1.0
+CATALOG_SIZE = 100_000
+REPEAT = 50
+
+TYPED = ["@report.pdf", "@rpt", "@zzzq", "/summarize rep"]
+
+
+def make_catalog(size: int) -> list[str]:
+    rng = random.Random(0)
+    extensions = [".md", ".pdf", ".docx", ".txt"]
+    return [
+        "".join(rng.choices(string.ascii_lowercase + "_", k=rng.randint(6, 24)))
+        + rng.choice(extensions)
+        for _ in range(size)
+    ]
+
+
+def time_typing(completer: UnifiedCompleter, text: str) -> list[float]:
+    """Milliseconds spent completing after each keystroke of `text`"""
+    event = CompleteEvent()
+    timings = [0.0] * len(text)
+    for _ in range(REPEAT):
+        for i in range(1, len(text) + 1):
+            document = Document(text[:i])
+            started = time.perf_counter()
+            list(completer.get_completions(document, event))
+            timings[i - 1] += (time.perf_counter() - started) * 1000
+        # Start every run without the previous run's narrowed matches
+        completer.resource_index._last_fuzzy = ("", [])
+    return [total / REPEAT for total in timings]
+
+
+def main() -> int:
+    catalog = make_catalog(CATALOG_SIZE)
+    completer = UnifiedCompleter()
+
+    started = time.perf_counter()
+    completer.update_resources(catalog)
+    print(f"Index build for {CATALOG_SIZE} ids: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    failed = False
+    for text in TYPED:
+        timings = time_typing(completer, text)
+        average = sum(timings) / len(timings)
+        slowest = max(range(len(timings)), key=timings.__getitem__)
+        failed |= average >= BUDGET_MS
+        print(
+            f"{text!r:>18}: {average:.3f} ms/keystroke, slowest {timings[slowest]:.3f} ms "
+            f"at {text[: slowest + 1]!r} [{'ok' if average < BUDGET_MS else 'SLOW'}]"
+        )
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
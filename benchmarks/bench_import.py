@@ -0,0 +1,69 @@
+# Run from the project root: python -m benchmarks.bench_import
+import ast
+import os
+import subprocess
+import sys
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def startup_modules(path: str = MAIN) -> list[str]:
+    """Modules main.py imports at module level, i.e. before the first turn"""
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+STARTUP_MODULES = startup_modules()
+
+# SDKs that must only be imported once their backend is selected
+LAZY_MODULES = ["google.generativeai", "anthropic"]
+
+# Wall-clock budget for the startup imports, best of REPEAT fresh interpreters
+BUDGET_SECONDS = 1.5
+REPEAT = 3
+
+PROBE = f"""
+import sys, time
+started = time.perf_counter()
+for name in {STARTUP_MODULES!r}:
+    __import__(name)
+elapsed = time.perf_counter() - started
+loaded = [name for name in {LAZY_MODULES!r} if name in sys.modules]
+print(elapsed)
+print(",".join(loaded))
+"""
+
+
+def measure() -> tuple[float, list[str]]:
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", PROBE],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.splitlines()
+    return float(output[0]), [name for name in output[1].split(",") if name]
+
+
+def main() -> int:
+    runs = [measure() for _ in range(REPEAT)]
+    best = min(elapsed for elapsed, _ in runs)
+    eager = runs[0][1]
+
+    print(f"Startup imports: {best * 1000:.0f} ms (budget {BUDGET_SECONDS * 1000:.0f} ms)")
+    if eager:
+        print(f"Imported eagerly, should be lazy: {', '.join(eager)}")
+    else:
+        print("Model SDKs not imported at startup: ok")
+
+    return 1 if eager or best > BUDGET_SECONDS else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# Run from the project root: python -m benchmarks.bench_memory
+import json
+import sys
+import tracemalloc
+
+from core.messages import GeminiMessage, TextBlock, ToolResultBlock, ToolUseBlock
+from core.provider import LLMProvider
+
+# Resident memory of one simulated session must stay under this budget
+BUDGET_MB = 8.0
+TURNS = 200
+TOOL_RESULT_BYTES = 20_000
+
+
+class SessionProvider(LLMProvider):
+    """Just enough of a provider to build a session's message history"""
+
+    async def chat(self, messages, **kwargs):
+        raise NotImplementedError
+
+    async def query_with_tools(self, user_query, mcp_client, **kwargs):
+        raise NotImplementedError
+
+
+def tool_result_text(turn: int) -> str:
+    # Built fresh per turn, the way an MCP server response would be decoded
+    return json.dumps({"turn": turn, "body": "x" * TOOL_RESULT_BYTES})
+
+
+def build_session(provider: LLMProvider, turns: int) -> list:
+    """A conversation where every turn calls a tool with a large result"""
+    messages: list = []
+    for turn in range(turns):
+        provider.add_user_message(messages, f"Summarize document {turn}")
+        tool_use_id = f"tool_{turn}"
+        response = GeminiMessage(
+            content=[
+                ToolUseBlock(id=tool_use_id, name="read_doc_contents", input={"doc_id": f"doc{turn}"}),
+                ToolResultBlock(tool_use_id=tool_use_id, content=tool_result_text(turn)),
+            ],
+            stop_reason="tool_use",
+        )
+        provider.add_assistant_message(messages, response)
+        # The reply references the tool result instead of copying it
+        reply = GeminiMessage([TextBlock(response.content[1].content)])
+        provider.add_assistant_message(messages, reply)
+    return messages
+
+
+def main() -> int:
+    provider = SessionProvider()
+
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    messages = build_session(provider, TURNS)
+    current, peak = tracemalloc.get_traced_memory()
+    stats = tracemalloc.take_snapshot().compare_to(baseline, "filename")
+    tracemalloc.stop()
+
+    payload = TURNS * TOOL_RESULT_BYTES / 1024 / 1024
+    resident = current / 1024 / 1024
+    print(f"{TURNS} turns, {len(messages)} messages, {payload:.1f} MB of tool results")
+    print(f"Session memory: {resident:.2f} MB (peak {peak / 1024 / 1024:.2f} MB)")
+    for stat in stats[:3]:
+        print(f"  {stat}")
+
+    failed = resident >= BUDGET_MB
+    print(f"Budget {BUDGET_MB:.1f} MB [{'OVER' if failed else 'ok'}]")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from core.provider import LLMProvider
+from core.scheduler import PRIORITY_BACKGROUND
+
+DEFAULT_SYSTEM = "You are a helpful AI assistant with access to document tools. Use tools when needed to provide accurate information."
+
+
+def read_queries(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Streams {"id", "query"} records from a JSONL file; ids default to the
+    line number. A line that is not valid JSON or has no query yields
+    {"id", "line", "error"} instead, so one bad line does not stop the run.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {"id": str(line_number), "line": line_number, "error": f"Invalid JSON: {e}"}
+                continue
+            if isinstance(record, str):
+                record = {"query": record}
+            if not isinstance(record, dict):
+                yield {"id": str(line_number), "line": line_number, "error": "Expected an object or a string"}
+                continue
+            record["id"] = str(record.get("id", line_number))
+            if not isinstance(record.get("query"), str) or not record["query"].strip():
+                yield {"id": record["id"], "line": line_number, "error": 'Missing "query"'}
+                continue
+            yield record
+
+
+def completed_ids(path: str) -> set[str]:
+    """Ids that already succeeded in an output file, i.e. the run's checkpoint"""
+    done: set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn line from an interrupted run; that query is redone
+                continue
+            if "id" in result and "error" not in result:
+                done.add(str(result["id"]))
+    return done
+
+
+def _ends_with_newline(path: str) -> bool:
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return True
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+class BatchRunner:
+    """
+    Runs a JSONL file of queries through one shared model provider and MCP
+    client with bounded concurrency.
+
+    Results are appended to the output file as each query finishes, so the
+    output doubles as a checkpoint: a rerun skips ids that already succeeded
+    and retries failed ones (the later line for an id wins).
+
+    Args:
+        ai_service: Model provider shared by all queries.
+        mcp_client: MCP client shared by all queries.
+        concurrency: Maximum number of queries in flight.
+        system: System prompt for every query.
+        temperature: Sampling temperature for every query.
+        report_every: Print throughput after this many completed queries.
+    """
+
+    def __init__(
+        self,
+        ai_service: LLMProvider,
+        mcp_client,
+        concurrency: int = 8,
+        system: Optional[str] = DEFAULT_SYSTEM,
+        temperature: float = 0.7,
+        report_every: int = 10,
+    ):
+        self.ai_service = ai_service
+        self.mcp_client = mcp_client
+        self.concurrency = concurrency
+        self.system = system
+        self.temperature = temperature
+        self.report_every = report_every
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self._started = 0.0
+
+    async def _run_query(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        if "error" in record:
+            # An unreadable input line, reported as it is
+            return record
+        started = time.monotonic()
+        result = {"id": record["id"], "query": record["query"]}
+        try:
+            response = await self.ai_service.query_with_tools(
+                record["query"],
+                self.mcp_client,
+                system=self.system,
+                temperature=self.temperature,
+                priority=PRIORITY_BACKGROUND,
+            )
+            result["response"] = self.ai_service.text_from_message(response)
+        except Exception as e:
+            result["error"] = str(e)
+        result["elapsed"] = round(time.monotonic() - started, 3)
+        return result
+
+    def throughput(self) -> float:
+        elapsed = time.monotonic() - self._started
+        return self.completed / elapsed if elapsed > 0 else 0.0
+
+    def _report(self):
+        print(
+            f"[BATCH] {self.completed} done ({self.failed} failed, {self.skipped} skipped) "
+            f"- {self.throughput():.2f} queries/s"
+        )
+
+    async def run(self, input_path: str, output_path: str) -> dict[str, Any]:
+        """
+        Processes every query in `input_path` not yet in `output_path`.
+
+        Returns:
+            Summary with counts, elapsed time and throughput.
+        """
+        done = completed_ids(output_path)
+        self._started = time.monotonic()
+        pending = (r for r in read_queries(input_path) if r["id"] not in done)
+        self.skipped = len(done)
+
+        torn = not _ends_with_newline(output_path)
+        with open(output_path, "a", encoding="utf-8") as output:
+            if torn:
+                output.write("\n")
+
+            async def worker():
+                # Workers pull from one shared generator, so the input file
+                # is streamed rather than loaded up front
+                for record in pending:
+                    result = await self._run_query(record)
+                    output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    output.flush()
+                    self.completed += 1
+                    if "error" in result:
+                        self.failed += 1
+                    if self.completed % self.report_every == 0:
+                        self._report()
+
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+        self._report()
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "elapsed": round(time.monotonic() - self._started, 3),
+            "queries_per_second": round(self.throughput(), 3),
+        }
@@ -0,0 +1,176 @@
+import time
+from collections import deque
+from typing import Any, Optional
+
+from core.provider import LLMProvider
+from core.router import ToolCallGuard
+from core.scheduler import PRIORITY_INTERACTIVE
+
+# Reply the fast model gives when a query needs the larger model
+ESCALATE = "ESCALATE"
+
+ROUTER_INSTRUCTIONS = f"""Handle the request yourself only if it needs a single tool call or a short, simple reply.
+If it needs analysis, summarizing, drafting, multi-step reasoning or you are unsure, reply with exactly: {ESCALATE}"""
+
+
+class ModelCascade(LLMProvider):
+    """
+    Answers each turn with a small, fast model first and escalates to the
+    larger model only when needed.
+
+    The fast model picks and runs tools and gives short replies. The turn
+    escalates when it answers ESCALATE (the query needs synthesis or it is
+    unsure), when its tool call could not be run, or when it fails, but
+    never after it ran a tool that is not read-only: the larger model would
+    run that tool again, so such a failure is raised instead. Every
+    turn's outcome and latencies are recorded; `stats` reports the
+    escalation rate and the estimated time saved against sending every
+    turn to the larger model.
+
+    Args:
+        fast: Provider for tool routing and trivial replies.
+        strong: Provider for synthesis and escalated turns.
+        history: Number of recent turns kept in the stats.
+        alpha: Smoothing factor of the latency averages.
+    """
+
+    name = "cascade"
+
+    def __init__(
+        self,
+        fast: LLMProvider,
+        strong: LLMProvider,
+        history: int = 50,
+        alpha: float = 0.2,
+    ):
+        self.fast = fast
+        self.strong = strong
+        self.alpha = alpha
+        self.turns: deque[dict[str, Any]] = deque(maxlen=history)
+        self._stats = {"turns": 0, "escalations": 0, "saved_seconds": 0.0}
+        # EWMA of the strong model's turn latency, the baseline for savings
+        self._strong_latency: Optional[float] = None
+
+    def _escalation_reason(self, message) -> Optional[str]:
+        if getattr(message, "stop_reason", None) == "tool_error":
+            return "tool_error"
+        if self.fast.text_from_message(message).strip().startswith(ESCALATE):
+            return "requested"
+        return None
+
+    def _record(self, fast_seconds: float, strong_seconds: Optional[float], reason: Optional[str]):
+        self._stats["turns"] += 1
+        if strong_seconds is not None:
+            self._stats["escalations"] += 1
+            self._strong_latency = (
+                strong_seconds
+                if self._strong_latency is None
+                else self._strong_latency + self.alpha * (strong_seconds - self._strong_latency)
+            )
+            saved = -fast_seconds
+        else:
+            # Unknown until the strong model has answered a turn
+            saved = (self._strong_latency or fast_seconds) - fast_seconds
+        self._stats["saved_seconds"] += saved
+        self.turns.append(
+            {
+                "escalated": strong_seconds is not None,
+                "reason": reason,
+                "fast_seconds": round(fast_seconds, 3),
+                "strong_seconds": None if strong_seconds is None else round(strong_seconds, 3),
+                "saved_seconds": round(saved, 3),
+            }
+        )
+
+    async def chat(
+        self,
+        messages,
+        system=None,
+        temperature=0.7,
+        stop_sequences=None,
+        tools=None,
+        priority=PRIORITY_INTERACTIVE,
+        timeout=None,
+        **kwargs,
+    ) -> Any:
+        # Plain conversation turns (e.g. /command prompts) need the larger model
+        return await self.strong.chat(
+            messages,
+            system=system,
+            temperature=temperature,
+            stop_sequences=stop_sequences,
+            tools=tools,
+            priority=priority,
+            timeout=timeout,
+            **kwargs,
+        )
+
+    async def query_with_tools(
+        self,
+        user_query: str,
+        mcp_client,
+        system=None,
+        temperature=0.7,
+        stop_sequences=None,
+        priority=PRIORITY_INTERACTIVE,
+        timeout=None,
+    ) -> Any:
+        started = time.monotonic()
+        guard = ToolCallGuard(mcp_client)
+        try:
+            response = await self.fast.query_with_tools(
+                user_query,
+                guard,
+                system=f"{system}\n\n{ROUTER_INSTRUCTIONS}" if system else ROUTER_INSTRUCTIONS,
+                temperature=temperature,
+                stop_sequences=stop_sequences,
+                priority=priority,
+                timeout=timeout,
+            )
+            reason = self._escalation_reason(response)
+        except Exception as e:
+            if guard.side_effects:
+                self._record(time.monotonic() - started, None, "error")
+                raise
+            print(f"[DEBUG] Fast model failed ({e!r})")
+            reason = "error"
+        fast_seconds = time.monotonic() - started
+
+        if reason is None or guard.side_effects:
+            self._record(fast_seconds, None, reason)
+            return response
+
+        print(f"[DEBUG] Escalating turn to the larger model ({reason})")
+        started = time.monotonic()
+        try:
+            return await self.strong.query_with_tools(
+                user_query,
+                mcp_client,
+                system=system,
+                temperature=temperature,
+                stop_sequences=stop_sequences,
+                priority=priority,
+                timeout=timeout,
+            )
+        finally:
+            self._record(fast_seconds, time.monotonic() - started, reason)
+
+    def caches(self) -> list[Any]:
+        return [*self.fast.caches(), *self.strong.caches()]
+
+    def clear_caches(self):
+        self.fast.clear_caches()
+        self.strong.clear_caches()
+
+    def stats(self) -> dict[str, Any]:
+        turns = self._stats["turns"]
+        return {
+            "cascade": {
+                **self._stats,
+                "saved_seconds": round(self._stats["saved_seconds"], 3),
+                "escalation_rate": self._stats["escalations"] / turns if turns else 0.0,
+                "recent_turns": list(self.turns),
+            },
+            "fast": self.fast.stats(),
+            "strong": self.strong.stats(),
+        }
@@ -1,70 +1,324 @@
-from typing import Dict, Any, Union
-from core.gemini import Gemini
-from mcp_client import MCPClient
-from core.tools import ToolManager
+import dataclasses
+import os
+import time
+from typing import Dict, Any, Union, Optional, TYPE_CHECKING
+from core.intents import IntentRouter
+from core.memory import MemoryWatchdog, deep_size
+from core.messages import ROLE_ASSISTANT, ROLE_USER
+from core.profiling import TurnProfiler
+from core.provider import LLMProvider
+from core.validation import validators
+from core.spill import SpillStore
+from core.store import ConversationStore, PersistentMessages
+
+if TYPE_CHECKING:
+    from mcp_client import MCPClient
 
 MessageParam = Dict[str, Any]
 
 
 class Chat:
-    def __init__(self, ai_service: Gemini, clients: dict[str, MCPClient]):
-        self.ai_service: Gemini = ai_service
-        self.clients: dict[str, MCPClient] = clients
-        self.messages: list[MessageParam] = []
+    def __init__(
+        self,
+        ai_service: LLMProvider,
+        clients: dict[str, "MCPClient"],
+        store: Optional[ConversationStore] = None,
+        spill: Optional[SpillStore] = None,
+        intents: Optional[IntentRouter] = None,
+        profile_dir: str = "profiles",
+        memory: Optional[MemoryWatchdog] = None,
+    ):
+        self.ai_service: LLMProvider = ai_service
+        self.clients: dict[str, "MCPClient"] = clients
+        self.store = store
+        # Large tool results are spilled here; history keeps only their views
+        self.spill = spill
+        # Answers fully determined commands with a direct tool call
+        self.intents = intents
+        # Profiled turns are written here; the last one is kept for inspection
+        self.profile_dir = profile_dir
+        self.last_profile: Optional[TurnProfiler] = None
+        self.last_profile_paths: dict[str, str] = {}
+        # With a store, messages are journaled to disk and resumed from it
+        self.messages: list[MessageParam] = (
+            PersistentMessages(store) if store else []
+        )
+        self.memory = memory
+        if memory:
+            self._register_memory(memory)
+
+    def _register_memory(self, memory: MemoryWatchdog):
+        session = os.path.basename(self.store.path) if self.store else "default"
+        clients = list(self.clients.values())
+
+        def clear_client_caches(excess: int):
+            for client in clients:
+                client.clear_caches()
+
+        # Accounts measured first are charged for objects they share with
+        # later ones: tool results, then the rest of the history, then caches
+        memory.register(
+            f"tool_results:{session}",
+            lambda: [self._block_text(block) for block in self._tool_result_blocks()],
+            self.spill_tool_results if self.spill else None,
+            priority=1,
+        )
+        memory.register(
+            f"session:{session}",
+            lambda: [self.messages],
+            self.compact_history,
+            budget=memory.session_budget,
+            priority=2,
+        )
+        memory.register(
+            "model_caches",
+            self.ai_service.caches,
+            lambda excess: self.ai_service.clear_caches(),
+        )
+        memory.register(
+            "client_caches",
+            lambda: [cache for client in clients for cache in client.caches()],
+            clear_client_caches,
+        )
+
+    def stats(self) -> dict[str, Any]:
+        stats = {
+            "model": self.ai_service.stats(),
+            "conversation": {"resident_messages": len(self.messages)},
+            "tool_validation": dict(validators.stats),
+        }
+        if self.store:
+            stats["conversation"]["stored_messages"] = self.store.message_count
+        if self.intents:
+            stats["intents"] = self.intents.stats()
+        if self.memory:
+            stats["memory"] = self.memory.stats()
+        return stats
+
+    @staticmethod
+    def _block_type(block) -> Optional[str]:
+        return block.get("type") if isinstance(block, dict) else getattr(block, "type", None)
+
+    def _tool_result_blocks(self, messages: Optional[list[MessageParam]] = None):
+        for message in self.messages if messages is None else messages:
+            content = message.get("content")
+            for block in content if isinstance(content, list) else []:
+                if self._block_type(block) == "tool_result":
+                    yield block
+
+    @staticmethod
+    def _block_text(block) -> Any:
+        return block.get("content") if isinstance(block, dict) else getattr(block, "content", None)
+
+    def spill_tool_results(self, excess: int, keep: int = 4):
+        """Spills the tool results of all but the last `keep` messages, oldest first."""
+        freed = 0
+        for i, message in enumerate(self.messages[:-keep]):
+            if freed >= excess:
+                return
+            spilled = self._spilled_copy(message, 2 * self.spill.preview_bytes, tool_results_only=True)
+            if spilled is not message:
+                freed += deep_size(message) - deep_size(spilled)
+                self.messages[i] = spilled
+
+    def compact_history(self, excess: int, keep: int = 4):
+        """
+        Frees about `excess` bytes of resident history, leaving the last
+        `keep` messages alone. Text of older messages larger than a spill
+        preview is spilled first, so it can still be fetched; then the
+        oldest turns are dropped. A stored session loses nothing, its
+        journal keeps every message.
+        """
+        older = len(self.messages) - keep
+        if older <= 0:
+            return
+        sizes = [deep_size(message) for message in self.messages[:older]]
+        freed = 0
+        if self.spill:
+            threshold = 2 * self.spill.preview_bytes
+            for i, message in enumerate(self.messages[:older]):
+                if freed >= excess:
+                    return
+                spilled = self._spilled_copy(message, threshold)
+                if spilled is not message:
+                    self.messages[i] = spilled
+                    size = deep_size(spilled)
+                    freed += sizes[i] - size
+                    sizes[i] = size
+
+        # Cut at a plain user turn, so tool calls keep their results
+        cut = 0
+        for i in range(1, min(older + 1, len(self.messages))):
+            freed += sizes[i - 1]
+            message = self.messages[i]
+            if message.get("role") == ROLE_USER and isinstance(message.get("content"), str):
+                cut = i
+                if freed >= excess:
+                    break
+        if cut:
+            if not self.store:
+                print(f"[DEBUG] Dropping {cut} oldest messages to stay within the memory budget")
+            del self.messages[:cut]
+
+    def _spilled_copy(self, message: MessageParam, threshold: int, tool_results_only: bool = False) -> MessageParam:
+        """
+        A copy of `message` with its long text spilled, or `message` itself
+        if nothing was. Messages are never changed in place: a stored
+        session's list holds the same dicts, and its journal must keep the
+        original text.
+        """
+        content = message.get("content")
+        if isinstance(content, str):
+            if tool_results_only:
+                return message
+            spilled = self.spill.put(content, threshold)
+            return message if spilled is content else {**message, "content": spilled}
+        if not isinstance(content, list):
+            return message
+
+        blocks = []
+        for block in content:
+            updates: dict[str, Any] = {}
+            if tool_results_only and self._block_type(block) != "tool_result":
+                pass
+            elif getattr(block, "model_content", None):
+                # Already spilled for the model; its view replaces the full text
+                updates = {"content": block.model_content, "model_content": None}
+            else:
+                for field in ("text", "content"):
+                    text = block.get(field) if isinstance(block, dict) else getattr(block, field, None)
+                    if isinstance(text, str):
+                        spilled = self.spill.put(text, threshold)
+                        if spilled is not text:
+                            updates[field] = spilled
+            if updates:
+                block = {**block, **updates} if isinstance(block, dict) else dataclasses.replace(block, **updates)
+            blocks.append(block)
+        if all(new is old for new, old in zip(blocks, content)):
+            return message
+        return {**message, "content": blocks}
+
+    def _remember(self, message: MessageParam):
+        """
+        Appends a reply to the history. A stored session journals it in
+        full, but the resident copy keeps only the spilled view of long
+        text, so a large tool result does not stay in memory for the
+        rest of the session.
+        """
+        self.messages.append(message)
+        if self.spill:
+            spilled = self._spilled_copy(message, self.spill.threshold)
+            if spilled is not message:
+                self.messages[-1] = spilled
 
-    async def _process_query(self, query: str):
-        self.messages.append({"role": "user", "content": query})
+    async def _process_command(self, query: str) -> bool:
+        """Expands a /command into prompt messages; plain chat has none."""
+        return False
+
+    async def _add_context(self, query: str) -> str:
+        """Returns the query as sent to the model, e.g. with mentioned docs inlined."""
+        return query
+
+    async def _run_intent(self, query: str) -> Optional[str]:
+        """
+        Runs the tool call `query` unambiguously names, without the model.
+        Returns None to leave the turn to the model, also when a read-only
+        call fails; a failed call that may have changed something is
+        reported instead, so the model does not run it again.
+        """
+        started = time.monotonic()
+        mcp_client = list(self.clients.values())[0]
+        try:
+            intent = await self.intents.route(query, mcp_client)
+        except Exception as e:
+            print(f"[DEBUG] Intent routing failed ({e!r})")
+            return None
+        if intent is None:
+            return None
+        print(f"[DEBUG] Intent routed to {intent.tool_name} with {intent.arguments}")  # Debug log
+
+        try:
+            result = await mcp_client.call_tool(intent.tool_name, intent.arguments)
+        except Exception as e:
+            if mcp_client.is_read_only(intent.tool_name):
+                print(f"[DEBUG] Routed {intent.tool_name} call failed ({e!r}), asking the model")
+                return None
+            result = None
+            text = f"The {intent.tool_name} operation failed: {e}"
+        else:
+            text = "\n".join(
+                item.text for item in (result.content if result else []) if getattr(item, "type", None) == "text"
+            )
+            if result and result.isError:
+                text = f"The {intent.tool_name} operation failed: {text}"
+            elif not text.strip():
+                text = f"Successfully completed the {intent.tool_name} operation."
+        self.intents.record(time.monotonic() - started)
+        return text
+
+    @staticmethod
+    def _message_text(message: MessageParam) -> str:
+        content = message["content"]
+        if isinstance(content, list):
+            return "\n".join(
+                block.get("text", "") if isinstance(block, dict) else getattr(block, "text", "")
+                for block in content
+            )
+        return content
 
     async def run(
         self,
         query: str,
+        profile: bool = False,
     ) -> str:
-        print(f"[DEBUG] run called with query: {query}")  # Debug log
-        
-        # Check if this is a Gemini AI service that supports tools
-        if hasattr(self.ai_service, 'handle_user_query_with_tools'):
-            # Use the enhanced tool-aware processing
-            response = await self.ai_service.handle_user_query_with_tools(
-                user_query=query,
-                mcp_client=list(self.clients.values())[0],  # Use the first client
-                system="You are a helpful AI assistant with access to document tools. Use tools when needed to provide accurate information.",
-                temperature=0.7
-            )
-            
-            return self.ai_service.text_from_message(response)
-        
-        # Fallback to the original method for other AI services
-        final_text_response = ""
-        await self._process_query(query)
-
-        while True:
-            print("[DEBUG] Sending messages to AI service")  # Debug log
-            response = await self.ai_service.chat(
-                messages=self.messages,
-                tools=await ToolManager.get_all_tools(self.clients),
-            )
+        """
+        Answers `query`. With `profile`, the turn is sampled and written to
+        `profile_dir` as collapsed stacks and a speedscope file.
+        """
+        try:
+            if not profile:
+                return await self._run(query)
 
-            print(f"[DEBUG] AI service response: {response}")  # Debug log
-            print(f"[DEBUG] Full Gemini response content: {response.content}")  # Debug log
+            profiler = TurnProfiler(
+                f"turn-{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}"
+            )
+            try:
+                async with profiler:
+                    return await self._run(query)
+            finally:
+                self.last_profile = profiler
+                self.last_profile_paths = profiler.write(self.profile_dir)
+        finally:
+            if self.memory:
+                # History and caches only grow during turns
+                self.memory.check()
 
-            self.ai_service.add_assistant_message(self.messages, response)
+    async def _run(self, query: str) -> str:
+        print(f"[DEBUG] run called with query: {query}")  # Debug log
 
-            if hasattr(response, 'stop_reason') and response.stop_reason == "tool_use":
-                print("[DEBUG] Tool use detected in response")  # Debug log
-                print(self.ai_service.text_from_message(response))
-                tool_result_parts = await ToolManager.execute_tool_requests(
-                    self.clients, response
-                )
+        # A /command appends its prompt messages; the last one is answered
+        is_command = await self._process_command(query)
+        if not is_command and self.intents:
+            response_text = await self._run_intent(query)
+            if response_text is not None:
+                self.messages.append({"role": ROLE_USER, "content": query})
+                self._remember({"role": ROLE_ASSISTANT, "content": response_text})
+                return response_text
 
-                print(f"[DEBUG] Tool result parts: {tool_result_parts}")  # Debug log
-                self.ai_service.add_user_message(
-                    self.messages, tool_result_parts
-                )
-            else:
-                print("[DEBUG] No tool use detected in response")  # Debug log
-                final_text_response = self.ai_service.text_from_message(
-                    response
-                )
-                break
+        if is_command:
+            model_query = self._message_text(self.messages[-1])
+        else:
+            model_query = await self._add_context(query)
+        
+        response = await self.ai_service.handle_user_query_with_tools(
+            user_query=model_query,
+            mcp_client=list(self.clients.values())[0],  # Use the first client
+            system="You are a helpful AI assistant with access to document tools. Use tools when needed to provide accurate information.",
+            temperature=0.7
+        )
 
-        return final_text_response
+        response_text = self.ai_service.text_from_message(response)
+        if not is_command:
+            self.messages.append({"role": ROLE_USER, "content": query})
+        self._remember({"role": ROLE_ASSISTANT, "content": response_text})
+        return response_text
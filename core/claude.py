@@ -1,11 +1,27 @@
-from anthropic import Anthropic
+from typing import Optional
+
+from anthropic import AsyncAnthropic
 from anthropic.types import Message
 
+from core.provider import LLMProvider
+from core.scheduler import ModelCallScheduler, PRIORITY_INTERACTIVE
+
+MAX_TOOL_ROUNDS = 5
+
+
+class Claude(LLMProvider):
+    name = "claude"
 
-class Claude:
-    def __init__(self, model: str):
-        self.client = Anthropic()
+    def __init__(
+        self,
+        model: str,
+        scheduler: Optional[ModelCallScheduler] = None,
+        client: Optional[AsyncAnthropic] = None,
+    ):
+        # One client per process; its HTTP connection pool is reused across calls
+        self.client = client or AsyncAnthropic()
         self.model = model
+        self.scheduler = scheduler or ModelCallScheduler()
 
     def add_user_message(self, messages: list, message):
         user_message = {
@@ -25,27 +41,44 @@ class Claude:
         }
         messages.append(assistant_message)
 
-    def text_from_message(self, message: Message):
-        return "\n".join(
-            [block.text for block in message.content if block.type == "text"]
-        )
+    @staticmethod
+    def _to_anthropic_tools(tools) -> list[dict]:
+        """Accepts MCP Tool objects or dicts already in Anthropic's format"""
+        return [
+            tool
+            if isinstance(tool, dict)
+            else {
+                "name": tool.name,
+                "description": tool.description or "",
+                "input_schema": tool.inputSchema,
+            }
+            for tool in tools
+        ]
+
+    @staticmethod
+    def _usage_tokens(message: Message) -> Optional[int]:
+        usage = getattr(message, "usage", None)
+        return usage.input_tokens + usage.output_tokens if usage else None
 
-    def chat(
+    async def chat(
         self,
         messages,
         system=None,
         temperature=1.0,
-        stop_sequences=[],
+        stop_sequences=None,
         tools=None,
         thinking=False,
         thinking_budget=1024,
+        priority=PRIORITY_INTERACTIVE,
+        timeout=None,
+        **kwargs,
     ) -> Message:
         params = {
             "model": self.model,
             "max_tokens": 8000,
             "messages": messages,
             "temperature": temperature,
-            "stop_sequences": stop_sequences,
+            "stop_sequences": stop_sequences or [],
         }
 
         if thinking:
@@ -55,10 +88,67 @@ class Claude:
             }
 
         if tools:
-            params["tools"] = tools
+            params["tools"] = self._to_anthropic_tools(tools)
 
         if system:
             params["system"] = system
 
-        message = self.client.messages.create(**params)
-        return message
\ No newline at end of file
+        return await self.scheduler.submit(
+            lambda: self.client.messages.create(**params),
+            priority=priority,
+            timeout=timeout,
+            usage=self._usage_tokens,
+        )
+
+    async def query_with_tools(
+        self,
+        user_query: str,
+        mcp_client,
+        system=None,
+        temperature=0.7,
+        stop_sequences=None,
+        priority=PRIORITY_INTERACTIVE,
+        timeout=None,
+    ) -> Message:
+        """
+        Answer a user query with Claude's native tool use, running requested
+        tools through `mcp_client` until Claude produces a final answer.
+        """
+        tools = await mcp_client.list_tools()
+        messages = [{"role": "user", "content": user_query}]
+
+        for _ in range(MAX_TOOL_ROUNDS):
+            response = await self.chat(
+                messages=messages,
+                system=system,
+                temperature=temperature,
+                stop_sequences=stop_sequences,
+                tools=tools,
+                priority=priority,
+                timeout=timeout,
+            )
+            if response.stop_reason != "tool_use":
+                return response
+
+            self.add_assistant_message(messages, response)
+            tool_results = []
+            for block in response.content:
+                if block.type != "tool_use":
+                    continue
+                print(f"[DEBUG] Executing tool: {block.name} with input: {block.input}")
+                tool_result = await mcp_client.call_tool(block.name, block.input)
+                text = "\n".join(
+                    getattr(item, "text", str(item))
+                    for item in (tool_result.content if tool_result else [])
+                )
+                tool_results.append(
+                    {
+                        "type": "tool_result",
+                        "tool_use_id": block.id,
+                        "content": text,
+                        "is_error": bool(tool_result and tool_result.isError),
+                    }
+                )
+            self.add_user_message(messages, tool_results)
+
+        return response
@@ -1,14 +1,17 @@
-from typing import List, Optional
+import asyncio
+import json
+from typing import Callable, List, Optional
 from prompt_toolkit import PromptSession
 from prompt_toolkit.completion import Completer, Completion
 from prompt_toolkit.key_binding import KeyBindings
 from prompt_toolkit.styles import Style
-from prompt_toolkit.history import InMemoryHistory
+from prompt_toolkit.history import FileHistory, InMemoryHistory
 from prompt_toolkit.auto_suggest import AutoSuggest, Suggestion
 from prompt_toolkit.document import Document
 from prompt_toolkit.buffer import Buffer
 
 from core.cli_chat import CliChat
+from core.completion import CompletionIndex, resource_ids
 
 
 class CommandAutoSuggest(AutoSuggest):
@@ -37,34 +40,75 @@ class CommandAutoSuggest(AutoSuggest):
 
 
 class UnifiedCompleter(Completer):
+    """
+    Completes /commands and @mentions. Completions run in a worker thread
+    while updates arrive on the event loop, so updates build new indexes
+    and swap them in with one assignment each; the thread reads every
+    attribute once per keystroke.
+    """
+
     def __init__(self):
         self.prompts = []
         self.prompt_dict = {}
         self.resources = []
+        self.resource_set: set[str] = set()
+        self.prompt_index = CompletionIndex()
+        self.resource_index = CompletionIndex()
+        # Called with each fully typed @mention, to start fetching it early
+        self.on_mention: Optional[Callable[[str], None]] = None
+        # Mentions already passed to on_mention while they stay in the buffer
+        self._announced: set[str] = set()
 
     def update_prompts(self, prompts: List):
+        prompt_index = CompletionIndex()
+        prompt_index.build(prompt.name for prompt in prompts)
         self.prompts = prompts
         self.prompt_dict = {prompt.name: prompt for prompt in prompts}
+        self.prompt_index = prompt_index
 
     def update_resources(self, resources: List):
-        self.resources = resources
+        self.resources = resource_ids(resources)
+        new_set = set(self.resources)
+        if self.resource_set:
+            # After a change notification usually only a few ids differ
+            resource_index = self.resource_index.copy()
+            resource_index.update(
+                added=new_set - self.resource_set,
+                removed=self.resource_set - new_set,
+            )
+        else:
+            resource_index = CompletionIndex()
+            resource_index.build(self.resources)
+        self.resource_index = resource_index
+        self.resource_set = new_set
+
+    def _notify_mentions(self, text: str):
+        resource_set = self.resource_set
+        mentions = {word[1:] for word in text.split() if word.startswith("@") and word[1:] in resource_set}
+        for doc_id in mentions - self._announced:
+            self.on_mention(doc_id)
+        self._announced = mentions
 
     def get_completions(self, document, complete_event):
         text = document.text
         text_before_cursor = document.text_before_cursor
+        resource_index = self.resource_index
+        prompt_dict, prompt_index = self.prompt_dict, self.prompt_index
+
+        if self.on_mention:
+            self._notify_mentions(text)
 
         if "@" in text_before_cursor:
             last_at_pos = text_before_cursor.rfind("@")
             prefix = text_before_cursor[last_at_pos + 1 :]
 
-            for resource_id in self.resources:
-                if resource_id.lower().startswith(prefix.lower()):
-                    yield Completion(
-                        resource_id,
-                        start_position=-len(prefix),
-                        display=resource_id,
-                        display_meta="Resource",
-                    )
+            for resource_id in resource_index.search(prefix):
+                yield Completion(
+                    resource_id,
+                    start_position=-len(prefix),
+                    display=resource_id,
+                    display_meta="Resource",
+                )
             return
 
         if text.startswith("/"):
@@ -73,21 +117,24 @@ class UnifiedCompleter(Completer):
             if len(parts) <= 1 and not text.endswith(" "):
                 cmd_prefix = parts[0] if parts else ""
 
-                for prompt in self.prompts:
-                    if prompt.name.startswith(cmd_prefix):
-                        yield Completion(
-                            prompt.name,
-                            start_position=-len(cmd_prefix),
-                            display=f"/{prompt.name}",
-                            display_meta=prompt.description or "",
-                        )
+                for name in prompt_index.search(cmd_prefix):
+                    prompt = prompt_dict.get(name)
+                    if prompt is None:
+                        # The prompts changed between the two reads above
+                        continue
+                    yield Completion(
+                        prompt.name,
+                        start_position=-len(cmd_prefix),
+                        display=f"/{prompt.name}",
+                        display_meta=prompt.description or "",
+                    )
                 return
 
             if len(parts) == 1 and text.endswith(" "):
                 cmd = parts[0]
 
-                if cmd in self.prompt_dict:
-                    for id in self.resources:
+                if cmd in prompt_dict:
+                    for id in resource_index.search(""):
                         yield Completion(
                             id,
                             start_position=0,
@@ -98,21 +145,20 @@ class UnifiedCompleter(Completer):
             if len(parts) >= 2:
                 doc_prefix = parts[-1]
 
-                for resource in self.resources:
-                    if "id" in resource and resource["id"].lower().startswith(
-                        doc_prefix.lower()
-                    ):
-                        yield Completion(
-                            resource["id"],
-                            start_position=-len(doc_prefix),
-                            display=resource["id"],
-                        )
+                for resource_id in resource_index.search(doc_prefix):
+                    yield Completion(
+                        resource_id,
+                        start_position=-len(doc_prefix),
+                        display=resource_id,
+                    )
                 return
 
 
 class CliApp:
-    def __init__(self, agent: CliChat):
+    def __init__(self, agent: CliChat, history_file: Optional[str] = None):
         self.agent = agent
+        # Set by /profile: every turn is profiled until it is toggled off
+        self.profiling = False
         self.resources = []
         self.prompts = []
 
@@ -159,7 +205,9 @@ class CliApp:
                     ):
                         buffer.start_completion(select_first=False)
 
-        self.history = InMemoryHistory()
+        self.history = (
+            FileHistory(history_file) if history_file else InMemoryHistory()
+        )
         self.session = PromptSession(
             completer=self.completer,
             history=self.history,
@@ -177,9 +225,23 @@ class CliApp:
         )
 
     async def initialize(self):
+        # Completions run in a worker thread, so prefetches are handed
+        # back to the event loop
+        loop = asyncio.get_running_loop()
+        self.completer.on_mention = lambda doc_id: loop.call_soon_threadsafe(
+            self.agent.prefetch_doc, doc_id
+        )
         await self.refresh_resources()
         await self.refresh_prompts()
 
+        # The server announces document and prompt changes, so the
+        # completions are refreshed on demand instead of polled
+        self.agent.doc_client.on("resource_list_changed", self.refresh_resources)
+        self.agent.doc_client.on("prompt_list_changed", self.refresh_prompts)
+
+        # Jobs started by tool calls finish while the conversation goes on
+        self.agent.doc_client.jobs.on_finished(self.print_job)
+
     async def refresh_resources(self):
         try:
             self.resources = await self.agent.list_docs_ids()
@@ -196,6 +258,20 @@ class CliApp:
         except Exception as e:
             print(f"Error refreshing prompts: {e}")
 
+    def print_job(self, snapshot: dict):
+        line = f"\nJob {snapshot['job_id']} ({snapshot.get('tool')}) {snapshot['status']}"
+        if snapshot.get("error"):
+            line += f": {snapshot['error']}"
+        print(line)
+
+    def print_profile(self):
+        profiler = self.agent.last_profile
+        print(f"\nProfiled {profiler.duration:.3f}s, top frames by inclusive time:")
+        for label, seconds in profiler.summary():
+            print(f"  {seconds:8.4f}s  {label}")
+        for kind, path in self.agent.last_profile_paths.items():
+            print(f"  {kind}: {path}")
+
     async def run(self):
         while True:
             try:
@@ -203,8 +279,40 @@ class CliApp:
                 if not user_input.strip():
                     continue
 
-                response = await self.agent.run(user_input)
+                if user_input.strip() == "/stats":
+                    stats = self.agent.stats()
+                    stats["server_tools"] = await self.agent.server_tool_stats()
+                    print(json.dumps(stats, indent=2, default=str))
+                    continue
+
+                if user_input.strip() == "/jobs":
+                    jobs = self.agent.doc_client.jobs
+                    print(json.dumps(list(jobs.jobs.values()), indent=2, default=str))
+                    continue
+
+                if user_input.strip() == "/add_shard":
+                    add_shard = getattr(self.agent.doc_client, "add_shard", None)
+                    if add_shard is None:
+                        print("Sharding is not enabled (set DOC_SHARDS)")
+                        continue
+                    moved = await add_shard()
+                    print(f"Added a shard; moved {len(moved)} documents: {', '.join(moved)}")
+                    continue
+
+                # "/profile" toggles profiling, "/profile <query>" profiles one turn
+                profile = self.profiling
+                if user_input.strip() == "/profile":
+                    self.profiling = not self.profiling
+                    print(f"Profiling {'on' if self.profiling else 'off'}")
+                    continue
+                if user_input.startswith("/profile "):
+                    user_input = user_input[len("/profile ") :]
+                    profile = True
+
+                response = await self.agent.run(user_input, profile=profile)
                 print(f"\nResponse:\n{response}")
+                if profile:
+                    self.print_profile()
 
             except KeyboardInterrupt:
                 break
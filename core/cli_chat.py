@@ -1,90 +1,233 @@
-from typing import List, Tuple, Union, Dict, Any
-from mcp.types import Prompt, PromptMessage
+import asyncio
+import json
+from typing import List, Tuple, Union, Dict, Any, Optional, TYPE_CHECKING
 from core.chat import Chat
-from core.gemini import Gemini
-from mcp_client import MCPClient
+from core.intents import IntentRouter
+from core.memory import MemoryWatchdog
+from core.provider import LLMProvider
+from core.speculation import DOC_ID_PATTERN
+from core.spill import SpillStore
+from core.store import ConversationStore
+
+if TYPE_CHECKING:
+    from mcp.types import Prompt, PromptMessage
+    from mcp_client import MCPClient
 
 MessageParam = Dict[str, Any]
 
+# Total size of the documents inlined into one query for @mentions
+CONTEXT_BYTE_BUDGET = 64 * 1024
+
+# Retrieved chunks added to a query that mentions no documents
+RETRIEVAL_TOP_K = 4
+RETRIEVAL_MIN_SCORE = 0.2
+
 
 class CliChat(Chat):
     def __init__(
         self,
-        doc_client: MCPClient,
-        clients: dict[str, MCPClient],
-        ai_service: Gemini,
+        doc_client: "MCPClient",
+        clients: dict[str, "MCPClient"],
+        ai_service: LLMProvider,
+        store: Optional[ConversationStore] = None,
+        spill: Optional[SpillStore] = None,
+        context_byte_budget: int = CONTEXT_BYTE_BUDGET,
+        retrieval_k: int = RETRIEVAL_TOP_K,
+        retrieval_min_score: float = RETRIEVAL_MIN_SCORE,
+        intents: Optional[IntentRouter] = None,
+        profile_dir: str = "profiles",
+        memory: Optional[MemoryWatchdog] = None,
     ):
-        super().__init__(clients=clients, ai_service=ai_service)
+        super().__init__(
+            clients=clients,
+            ai_service=ai_service,
+            store=store,
+            spill=spill,
+            intents=intents,
+            profile_dir=profile_dir,
+            memory=memory,
+        )
 
-        self.doc_client: MCPClient = doc_client
+        self.doc_client: "MCPClient" = doc_client
+        self.context_byte_budget = context_byte_budget
+        # Top-k retrieval from the server's `retrieve` tool (0 disables)
+        self.retrieval_k = retrieval_k
+        self.retrieval_min_score = retrieval_min_score
+        # Doc ids from the last listing, used to resolve @mentions
+        self._doc_ids: Optional[set[str]] = None
+        # doc id -> (doc version, task fetching its content)
+        self._doc_tasks: dict[str, tuple[int, "asyncio.Task[str]"]] = {}
+        doc_client.on("resource_updated", self._on_resource_updated)
+        if memory:
+            memory.register(
+                "doc_prefetch",
+                lambda: [
+                    task.result()
+                    for _, task in self._doc_tasks.values()
+                    if task.done() and not task.cancelled() and not task.exception()
+                ],
+                lambda excess: self._drop_prefetched(),
+            )
 
-    async def list_prompts(self) -> list[Prompt]:
+    def _drop_prefetched(self):
+        # Fetches still in flight are awaited by a turn and kept
+        for doc_id in [doc_id for doc_id, (_, task) in self._doc_tasks.items() if task.done()]:
+            del self._doc_tasks[doc_id]
+
+    def _on_resource_updated(self, uri: str):
+        # Keep a previously fetched doc warm: fetch its new version now
+        doc_id = uri.rsplit("/", 1)[-1]
+        if doc_id in self._doc_tasks:
+            self.prefetch_doc(doc_id)
+
+    def stats(self) -> dict[str, Any]:
+        stats = super().stats()
+        stats["prompt_cache"] = dict(self.doc_client.prompt_cache_stats)
+        return stats
+
+    async def server_tool_stats(self) -> Optional[dict]:
+        """The doc server's per-tool executor metrics, if it has any."""
+        try:
+            return await self.doc_client.read_resource("stats://tools")
+        except Exception:
+            return None
+
+    async def list_prompts(self) -> list["Prompt"]:
         return await self.doc_client.list_prompts()
 
     async def list_docs_ids(self) -> list[str]:
-        return await self.doc_client.read_resource("docs://documents")
+        doc_ids = await self.doc_client.read_resource("docs://documents")
+        self._doc_ids = set(doc_ids)
+        for doc_id in [doc_id for doc_id in self._doc_tasks if doc_id not in self._doc_ids]:
+            del self._doc_tasks[doc_id]
+        return doc_ids
 
     async def get_doc_content(self, doc_id: str) -> str:
         return await self.doc_client.read_resource(f"docs://documents/{doc_id}")
 
+    def prefetch_doc(self, doc_id: str) -> "asyncio.Task[str]":
+        """
+        Starts fetching a doc's content unless a fetch for its current
+        version exists. Called from the completer while the user is still
+        typing, so the content is ready when the query is sent.
+        """
+        version = self.doc_client.doc_version(doc_id)
+        cached = self._doc_tasks.get(doc_id)
+        if cached and cached[0] == version and not (
+            cached[1].done()
+            and (cached[1].cancelled() or cached[1].exception() is not None)
+        ):
+            return cached[1]
+
+        print(f"[DEBUG] Prefetching @{doc_id}")
+        task = asyncio.ensure_future(self.get_doc_content(doc_id))
+        self._doc_tasks[doc_id] = (version, task)
+        return task
+
     async def get_prompt(
         self, command: str, doc_id: str
-    ) -> list[PromptMessage]:
+    ) -> list["PromptMessage"]:
         return await self.doc_client.get_prompt(command, {"doc_id": doc_id})
 
     async def _extract_resources(self, query: str) -> str:
-        mentions = [word[1:] for word in query.split() if word.startswith("@")]
+        # dict.fromkeys keeps the mention order and drops repeats
+        mentions = list(
+            dict.fromkeys(word[1:] for word in query.split() if word.startswith("@"))
+        )
+        if not mentions:
+            return ""
+
+        doc_ids = self._doc_ids
+        if doc_ids is None or not doc_ids.issuperset(mentions):
+            # Unknown mention: the listing may be stale, so list once more
+            doc_ids = set(await self.list_docs_ids())
+        mentioned = [doc_id for doc_id in mentions if doc_id in doc_ids]
+
+        # Shielded so cancelling this query leaves the shared fetches running
+        contents = await asyncio.gather(
+            *(asyncio.shield(self.prefetch_doc(doc_id)) for doc_id in mentioned),
+            return_exceptions=True,
+        )
 
-        doc_ids = await self.list_docs_ids()
         mentioned_docs: list[Tuple[str, str]] = []
-
-        for doc_id in doc_ids:
-            if doc_id in mentions:
-                content = await self.get_doc_content(doc_id)
-                mentioned_docs.append((doc_id, content))
+        remaining = self.context_byte_budget
+        for doc_id, content in zip(mentioned, contents):
+            if isinstance(content, BaseException):
+                print(f"Error reading @{doc_id}: {content}")
+                continue
+            if remaining <= 0:
+                print(f"[DEBUG] Context budget exhausted, skipping @{doc_id}")
+                continue
+            data = content.encode("utf-8")
+            if len(data) > remaining:
+                content = data[:remaining].decode("utf-8", errors="ignore")
+                content += f"\n[Truncated to {remaining} of {len(data)} bytes]"
+            remaining -= len(data)
+            mentioned_docs.append((doc_id, content))
 
         return "".join(
             f'\n<document id="{doc_id}">\n{content}\n</document>\n'
             for doc_id, content in mentioned_docs
         )
 
-    async def _process_command(self, query: str) -> bool:
-        if not query.startswith("/"):
-            return False
-
-        words = query.split()
-        command = words[0].replace("/", "")
+    def _names_docs(self, query: str) -> bool:
+        """Whether `query` @mentions a doc or names a listed one the model can read whole."""
+        if any(word.startswith("@") for word in query.split()):
+            return True
+        doc_ids = self._doc_ids or ()
+        return any(doc_id in doc_ids for doc_id in DOC_ID_PATTERN.findall(query))
 
-        messages = await self.doc_client.get_prompt(
-            command, {"doc_id": words[1]}
+    async def _retrieve_chunks(self, query: str) -> str:
+        """
+        The server's most relevant document chunks for `query`, if it has
+        `retrieve` and the query names no document. Whether it has is known
+        from the tool annotations listed on connect, without a request.
+        """
+        if (
+            not self.retrieval_k
+            or self._doc_ids == set()
+            or self._names_docs(query)
+            or not self.doc_client.is_read_only("retrieve")
+        ):
+            return ""
+        try:
+            result = await self.doc_client.call_tool(
+                "retrieve", {"query": query, "k": self.retrieval_k}
+            )
+        except Exception as e:
+            print(f"Error retrieving context: {e}")
+            return ""
+        if not result or result.isError:
+            return ""
+
+        if result.structuredContent and "result" in result.structuredContent:
+            chunks = result.structuredContent["result"]
+        else:
+            chunks = [
+                json.loads(item.text)
+                for item in result.content
+                if getattr(item, "type", None) == "text"
+            ]
+        return "".join(
+            f'\n<chunk doc_id="{chunk["doc_id"]}" score="{chunk["score"]}">\n{chunk["text"]}\n</chunk>\n'
+            for chunk in chunks
+            if chunk["score"] >= self.retrieval_min_score
         )
 
-        self.messages += convert_prompt_messages_to_message_params(messages)
-        return True
-
-    async def _process_query(self, query: str):
-        if await self._process_command(query):
-            return
-
-        # Check if this is a Gemini AI service that supports tools
-        if hasattr(self.ai_service, 'handle_user_query_with_tools'):
-            # Use the enhanced tool-aware processing
-            response = await self.ai_service.handle_user_query_with_tools(
-                user_query=query,
-                mcp_client=self.doc_client,
-                system="You are a helpful AI assistant with access to document tools. Use tools when needed to provide accurate information.",
-                temperature=0.7
-            )
-            
-            # Add the response to messages
-            self.messages.append({"role": "user", "content": query})
-            self.messages.append({"role": "assistant", "content": self.ai_service.text_from_message(response)})
-            return
+    async def _extract_context(self, query: str) -> str:
+        # Mentioned documents are inlined whole; otherwise only the
+        # retrieved chunks relevant to the query are
+        return await self._extract_resources(query) or await self._retrieve_chunks(query)
 
-        # Fallback to the original method for other AI services
-        added_resources = await self._extract_resources(query)
+    async def _add_context(self, query: str) -> str:
+        added_resources = await self._extract_context(query)
+        if not added_resources:
+            return query
+        return self._context_prompt(query, added_resources)
 
-        prompt = f"""
+    @staticmethod
+    def _context_prompt(query: str, added_resources: str) -> str:
+        return f"""
         The user has a question:
         <query>
         {query}
@@ -102,7 +245,27 @@ class CliChat(Chat):
         Don't refer to or mention the provided context in any way - just use it to inform your answer.
         """
 
-        self.messages.append({"role": "user", "content": prompt})
+    async def _process_command(self, query: str) -> bool:
+        if not query.startswith("/"):
+            return False
+
+        words = query.split()
+        if len(words) < 2:
+            return False
+        command = words[0].replace("/", "")
+
+        try:
+            messages = await self.doc_client.get_prompt(
+                command, {"doc_id": words[1]}
+            )
+        except Exception as e:
+            print(f"Error getting prompt '{command}': {e}")
+            return False
+        if not messages:
+            return False
+
+        self.messages += convert_prompt_messages_to_message_params(messages)
+        return True
 
 
 def convert_prompt_message_to_message_param(
@@ -152,7 +315,7 @@ def convert_prompt_message_to_message_param(
 
 
 def convert_prompt_messages_to_message_params(
-    prompt_messages: List[PromptMessage],
+    prompt_messages: List["PromptMessage"],
 ) -> List[MessageParam]:
     return [
         convert_prompt_message_to_message_param(msg) for msg in prompt_messages
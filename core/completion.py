@@ -0,0 +1,191 @@
+import re
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Iterable, List
+
+# (case-folded key, original value)
+Entry = tuple[str, str]
+
+
+class CompletionIndex:
+    """
+    Sorted, case-folded index of completion candidates.
+
+    Prefix matches are found by binary search in O(log n + k). When fewer
+    than `limit` prefix matches exist, the remaining slots are filled with
+    fuzzy subsequence matches ranked by how compact the match is. Fuzzy
+    candidates are those starting with the query's first character; each
+    such bucket is kept as one newline-joined string so the subsequence
+    search runs inside the regex engine, and the matches of the previous
+    keystroke are kept so a longer query only re-checks those.
+
+    `update` adds and removes candidates in place, re-joining only the
+    buckets of the first characters involved.
+
+    Args:
+        limit: Maximum number of results returned by `search`.
+        fuzzy_limit: Fuzzy matches collected before a bucket scan stops.
+    """
+
+    def __init__(self, limit: int = 50, fuzzy_limit: int = 200):
+        self.limit = limit
+        self.fuzzy_limit = fuzzy_limit
+        self._keys: List[str] = []
+        self._values: List[str] = []
+        # first character -> sorted entries starting with it
+        self._grouped: dict[str, List[Entry]] = {}
+        # first character -> ("\n"-prefixed joined keys, key start offsets, entries)
+        self._buckets: dict[str, tuple[str, List[int], List[Entry]]] = {}
+        self._last_fuzzy: tuple[str, List[Entry]] = ("", [])
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, value: str) -> bool:
+        return self._find((value.casefold(), value)) is not None
+
+    def build(self, values: Iterable[str]):
+        entries = sorted({(value.casefold(), value) for value in values})
+        self._keys = [key for key, _ in entries]
+        self._values = [value for _, value in entries]
+        self._last_fuzzy = ("", [])
+
+        self._grouped = {}
+        for entry in entries:
+            # Newlines would break the line-based fuzzy search
+            if entry[0] and "\n" not in entry[0]:
+                self._grouped.setdefault(entry[0][0], []).append(entry)
+        self._buckets = {}
+        for char in self._grouped:
+            self._build_bucket(char)
+
+    def copy(self) -> "CompletionIndex":
+        """An independent copy, e.g. to update while this one is searched."""
+        index = CompletionIndex(self.limit, self.fuzzy_limit)
+        index._keys = list(self._keys)
+        index._values = list(self._values)
+        index._grouped = {char: list(entries) for char, entries in self._grouped.items()}
+        # Bucket tuples are replaced, never changed, by _build_bucket
+        index._buckets = dict(self._buckets)
+        return index
+
+    def update(self, added: Iterable[str] = (), removed: Iterable[str] = ()):
+        """Adds and removes candidates without rebuilding the whole index."""
+        touched = set()
+        for value in removed:
+            entry = (value.casefold(), value)
+            i = self._find(entry)
+            if i is None:
+                continue
+            del self._keys[i]
+            del self._values[i]
+            group = self._grouped.get(entry[0][:1])
+            if group and entry in group:
+                group.remove(entry)
+                touched.add(entry[0][0])
+        for value in added:
+            entry = (value.casefold(), value)
+            if self._find(entry) is not None:
+                continue
+            i = self._insertion_point(entry)
+            self._keys.insert(i, entry[0])
+            self._values.insert(i, entry[1])
+            if entry[0] and "\n" not in entry[0]:
+                insort(self._grouped.setdefault(entry[0][0], []), entry)
+                touched.add(entry[0][0])
+
+        for char in touched:
+            self._build_bucket(char)
+        if touched:
+            self._last_fuzzy = ("", [])
+
+    def _insertion_point(self, entry: Entry) -> int:
+        i = bisect_left(self._keys, entry[0])
+        while i < len(self._keys) and self._keys[i] == entry[0] and self._values[i] < entry[1]:
+            i += 1
+        return i
+
+    def _find(self, entry: Entry) -> "int | None":
+        i = self._insertion_point(entry)
+        if i < len(self._keys) and self._keys[i] == entry[0] and self._values[i] == entry[1]:
+            return i
+        return None
+
+    def _build_bucket(self, char: str):
+        entries = self._grouped.get(char)
+        if not entries:
+            self._grouped.pop(char, None)
+            self._buckets.pop(char, None)
+            return
+        offsets, offset = [], 0
+        for key, _ in entries:
+            offsets.append(offset)
+            offset += len(key) + 1
+        joined = "".join("\n" + key for key, _ in entries)
+        self._buckets[char] = (joined, offsets, entries)
+
+    def _prefix_range(self, prefix: str) -> range:
+        start = bisect_left(self._keys, prefix)
+        # "\U0010ffff" sorts after every character a key can continue with
+        end = bisect_left(self._keys, prefix + "\U0010ffff", start)
+        return range(start, end)
+
+    @staticmethod
+    def _subsequence_pattern(query: str) -> str:
+        # Each query character is matched at its first occurrence after the
+        # previous one; negated classes keep the regex free of backtracking
+        return re.escape(query[0]) + "".join(
+            "[^\n" + re.escape(char) + "]*" + re.escape(char) for char in query[1:]
+        )
+
+    def _fuzzy(self, query: str) -> List[tuple[int, int, str, str]]:
+        """(extra span, key length, key, value) of every fuzzy match of `query`"""
+        ranked = []
+        last_query, last_matches = self._last_fuzzy
+        if last_query and query.startswith(last_query):
+            # Narrow the previous keystroke's matches
+            pattern = re.compile(self._subsequence_pattern(query))
+            for key, value in last_matches:
+                match = pattern.match(key)
+                if match:
+                    ranked.append((match.end() - len(query), len(key), key, value))
+        elif query[0] in self._buckets:
+            joined, offsets, entries = self._buckets[query[0]]
+            pattern = re.compile("\n" + self._subsequence_pattern(query))
+            for match in pattern.finditer(joined):
+                key, value = entries[bisect_right(offsets, match.start()) - 1]
+                ranked.append((match.end() - match.start() - 1 - len(query), len(key), key, value))
+                if len(ranked) >= self.fuzzy_limit:
+                    # A truncated scan cannot be narrowed by the next keystroke
+                    self._last_fuzzy = ("", [])
+                    return ranked
+
+        self._last_fuzzy = (query, [(key, value) for *_, key, value in ranked])
+        return ranked
+
+    def search(self, query: str) -> List[str]:
+        if not query:
+            return self._values[: self.limit]
+
+        query = query.casefold()
+        matches = self._prefix_range(query)
+        results = [self._values[i] for i in matches[: self.limit]]
+        if len(results) >= self.limit:
+            return results
+
+        # Prefix matches are already in the results
+        ranked = [item for item in self._fuzzy(query) if not item[2].startswith(query)]
+        ranked.sort()
+        results += [value for *_, value in ranked[: self.limit - len(results)]]
+        return results
+
+
+def resource_ids(resources: Iterable[Any]) -> List[str]:
+    """Normalizes resources given either as ids or as dicts with an "id" key"""
+    ids = []
+    for resource in resources:
+        if isinstance(resource, dict):
+            if "id" in resource:
+                ids.append(resource["id"])
+        else:
+            ids.append(str(resource))
+    return ids
@@ -0,0 +1,76 @@
+import difflib
+import re
+from functools import lru_cache
+from typing import Any
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(pattern: str, regex: bool) -> re.Pattern:
+    # Repeated patterns across operations and calls are compiled once
+    return re.compile(pattern if regex else re.escape(pattern))
+
+
+def unified_diff(doc_id: str, before: str, after: str) -> str:
+    return "\n".join(
+        difflib.unified_diff(
+            before.splitlines(),
+            after.splitlines(),
+            fromfile=f"a/{doc_id}",
+            tofile=f"b/{doc_id}",
+            lineterm="",
+        )
+    )
+
+
+def apply_operations(
+    texts: dict[str, str],
+    operations: list[dict[str, Any]],
+    with_diffs: bool = False,
+) -> tuple[dict[str, str], dict[str, dict[str, Any]]]:
+    """
+    Applies find-and-replace operations to copies of `texts`. Pure, so it
+    can run in a worker process.
+
+    Args:
+        texts: Current text of every document the operations name.
+        operations: Dicts with "doc_id", "pattern", "replacement" and "regex".
+        with_diffs: Add a unified diff to each document's report.
+
+    Returns:
+        The edited texts and a report per document with "matches",
+        "changed" and, with `with_diffs`, "diff".
+
+    Raises:
+        ValueError: If an operation names an unknown doc or has an empty or
+            invalid pattern.
+    """
+    staged: dict[str, str] = {}
+    matches: dict[str, int] = {}
+    for number, operation in enumerate(operations, start=1):
+        doc_id = operation["doc_id"]
+        if doc_id not in texts:
+            raise ValueError(f"Operation {number}: doc with id {doc_id} not found")
+        if not operation["pattern"]:
+            # An empty pattern matches between every character
+            raise ValueError(f"Operation {number}: pattern must not be empty")
+        try:
+            pattern = compile_pattern(operation["pattern"], operation["regex"])
+        except re.error as e:
+            raise ValueError(f"Operation {number}: invalid pattern {operation['pattern']!r}: {e}")
+
+        text = staged.get(doc_id, texts[doc_id])
+        replacement = operation["replacement"]
+        if operation["regex"]:
+            text, count = pattern.subn(replacement, text)
+        else:
+            text, count = pattern.subn(lambda _: replacement, text)
+        staged[doc_id] = text
+        matches[doc_id] = matches.get(doc_id, 0) + count
+
+    reports = {}
+    for doc_id, text in staged.items():
+        report = {"matches": matches[doc_id], "changed": text != texts[doc_id]}
+        if with_diffs:
+            report["diff"] = unified_diff(doc_id, texts[doc_id], text)
+        reports[doc_id] = report
+    return staged, reports
@@ -0,0 +1,153 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+# Tool kinds: CPU-bound work runs in worker processes so it neither holds
+# the GIL nor blocks the event loop; I/O-bound work runs in threads; work
+# too small to be worth handing off runs inline on the event loop
+CPU = "cpu"
+IO = "io"
+INLINE = "inline"
+
+T = TypeVar("T")
+
+
+def _run_before(deadline: Optional[float], func: Callable[..., T], args: tuple) -> T:
+    # Runs in the worker: work still queued when its deadline passed is
+    # skipped instead of started
+    if deadline is not None and time.time() >= deadline:
+        raise TimeoutError("Deadline passed before the tool started")
+    return func(*args)
+
+
+class ToolExecutor:
+    """
+    Runs the blocking part of server tools off the event loop.
+
+    `run` dispatches a call to a process pool (CPU) or a thread pool (IO)
+    and waits for it until the request's deadline; INLINE calls run
+    directly on the event loop and are only counted. When the request is
+    cancelled or times out, a call that has not started yet is cancelled;
+    one already running cannot be interrupted, so its result is dropped.
+
+    Deadlines are wall-clock timestamps (`time.time()`), so a deadline set
+    by a client on the same host can be passed through unchanged.
+
+    Args:
+        max_processes: Worker processes for CPU tools (defaults to the CPU count).
+        max_threads: Worker threads for IO tools (defaults to the executor's own).
+        default_timeout: Seconds allowed for a call without a deadline (None = unlimited).
+    """
+
+    def __init__(
+        self,
+        max_processes: Optional[int] = None,
+        max_threads: Optional[int] = None,
+        default_timeout: Optional[float] = None,
+    ):
+        self.max_processes = max_processes
+        self.max_threads = max_threads
+        self.default_timeout = default_timeout
+        # Pools are started on first use
+        self._pools: dict[str, Executor] = {}
+        self._pool_in_flight = {CPU: 0, IO: 0, INLINE: 0}
+        self._tools: dict[str, dict[str, Any]] = {}
+
+    def _pool(self, kind: str) -> Executor:
+        if kind not in self._pools:
+            if kind == CPU:
+                # Forking the server's threaded process can deadlock the workers
+                self._pools[kind] = ProcessPoolExecutor(
+                    max_workers=self.max_processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            elif kind == IO:
+                self._pools[kind] = ThreadPoolExecutor(
+                    max_workers=self.max_threads, thread_name_prefix="tool-io"
+                )
+            else:
+                raise ValueError(f"Unknown tool kind: {kind}")
+        return self._pools[kind]
+
+    def _tool_stats(self, tool_name: str, kind: str) -> dict[str, Any]:
+        if tool_name not in self._tools:
+            self._tools[tool_name] = {
+                "kind": kind,
+                "calls": 0,
+                "in_flight": 0,
+                "peak_in_flight": 0,
+                "errors": 0,
+                "timeouts": 0,
+                "cancelled": 0,
+                "total_seconds": 0.0,
+            }
+        return self._tools[tool_name]
+
+    async def run(
+        self,
+        tool_name: str,
+        kind: str,
+        func: Callable[..., T],
+        *args: Any,
+        deadline: Optional[float] = None,
+    ) -> T:
+        """
+        Calls `func(*args)` in the pool for `kind`. For CPU tools, `func`
+        and `args` must be picklable.
+
+        Raises:
+            TimeoutError: If the deadline passes first.
+        """
+        if deadline is None and self.default_timeout:
+            deadline = time.time() + self.default_timeout
+        pool = None if kind == INLINE else self._pool(kind)
+        stats = self._tool_stats(tool_name, kind)
+        stats["calls"] += 1
+        stats["in_flight"] += 1
+        stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+        self._pool_in_flight[kind] += 1
+        start = time.perf_counter()
+
+        try:
+            if pool is None:
+                return _run_before(deadline, func, args)
+            future = asyncio.get_running_loop().run_in_executor(
+                pool, _run_before, deadline, func, args
+            )
+            timeout = None if deadline is None else max(0.0, deadline - time.time())
+            return await asyncio.wait_for(future, timeout)
+        except (TimeoutError, asyncio.TimeoutError):
+            stats["timeouts"] += 1
+            raise TimeoutError(f"{tool_name} did not finish before its deadline")
+        except asyncio.CancelledError:
+            stats["cancelled"] += 1
+            raise
+        except Exception:
+            stats["errors"] += 1
+            raise
+        finally:
+            stats["in_flight"] -= 1
+            self._pool_in_flight[kind] -= 1
+            stats["total_seconds"] += time.perf_counter() - start
+
+    def stats(self) -> dict[str, Any]:
+        pools = {}
+        for kind, pool in self._pools.items():
+            workers = pool._max_workers
+            in_flight = self._pool_in_flight[kind]
+            pools[kind] = {
+                "workers": workers,
+                "in_flight": in_flight,
+                "queued": max(0, in_flight - workers),
+            }
+        return {
+            "pools": pools,
+            "tools": {name: dict(stats) for name, stats in self._tools.items()},
+        }
+
+    def close(self):
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._pools.clear()
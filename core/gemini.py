@@ -3,46 +3,92 @@ from typing import List, Dict, Any, Optional
 import json
 import re
 import ast
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 
+from core.hedging import Hedger
+from core.messages import ROLE_ASSISTANT, ROLE_USER, GeminiMessage, TextBlock, ToolUseBlock, ToolResultBlock
+from core.provider import LLMProvider
+from core.scheduler import ModelCallScheduler, PRIORITY_INTERACTIVE
+from core.speculation import ToolSpeculator
+from core.spill import FETCH_TOOL, SpillStore
+from core.validation import format_errors, validators
 
-class GeminiMessage:
-    """Wrapper class to mimic Anthropic's Message structure"""
-    def __init__(self, content, role="assistant", stop_reason=None):
-        self.content = content if isinstance(content, list) else [TextBlock(content)]
-        self.role = role
-        self.stop_reason = stop_reason
 
+JOINED_CONTENT_CACHE_SIZE = 512
 
-class TextBlock:
-    """Wrapper class to mimic Anthropic's text block structure"""
-    def __init__(self, text):
-        self.text = text
-        self.type = "text"
+# Output limit of turns offered tools: a TOOL_CALL line or a short answer.
+# A reply cut off at this limit is generated again with the full limit.
+ROUTING_MAX_TOKENS = 128
 
-class ToolUseBlock:
-    """Wrapper class to mimic tool use in messages"""
-    def __init__(self, id, name, input):
-        self.id = id
-        self.name = name
-        self.input = input
-        self.type = "tool_use"
 
-class Gemini:
-    def __init__(self, model: str):
+@dataclass(frozen=True)
+class GenerationSettings:
+    """Generation parameters of one request; never shared or modified."""
+    temperature: float
+    max_output_tokens: int
+    stop_sequences: tuple[str, ...] = ()
+
+    def to_config(self) -> dict[str, Any]:
+        config = {"temperature": self.temperature, "max_output_tokens": self.max_output_tokens}
+        if self.stop_sequences:
+            config["stop_sequences"] = list(self.stop_sequences)
+        return config
+
+
+class Gemini(LLMProvider):
+    name = "gemini"
+
+    def __init__(
+        self,
+        model: str,
+        scheduler: Optional[ModelCallScheduler] = None,
+        hedger: Optional[Hedger] = None,
+        hedge_provider: Optional[LLMProvider] = None,
+        spill_store: Optional[SpillStore] = None,
+        speculator: Optional[ToolSpeculator] = None,
+        max_output_tokens: int = 8000,
+        routing_max_tokens: Optional[int] = ROUTING_MAX_TOKENS,
+    ):
         self.model_name = model
         genai.configure()  # API key will be configured from environment
+
+        # Rate limiting, retries and deadlines for every model call
+        self.scheduler = scheduler or ModelCallScheduler()
+
+        # Opt-in hedging of slow calls, duplicated to `hedge_provider` or to Gemini itself
+        self.hedger = hedger
+        self.hedge_provider = hedge_provider
+
+        # Large tool results are kept here and only previewed in the history
+        self.spill_store = spill_store
+
+        # Starts likely read-only tool calls while the model is generating
+        self.speculator = speculator
+
+        # Joined text of block-list contents, keyed by id() of the list. The
+        # list is kept in the value so its id cannot be reused while cached.
+        self._joined_content: "OrderedDict[int, tuple[list, str]]" = OrderedDict()
         
-        # Configure generation settings
-        self.generation_config = genai.GenerationConfig(
-            max_output_tokens=8000,
-            temperature=0.7,
-        )
-        
+        # Output limits for synthesis turns and for turns that pick a tool.
+        # Settings are built per request and passed with it, so concurrent
+        # calls cannot see each other's temperature or stop sequences.
+        self.max_output_tokens = max_output_tokens
+        self.routing_max_tokens = min(routing_max_tokens or max_output_tokens, max_output_tokens)
+        self._generation_stats = {"routing_turns": 0, "synthesis_turns": 0, "routing_retries": 0}
+
         # Initialize the model
-        self.model = genai.GenerativeModel(
-            model_name=self.model_name,
-            generation_config=self.generation_config
-        )
+        self.model = genai.GenerativeModel(model_name=self.model_name)
+
+    def stats(self) -> dict[str, Any]:
+        return {**super().stats(), "generation": dict(self._generation_stats)}
+
+    def caches(self) -> list[Any]:
+        return [self._joined_content]
+
+    def clear_caches(self):
+        # Entries also keep their content lists alive after history compaction
+        self._joined_content.clear()
 
     def add_user_message(self, messages: list, message):
         user_message = {
@@ -91,18 +137,7 @@ class Gemini:
             # Handle content that might be a list or string
             content = msg["content"]
             if isinstance(content, list):
-                # Extract text from content blocks
-                text_parts = []
-                for block in content:
-                    if isinstance(block, dict) and block.get("type") == "text":
-                        text_parts.append(block["text"])
-                    elif isinstance(block, dict) and "text" in block:
-                        text_parts.append(block["text"])
-                    elif hasattr(block, "text"):
-                        text_parts.append(block.text)
-                    else:
-                        text_parts.append(str(block))
-                content = "\n".join(text_parts)
+                content = self._joined_text(content)
             
             gemini_messages.append({
                 "role": role,
@@ -111,6 +146,129 @@ class Gemini:
         
         return gemini_messages
 
+    def _joined_text(self, content: list) -> str:
+        """Text of a list of content blocks, joined once and then cached"""
+        cached = self._joined_content.get(id(content))
+        if cached is not None and cached[0] is content:
+            self._joined_content.move_to_end(id(content))
+            return cached[1]
+
+        # Extract text from content blocks
+        text_parts = []
+        for block in content:
+            if isinstance(block, dict) and block.get("type") == "text":
+                text_parts.append(block["text"])
+            elif isinstance(block, dict) and "text" in block:
+                text_parts.append(block["text"])
+            elif isinstance(block, dict) and block.get("type") == "tool_result":
+                text_parts.append(str(block.get("content", "")))
+            elif hasattr(block, "text"):
+                text_parts.append(block.text)
+            elif isinstance(block, ToolResultBlock):
+                text_parts.append(block.model_content or block.content)
+            else:
+                text_parts.append(str(block))
+        joined = "\n".join(text_parts)
+
+        self._joined_content[id(content)] = (content, joined)
+        if len(self._joined_content) > JOINED_CONTENT_CACHE_SIZE:
+            self._joined_content.popitem(last=False)
+        return joined
+
+    @staticmethod
+    def _tool_result_text(tool_result) -> str:
+        """Text of an MCP tool result; a single text item is returned without copying"""
+        if tool_result and hasattr(tool_result, 'content'):
+            # Extract text from TextContent objects
+            if isinstance(tool_result.content, list):
+                text_parts = []
+                for content_item in tool_result.content:
+                    if hasattr(content_item, 'text'):
+                        text_parts.append(content_item.text)
+                    else:
+                        text_parts.append(str(content_item))
+                return '\n'.join(text_parts)
+            return str(tool_result.content)
+        return str(tool_result)
+
+    @staticmethod
+    def _estimate_tokens(gemini_messages: List[Dict]) -> int:
+        """Rough prompt size estimate (~4 characters per token) for rate limiting"""
+        chars = sum(len(part) for msg in gemini_messages for part in msg["parts"])
+        return chars // 4 + 1
+
+    @staticmethod
+    def _usage_tokens(response) -> Optional[int]:
+        usage = getattr(response, "usage_metadata", None)
+        return getattr(usage, "total_token_count", None) if usage else None
+
+    def _settings(self, temperature, stop_sequences, routing: bool) -> GenerationSettings:
+        self._generation_stats["routing_turns" if routing else "synthesis_turns"] += 1
+        return GenerationSettings(
+            temperature=temperature,
+            max_output_tokens=self.routing_max_tokens if routing else self.max_output_tokens,
+            stop_sequences=tuple(stop_sequences or ()),
+        )
+
+    @staticmethod
+    def _hit_token_limit(response) -> bool:
+        candidates = getattr(response, "candidates", None) or []
+        reason = getattr(candidates[0], "finish_reason", None) if candidates else None
+        return getattr(reason, "name", reason) == "MAX_TOKENS"
+
+    async def _generate_text(
+        self, gemini_messages: List[Dict], priority, timeout, settings: GenerationSettings
+    ) -> str:
+        """Send converted messages to Gemini through the scheduler and return the reply text"""
+        history = gemini_messages[:-1] if gemini_messages else []
+
+        # Get the last message to send
+        if gemini_messages:
+            last_message = gemini_messages[-1]["parts"][0]
+        else:
+            last_message = ""
+
+        # A fresh chat session is created per attempt so a failed attempt
+        # leaves no partial history.
+        response = await self.scheduler.submit(
+            lambda: self.model.start_chat(history=history).send_message_async(
+                last_message, generation_config=settings.to_config()
+            ),
+            priority=priority,
+            tokens=self._estimate_tokens(gemini_messages),
+            timeout=timeout,
+            usage=self._usage_tokens,
+        )
+        print(f"[DEBUG] Full Gemini response content: {response}")
+
+        if settings.max_output_tokens < self.max_output_tokens and self._hit_token_limit(response):
+            # Longer than a tool call or short answer: generate it in full
+            self._generation_stats["routing_retries"] += 1
+            return await self._generate_text(
+                gemini_messages,
+                priority,
+                timeout,
+                replace(settings, max_output_tokens=self.max_output_tokens),
+            )
+
+        return response.text if hasattr(response, 'text') else str(response)
+
+    async def generate_text(
+        self,
+        messages,
+        system=None,
+        temperature=0.7,
+        stop_sequences=None,
+        priority=PRIORITY_INTERACTIVE,
+        timeout=None,
+    ) -> str:
+        return await self._generate_text(
+            self._convert_messages_for_gemini(messages, system),
+            priority,
+            timeout,
+            self._settings(temperature, stop_sequences, routing=False),
+        )
+
     def _create_tool_system_prompt(self, tools: List[Any]) -> str:
         """Create a system prompt that includes tool descriptions and usage instructions"""
         tool_descriptions = []
@@ -148,6 +306,7 @@ Available documents: deposition.md, report.pdf, financials.docx, outlook.pdf, pl
 
 When a user asks a question:
 1. If you need to use a tool to answer, respond with: TOOL_CALL: tool_name:param1=value1,param2=value2
+   For list or nested parameters, give them as one line of JSON instead: TOOL_CALL: tool_name:{{"param1": [...]}}
 2. If you don't need tools, answer naturally and conversationally
 
 Examples:
@@ -157,6 +316,9 @@ Examples:
 - User: "Change 'condenser tower' to 'cooling system' in the report"
   Assistant: TOOL_CALL: edit_document:doc_id=report.pdf,old_str=condenser tower,new_str=cooling system
 
+- User: "Rename 'Angela Smith' to 'John Doe' in the deposition and the plan"
+  Assistant: TOOL_CALL: bulk_edit:{{"operations": [{{"doc_id": "deposition.md", "pattern": "Angela Smith", "replacement": "John Doe"}}, {{"doc_id": "plan.md", "pattern": "Angela Smith", "replacement": "John Doe"}}]}}
+
 - User: "Hello, how are you?"
   Assistant: Hello! I'm doing well, thank you for asking. How can I help you today?
 
@@ -173,17 +335,20 @@ Don't refer to or mention the provided context in any way - just use it to infor
         thinking=False,
         thinking_budget=1024,
         mcp_client=None,
+        priority=PRIORITY_INTERACTIVE,
+        timeout=None,
+        speculation=None,
+        max_corrections=1,
     ) -> GeminiMessage:
         print(f"[DEBUG] chat called with messages: {messages}, system: {system}, temperature: {temperature}, stop_sequences: {stop_sequences}, tools: {tools}, thinking: {thinking}, thinking_budget: {thinking_budget}")
         
-        # Update generation config with temperature
-        self.generation_config.temperature = temperature
-
-        if stop_sequences:
-            self.generation_config.stop_sequences = stop_sequences
+        # Turns offered tools mostly reply with a one-line tool call
+        settings = self._settings(temperature, stop_sequences, routing=bool(tools))
 
         # Create enhanced system prompt with tool information
         enhanced_system = system or ""
+        if tools and self.spill_store and FETCH_TOOL not in tools:
+            tools = [*tools, FETCH_TOOL]
         if tools:
             tool_system_prompt = self._create_tool_system_prompt(tools)
             enhanced_system = f"{enhanced_system}\n\n{tool_system_prompt}" if enhanced_system else tool_system_prompt
@@ -191,20 +356,22 @@ Don't refer to or mention the provided context in any way - just use it to infor
         # Convert messages to Gemini format
         gemini_messages = self._convert_messages_for_gemini(messages, enhanced_system)
 
-        # Create chat session
-        chat = self.model.start_chat(history=gemini_messages[:-1] if gemini_messages else [])
-
-        # Get the last message to send
-        if gemini_messages:
-            last_message = gemini_messages[-1]["parts"][0]
+        if self.hedger:
+            primary = lambda: self._generate_text(gemini_messages, priority, timeout, settings)
+            if self.hedge_provider:
+                hedge = lambda: self.hedge_provider.generate_text(
+                    messages,
+                    system=enhanced_system,
+                    temperature=temperature,
+                    stop_sequences=stop_sequences,
+                    priority=priority,
+                    timeout=timeout,
+                )
+            else:
+                hedge = primary
+            response_text = await self.hedger.run(primary, hedge)
         else:
-            last_message = ""
-
-        # Generate response
-        response = chat.send_message(last_message)
-        print(f"[DEBUG] Full Gemini response content: {response}")
-        
-        response_text = response.text if hasattr(response, 'text') else str(response)
+            response_text = await self._generate_text(gemini_messages, priority, timeout, settings)
         
         # Check for tool call in the response
         tool_call_match = re.search(r'TOOL_CALL:\s*(.+)', response_text)
@@ -220,9 +387,11 @@ Don't refer to or mention the provided context in any way - just use it to infor
                     tool_name, params_str = tool_call_str.split(':', 1)
                     tool_name = tool_name.strip()
                     
-                    # Parse parameters
+                    # Parse parameters; a JSON object carries lists and nested values
                     tool_parameters = {}
-                    if params_str:
+                    if params_str.strip().startswith('{'):
+                        tool_parameters = json.loads(params_str)
+                    elif params_str:
                         param_pairs = params_str.split(',')
                         for pair in param_pairs:
                             if '=' in pair:
@@ -244,44 +413,111 @@ Don't refer to or mention the provided context in any way - just use it to infor
                             break
                     
                     if tool_function:
+                        tool_parameters, errors = validators.validate(tool_function, tool_parameters)
+                        if errors:
+                            print(f"[DEBUG] Invalid arguments for {tool_name}: {errors}")
+                            if max_corrections > 0:
+                                # Ask for a corrected call before anything is sent to a server
+                                correction = [
+                                    *messages,
+                                    {"role": ROLE_ASSISTANT, "content": response_text},
+                                    {
+                                        "role": ROLE_USER,
+                                        "content": f"{format_errors(tool_name, errors)}\nReply with a corrected TOOL_CALL.",
+                                    },
+                                ]
+                                return await self.chat(
+                                    correction,
+                                    system=system,
+                                    temperature=temperature,
+                                    stop_sequences=stop_sequences,
+                                    tools=tools,
+                                    thinking=thinking,
+                                    thinking_budget=thinking_budget,
+                                    mcp_client=mcp_client,
+                                    priority=priority,
+                                    timeout=timeout,
+                                    speculation=speculation,
+                                    max_corrections=max_corrections - 1,
+                                )
+                            return GeminiMessage(
+                                [TextBlock(f"I couldn't form a valid call to the '{tool_name}' tool. Let me provide a direct answer instead.")],
+                                stop_reason="tool_error",
+                            )
+
+                    model_text = None
+                    if tool_function is FETCH_TOOL:
+                        # Answered from the spill store, not an MCP server
+                        try:
+                            result_text, is_error = self.spill_store.fetch(tool_parameters), False
+                        except ValueError as e:
+                            result_text, is_error = str(e), True
+                    elif tool_function:
                         # Execute the tool using MCP client
                         print(f"[DEBUG] Executing tool {tool_name} with parameters {tool_parameters}")
-                        tool_result = await mcp_client.call_tool(tool_name, tool_parameters)
+                        if speculation:
+                            tool_result = await speculation.call_tool(tool_name, tool_parameters)
+                        else:
+                            tool_result = await mcp_client.call_tool(tool_name, tool_parameters)
                         
                         print(f"[DEBUG] Tool execution result: {tool_result}")
-                        
-                        # Create response with tool result
+                        result_text = self._tool_result_text(tool_result)
+                        is_error = bool(getattr(tool_result, "isError", False))
+                        if self.spill_store:
+                            # Only the model's copy is shortened; replies get the full text
+                            spilled = self.spill_store.put(result_text)
+                            if spilled is not result_text:
+                                model_text = spilled
+
+                    if tool_function:
+                        # Create response with tool result. The result text
+                        # is stored once, in the ToolResultBlock.
+                        tool_use_id = f"tool_{hash(str(tool_parameters))}"
                         content_blocks = [
                             ToolUseBlock(
-                                id=f"tool_{hash(str(tool_parameters))}",
+                                id=tool_use_id,
                                 name=tool_name,
                                 input=tool_parameters
                             ),
-                            TextBlock(f"Tool Result: {tool_result}\n\nBased on the tool result, here's the answer to your question:")
+                            ToolResultBlock(
+                                tool_use_id=tool_use_id,
+                                content=result_text,
+                                is_error=is_error,
+                                model_content=model_text,
+                            ),
                         ]
                         
                         return GeminiMessage(content_blocks, stop_reason="tool_use")
                     else:
                         print(f"[DEBUG] Tool {tool_name} not found in available tools")
-                        return GeminiMessage([TextBlock(f"Sorry, I couldn't find the tool '{tool_name}' that I tried to use. Let me provide a direct answer instead.")])
+                        return GeminiMessage(
+                            [TextBlock(f"Sorry, I couldn't find the tool '{tool_name}' that I tried to use. Let me provide a direct answer instead.")],
+                            stop_reason="tool_error",
+                        )
                         
             except json.JSONDecodeError as e:
                 print(f"[DEBUG] Failed to parse tool call JSON: {e}")
-                return GeminiMessage([TextBlock("I encountered an error while trying to use a tool. Let me provide a direct answer instead.")])
+                return GeminiMessage(
+                    [TextBlock("I encountered an error while trying to use a tool. Let me provide a direct answer instead.")],
+                    stop_reason="tool_error",
+                )
         
         # If no tool call detected, return the regular response
         return GeminiMessage([TextBlock(response_text)])
 
-    async def handle_user_query_with_tools(
+    async def query_with_tools(
         self,
         user_query: str,
         mcp_client,
         system=None,
         temperature=0.7,
         stop_sequences=None,
+        priority=PRIORITY_INTERACTIVE,
+        timeout=None,
     ) -> GeminiMessage:
         """
         Handle a user query, check if a tool is needed, and use it if required.
+        Errors are raised; `handle_user_query_with_tools` reports them instead.
 
         Args:
             user_query: The user's input query.
@@ -289,21 +525,27 @@ Don't refer to or mention the provided context in any way - just use it to infor
             system: Optional system instructions.
             temperature: Sampling temperature for response generation.
             stop_sequences: Sequences to stop generation.
+            priority: Scheduler priority; interactive turns go ahead of background work.
+            timeout: Deadline in seconds for the model call, including retries.
 
         Returns:
             GeminiMessage: The response from Gemini, including tool results if applicable.
         """
+        # Step 1: Get the list of tools from the MCP client
+        tools = await mcp_client.list_tools()
+        print(f"[DEBUG] Available tools: {[tool.name for tool in tools]}")
+
+        # Step 2: Prepare the initial messages for Gemini
+        messages = [
+            {"role": "user", "content": user_query}
+        ]
+
+        # Step 3: Generate a response from Gemini to determine if a tool is needed,
+        # reading the documents the query names in the meantime
+        speculation = (
+            self.speculator.start(mcp_client, user_query) if self.speculator else None
+        )
         try:
-            # Step 1: Get the list of tools from the MCP client
-            tools = await mcp_client.list_tools()
-            print(f"[DEBUG] Available tools: {[tool.name for tool in tools]}")
-
-            # Step 2: Prepare the initial messages for Gemini
-            messages = [
-                {"role": "user", "content": user_query}
-            ]
-
-            # Step 3: Generate a response from Gemini to determine if a tool is needed
             response = await self.chat(
                 messages=messages,
                 system=system,
@@ -311,58 +553,41 @@ Don't refer to or mention the provided context in any way - just use it to infor
                 stop_sequences=stop_sequences,
                 tools=tools,
                 mcp_client=mcp_client,  # Pass MCP client to chat function
+                priority=priority,
+                timeout=timeout,
+                speculation=speculation,
             )
-
-            # Step 4: Check if the response indicates a tool use
-            if response.stop_reason == "tool_use":
-                for block in response.content:
-                    if isinstance(block, ToolUseBlock):
-                        tool_name = block.name
-                        tool_input = block.input
-
-                        print(f"[DEBUG] Executing tool: {tool_name} with input: {tool_input}")
-
-                        # Step 5: Call the tool using the MCP client
-                        tool_result = await mcp_client.call_tool(tool_name, tool_input)
-
-                        # Step 6: Create a new response with the tool result
-                        if tool_result and hasattr(tool_result, 'content'):
-                            # Extract text from TextContent objects
-                            if isinstance(tool_result.content, list):
-                                text_parts = []
-                                for content_item in tool_result.content:
-                                    if hasattr(content_item, 'text'):
-                                        text_parts.append(content_item.text)
-                                    else:
-                                        text_parts.append(str(content_item))
-                                result_content = '\n'.join(text_parts)
-                            else:
-                                result_content = str(tool_result.content)
-                        else:
-                            result_content = str(tool_result)
-
-                        # If the tool result is empty (like edit_document), provide a success message
-                        if not result_content or result_content.strip() == "":
-                            return GeminiMessage(
-                                content=[
-                                    TextBlock(f"Successfully completed the {tool_name} operation.")
-                                ],
-                                role="assistant"
-                            )
-                        else:
-                            return GeminiMessage(
-                                content=[
-                                    TextBlock(f"{result_content}")
-                                ],
-                                role="assistant"
-                            )
-
-            # Step 7: Return the original response if no tool was used
-            return response
-
-        except Exception as e:
-            print(f"[DEBUG] Error in handle_user_query_with_tools: {e}")
-            return GeminiMessage(
-                content=[TextBlock(f"I encountered an error while processing your request: {str(e)}. Please try again.")],
-                role="assistant"
-            )
\ No newline at end of file
+        finally:
+            if speculation:
+                speculation.discard()
+
+        # Step 4: Check if the response indicates a tool use
+        if response.stop_reason == "tool_use":
+            tool_name = None
+            for block in response.content:
+                if isinstance(block, ToolUseBlock):
+                    tool_name = block.name
+
+                # Step 5: The tool already ran inside chat(); reuse its result
+                if isinstance(block, ToolResultBlock):
+                    result_content = block.content
+
+                    # If the tool result is empty (like edit_document), provide a success message
+                    if not result_content or result_content.strip() == "":
+                        return GeminiMessage(
+                            content=[
+                                TextBlock(f"Successfully completed the {tool_name} operation.")
+                            ],
+                            role="assistant"
+                        )
+                    else:
+                        # Reference the result text rather than copying it
+                        return GeminiMessage(
+                            content=[
+                                TextBlock(result_content)
+                            ],
+                            role="assistant"
+                        )
+
+        # Step 7: Return the original response if no tool was used
+        return response
@@ -0,0 +1,129 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Hedger:
+    """
+    Sends a duplicate (hedge) request when the primary one is slower than a
+    percentile of recently observed latencies, and keeps whichever finishes
+    first. The loser is cancelled.
+
+    Args:
+        percentile: Latency percentile (0-1) after which a hedge is sent.
+        window: Number of recent latencies the percentile is computed over.
+        min_samples: Latencies to observe before hedging starts.
+        min_delay: Lower bound in seconds on the hedge delay.
+        max_hedge_rate: Long-run fraction of requests allowed to be hedged.
+        burst: How many hedges the budget can accumulate for bursts of slow calls.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        window: int = 200,
+        min_samples: int = 20,
+        min_delay: float = 0.05,
+        max_hedge_rate: float = 0.1,
+        burst: float = 5.0,
+    ):
+        if not 0 < percentile < 1:
+            raise ValueError("percentile must be between 0 and 1")
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_hedge_rate = max_hedge_rate
+        self.burst = burst
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._budget = 0.0
+        self._stats = {
+            "requests": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "primary_wins": 0,
+            "skipped_budget": 0,
+            "failed_over": 0,
+        }
+
+    def threshold(self) -> Optional[float]:
+        """Current hedge delay in seconds, or None until enough samples exist."""
+        if len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(self.percentile * len(ordered)))
+        return max(self.min_delay, ordered[index])
+
+    def stats(self) -> dict[str, Any]:
+        requests = self._stats["requests"]
+        return {
+            **self._stats,
+            "hedge_rate": self._stats["hedged"] / requests if requests else 0.0,
+            "threshold_seconds": self.threshold(),
+        }
+
+    async def run(
+        self,
+        primary: Callable[[], Awaitable[T]],
+        hedge: Callable[[], Awaitable[T]],
+    ) -> T:
+        """
+        Runs `primary`, racing it against `hedge` if it is slow.
+
+        Args:
+            primary: Factory for the primary request.
+            hedge: Factory for the duplicate request (same or another provider).
+
+        Returns:
+            The result of the first request to succeed.
+        """
+        self._stats["requests"] += 1
+        self._budget = min(self.burst, self._budget + self.max_hedge_rate)
+        started = time.monotonic()
+        primary_task = asyncio.ensure_future(primary())
+
+        delay = self.threshold()
+        if delay is not None:
+            done, _ = await asyncio.wait({primary_task}, timeout=delay)
+            if not done and self._budget < 1:
+                self._stats["skipped_budget"] += 1
+                delay = None
+        if delay is None or primary_task.done():
+            try:
+                result = await primary_task
+            except BaseException:
+                primary_task.cancel()
+                raise
+            self._latencies.append(time.monotonic() - started)
+            return result
+
+        self._budget -= 1
+        self._stats["hedged"] += 1
+        print(f"[DEBUG] Primary request slower than {delay:.2f}s, sending hedge request")
+        hedge_task = asyncio.ensure_future(hedge())
+        pending = {primary_task, hedge_task}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # exception() on every finished task so no failure goes unobserved
+                failed = [task for task in done if task.exception() is not None]
+                succeeded = [task for task in done if task.exception() is None]
+                if failed:
+                    error = error or failed[0].exception()
+                if succeeded:
+                    winner = succeeded[0]
+                    won = "hedge_wins" if winner is hedge_task else "primary_wins"
+                    self._stats[won] += 1
+                    if error is not None:
+                        self._stats["failed_over"] += 1
+                    self._latencies.append(time.monotonic() - started)
+                    return winner.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
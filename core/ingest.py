@@ -0,0 +1,353 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import sys
+from collections.abc import MutableMapping
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Iterator, Mapping, Optional
+
+# Bump when extraction output changes, so cached text is not reused
+EXTRACTOR_VERSION = 1
+READ_BLOCK = 1 << 16
+
+
+def _text_sections(path: str) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        yield from iter(lambda: f.read(READ_BLOCK), "")
+
+
+def _pdf_sections(path: str) -> Iterator[str]:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ImportError("PDF support requires pypdf: pip install 'app[documents]'")
+    # Pages are parsed one at a time as they are iterated
+    for number, page in enumerate(PdfReader(path).pages):
+        yield ("\n\n" if number else "") + (page.extract_text() or "")
+
+
+def _docx_sections(path: str) -> Iterator[str]:
+    try:
+        import docx
+    except ImportError:
+        raise ImportError("DOCX support requires python-docx: pip install 'app[documents]'")
+    for paragraph in docx.Document(path).paragraphs:
+        yield paragraph.text + "\n"
+
+
+# File suffix -> generator of text sections
+EXTRACTORS: dict[str, Callable[[str], Iterator[str]]] = {
+    ".md": _text_sections,
+    ".markdown": _text_sections,
+    ".txt": _text_sections,
+    ".pdf": _pdf_sections,
+    ".docx": _docx_sections,
+}
+
+
+def is_supported(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in EXTRACTORS
+
+
+def file_digest(path: str) -> str:
+    """Content hash of a file, read in blocks; includes the extractor version."""
+    digest = hashlib.sha256(f"v{EXTRACTOR_VERSION}:".encode())
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_file(path: str, destination: str) -> int:
+    """
+    Writes the text of `path` to `destination` section by section, so a
+    large file is never held in memory whole. Runs in a worker process.
+
+    Returns:
+        Number of characters extracted.
+    """
+    extractor = EXTRACTORS[os.path.splitext(path)[1].lower()]
+    temporary = f"{destination}.{os.getpid()}.tmp"
+    written = 0
+    try:
+        with open(temporary, "w", encoding="utf-8") as out:
+            for section in extractor(path):
+                out.write(section)
+                written += len(section)
+        os.replace(temporary, destination)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return written
+
+
+class DocumentStore(MutableMapping):
+    """
+    Documents by id. Texts set directly (built-in docs, edits) are kept in
+    memory; ingested files are read from their extraction cache on access.
+    Setting an ingested doc keeps the edited text in memory until the file
+    itself changes and is ingested again.
+    """
+
+    def __init__(self, docs: Optional[Mapping[str, str]] = None):
+        self._texts: dict[str, str] = dict(docs or {})
+        self._files: dict[str, str] = {}
+        # doc id -> real path of the file it was ingested from
+        self._sources: dict[str, str] = {}
+
+    def attach(self, doc_id: str, text_path: str, source: Optional[str] = None):
+        """Backs `doc_id` by an extracted text file, ingested from `source`."""
+        self._files[doc_id] = text_path
+        self._texts.pop(doc_id, None)
+        if source is not None:
+            self._sources[doc_id] = source
+
+    def source(self, doc_id: str) -> Optional[str]:
+        """Real path of the file `doc_id` was ingested from, if any."""
+        return self._sources.get(doc_id)
+
+    def is_file_backed(self, doc_id: str) -> bool:
+        """Whether the doc's text is its ingested file, unedited."""
+        return doc_id in self._files and doc_id not in self._texts
+
+    def iter_text(self, doc_id: str) -> Iterator[str]:
+        """Streams a document's text in blocks."""
+        if doc_id in self._texts:
+            yield self._texts[doc_id]
+            return
+        yield from _text_sections(self._files[doc_id])
+
+    def __getitem__(self, doc_id: str) -> str:
+        if doc_id in self._texts:
+            return self._texts[doc_id]
+        with open(self._files[doc_id], "r", encoding="utf-8") as f:
+            return f.read()
+
+    def __setitem__(self, doc_id: str, text: str):
+        self._texts[doc_id] = text
+
+    def __delitem__(self, doc_id: str):
+        if doc_id not in self:
+            raise KeyError(doc_id)
+        self._texts.pop(doc_id, None)
+        self._files.pop(doc_id, None)
+        self._sources.pop(doc_id, None)
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self._texts or doc_id in self._files
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(dict.fromkeys([*self._texts, *self._files]))
+
+    def __len__(self) -> int:
+        return len(self._texts.keys() | self._files.keys())
+
+
+class Ingestor:
+    """
+    Extracts text from document files in a process pool.
+
+    Extracted text is cached under `cache_dir` by content hash, so an
+    unchanged file, or a renamed copy of one, is never parsed again.
+
+    Args:
+        cache_dir: Directory for extracted text files.
+        max_workers: Worker processes (defaults to the CPU count).
+    """
+
+    def __init__(self, cache_dir: str, max_workers: Optional[int] = None):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        # Forking the server's threaded process can deadlock the workers
+        self._pool = ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._stats = {"parsed": 0, "cache_hits": 0, "failed": 0}
+
+    async def ingest(self, path: str) -> str:
+        """Returns the path of the extracted text of `path`, parsing it if needed."""
+        digest = await asyncio.to_thread(file_digest, path)
+        text_path = os.path.join(self.cache_dir, f"{digest}.txt")
+        if os.path.exists(text_path):
+            self._stats["cache_hits"] += 1
+            return text_path
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._pool, extract_file, path, text_path
+            )
+        except Exception:
+            self._stats["failed"] += 1
+            raise
+        self._stats["parsed"] += 1
+        return text_path
+
+    def stats(self) -> dict[str, Any]:
+        return dict(self._stats)
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Called with (added, updated, removed) doc ids after a scan changes the store
+ChangeCallback = Callable[[list[str], list[str], list[str]], Awaitable[None]]
+
+
+class DirectoryWatcher:
+    """
+    Keeps a DocumentStore in line with a directory by polling it.
+
+    Files are matched by modification time and size, so only new or
+    changed files are hashed and handed to the ingestor. Doc ids are paths
+    relative to the directory; hidden files and directories are skipped.
+    A file whose doc id already names a document ingested from another
+    file, e.g. by the watcher of another directory, is left out and listed
+    in `conflicts` instead of replacing it.
+
+    Args:
+        directory: Directory to watch (recursively).
+        store: Store the extracted documents are attached to.
+        ingestor: Extracts the text of new and changed files.
+        interval: Seconds between scans in `run`.
+        on_change: Awaited after a scan that changed the store.
+        owns: Filter for the doc ids this store serves (all by default);
+            checked on every scan, so docs it stops owning are removed.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        store: DocumentStore,
+        ingestor: Ingestor,
+        interval: float = 2.0,
+        on_change: Optional[ChangeCallback] = None,
+        owns: Optional[Callable[[str], bool]] = None,
+    ):
+        self.directory = directory
+        self.store = store
+        self.ingestor = ingestor
+        self.interval = interval
+        self.on_change = on_change
+        self.owns = owns
+        # doc id -> (mtime_ns, size) of the file last ingested for it
+        self._seen: dict[str, tuple[int, int]] = {}
+        # Files that failed are retried only once they change
+        self._failed: dict[str, tuple[int, int]] = {}
+        # doc id -> path of a file left out because the id was taken
+        self.conflicts: dict[str, str] = {}
+        # The periodic scan and on-demand scans of a subdirectory share state
+        self._lock = asyncio.Lock()
+
+    def _list_files(self, subdirectory: str = "") -> dict[str, tuple[str, int, int]]:
+        files = {}
+        for root, dirs, names in os.walk(os.path.join(self.directory, subdirectory)):
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            for name in names:
+                path = os.path.join(root, name)
+                if name.startswith(".") or not is_supported(path):
+                    continue
+                stat = os.stat(path)
+                doc_id = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                if self.owns and not self.owns(doc_id):
+                    continue
+                files[doc_id] = (path, stat.st_mtime_ns, stat.st_size)
+        return files
+
+    async def _ingest(self, doc_id: str, path: str, signature: tuple[int, int]) -> bool:
+        try:
+            text_path = await self.ingestor.ingest(path)
+        except Exception as e:
+            print(f"[DEBUG] Could not ingest {path}: {e}", file=sys.stderr)
+            self._failed[doc_id] = signature
+            return False
+        self._failed.pop(doc_id, None)
+        self.store.attach(doc_id, text_path, os.path.realpath(path))
+        self._seen[doc_id] = signature
+        return True
+
+    def _taken(self, doc_id: str, path: str) -> bool:
+        # Ingested from another file, not by this watcher
+        source = self.store.source(doc_id)
+        return doc_id not in self._seen and source is not None and source != os.path.realpath(path)
+
+    async def scan(
+        self,
+        progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+        subdirectory: str = "",
+    ) -> tuple[list[str], list[str], list[str]]:
+        """
+        Ingests new and changed files and drops deleted ones, in the whole
+        directory or only in `subdirectory` of it. `progress` is awaited
+        with (files done, files to ingest) as files finish.
+
+        Returns:
+            Added, updated and removed doc ids.
+        """
+        async with self._lock:
+            return await self._scan(progress, subdirectory)
+
+    async def _scan(
+        self,
+        progress: Optional[Callable[[int, int], Awaitable[None]]],
+        subdirectory: str,
+    ) -> tuple[list[str], list[str], list[str]]:
+        files = await asyncio.to_thread(self._list_files, subdirectory)
+        prefix = subdirectory.replace(os.sep, "/").strip("/")
+        prefix = f"{prefix}/" if prefix and prefix != "." else ""
+
+        def in_scope(doc_id: str) -> bool:
+            return doc_id.startswith(prefix)
+
+        for doc_id in [doc_id for doc_id in self.conflicts if in_scope(doc_id)]:
+            del self.conflicts[doc_id]
+        for doc_id, (path, _, _) in list(files.items()):
+            if self._taken(doc_id, path):
+                print(f"[DEBUG] Skipping {path}: doc id {doc_id} is taken by {self.store.source(doc_id)}", file=sys.stderr)
+                self.conflicts[doc_id] = path
+                del files[doc_id]
+
+        changed = {
+            doc_id: entry
+            for doc_id, entry in files.items()
+            if entry[1:] not in (self._seen.get(doc_id), self._failed.get(doc_id))
+        }
+        removed = [doc_id for doc_id in self._seen if in_scope(doc_id) and doc_id not in files]
+        for doc_id in [doc_id for doc_id in self._failed if in_scope(doc_id) and doc_id not in files]:
+            del self._failed[doc_id]
+        for doc_id in removed:
+            del self._seen[doc_id]
+            self.store.pop(doc_id, None)
+
+        known = set(self._seen)
+        done = 0
+
+        async def ingest(doc_id: str, path: str, signature: tuple[int, int]) -> bool:
+            nonlocal done
+            ok = await self._ingest(doc_id, path, signature)
+            done += 1
+            if progress:
+                await progress(done, len(changed))
+            return ok
+
+        results = await asyncio.gather(
+            *(
+                ingest(doc_id, path, (mtime, size))
+                for doc_id, (path, mtime, size) in changed.items()
+            )
+        )
+        ingested = [doc_id for doc_id, ok in zip(changed, results) if ok]
+        added = [doc_id for doc_id in ingested if doc_id not in known]
+        updated = [doc_id for doc_id in ingested if doc_id in known]
+
+        if self.on_change and (added or updated or removed):
+            await self.on_change(added, updated, removed)
+        return added, updated, removed
+
+    async def run(self):
+        """Scans the directory every `interval` seconds until cancelled."""
+        while True:
+            try:
+                await self.scan()
+            except Exception as e:
+                print(f"[DEBUG] Scanning {self.directory} failed: {e}", file=sys.stderr)
+            await asyncio.sleep(self.interval)
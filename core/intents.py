@@ -0,0 +1,182 @@
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Iterable, Optional
+
+from core.validation import validators
+
+if TYPE_CHECKING:
+    from mcp.types import Tool
+    from mcp_client import MCPClient
+
+DOCS_URI = "docs://documents"
+
+READ_VERBS = r"read|show|open|display|print|view|cat"
+EDIT_VERBS = r"replace|change|substitute|swap"
+SEARCH_VERBS = r"search|find|look\s+up"
+
+# Optional politeness around a command
+_LEAD = r"\s*(?:(?:please|can\s+you|could\s+you)\s+)?"
+_TAIL = r"(?:\s+please)?\s*[.!?]?\s*"
+
+# Every pattern starts with one of the verbs; other turns need no tool list
+_COMMAND = re.compile(_LEAD + rf"(?:{READ_VERBS}|{EDIT_VERBS}|{SEARCH_VERBS})\b", re.IGNORECASE)
+
+
+def _quoted(name: str) -> str:
+    # Text in matching single, double or back quotes
+    return rf"(?P<{name}_q>['\"`])(?P<{name}>.+?)(?P={name}_q)"
+
+
+def _doc(names: str) -> str:
+    return (
+        r"(?:(?:the\s+)?(?:doc(?:ument)?|file)\s+)?@?"
+        rf"(?P<doc_id>{names})"
+        r"(?:\s+(?:doc(?:ument)?|file))?"
+    )
+
+
+@dataclass(frozen=True)
+class Intent:
+    tool_name: str
+    arguments: dict[str, str]
+
+
+class IntentRouter:
+    """
+    Maps utterances that fully determine a tool call, such as "read
+    report.pdf" or "replace 'X' with 'Y' in plan.md", to that call without
+    asking the model.
+
+    Patterns are compiled from the tool schemas and the current doc ids:
+    read-only tools taking just a `doc_id` get "read/show/open <doc>",
+    tools taking `doc_id` plus an old and a new string get "replace 'old'
+    with 'new' in <doc>", and read-only tools taking just a `query` get
+    "search for 'query'". Values other than doc ids must be quoted. An
+    utterance matching no pattern, patterns of more than one tool, or
+    with arguments the tool's schema rejects is left to the model.
+    """
+
+    def __init__(self):
+        self._key: Optional[tuple] = None
+        self._patterns: list[tuple[str, re.Pattern, dict[str, str]]] = []
+        # Case-folded doc id -> doc id, None where two ids fold together
+        self._doc_ids: dict[str, Optional[str]] = {}
+        self._stats = {"routed": 0, "fell_through": 0, "routed_seconds": 0.0}
+
+    @staticmethod
+    def _params(tool: "Tool") -> tuple[set[str], dict[str, Any]]:
+        schema = tool.inputSchema or {}
+        return set(schema.get("required") or []), schema.get("properties") or {}
+
+    def compile(self, tools: Iterable["Tool"], doc_ids: Iterable[str]):
+        tools = list(tools)
+        doc_ids = sorted(doc_ids)
+        key = (
+            tuple((tool.name, bool(tool.annotations and tool.annotations.readOnlyHint)) for tool in tools),
+            tuple(doc_ids),
+        )
+        if key == self._key:
+            return
+        self._key = key
+        self._doc_ids = {}
+        for doc_id in doc_ids:
+            self._doc_ids[doc_id.casefold()] = None if doc_id.casefold() in self._doc_ids else doc_id
+
+        # Longest first, so "plan.md.bak" is not matched as "plan.md"
+        names = "|".join(re.escape(doc_id) for doc_id in sorted(doc_ids, key=len, reverse=True))
+        self._patterns = []
+        for tool in tools:
+            required, properties = self._params(tool)
+            read_only = bool(tool.annotations and tool.annotations.readOnlyHint)
+            if read_only and required == {"doc_id"} and names:
+                grammar = (
+                    rf"(?:{READ_VERBS})(?:\s+me)?(?:\s+the)?"
+                    r"(?:\s+(?:contents?|text)\s+of)?\s+" + _doc(names)
+                )
+                self._add(tool.name, grammar, {})
+            elif read_only and required == {"query"}:
+                grammar = (
+                    rf"(?:{SEARCH_VERBS})(?:\s+(?:the\s+)?(?:docs|documents))?"
+                    r"\s+(?:for\s+)?" + _quoted("query")
+                )
+                self._add(tool.name, grammar, {})
+            elif "doc_id" in required and len(required) == 3 and names:
+                old = next((name for name in required if "old" in name), None)
+                new = next((name for name in required if "new" in name), None)
+                if old and new and all(properties.get(name, {}).get("type") == "string" for name in (old, new)):
+                    grammar = (
+                        rf"(?:{EDIT_VERBS})\s+" + _quoted("old")
+                        + r"\s+(?:with|to|by|for)\s+" + _quoted("new")
+                        + r"\s+in\s+" + _doc(names)
+                    )
+                    self._add(tool.name, grammar, {"old": old, "new": new})
+
+    def _add(self, tool_name: str, grammar: str, renames: dict[str, str]):
+        pattern = re.compile(_LEAD + grammar + _TAIL, re.IGNORECASE | re.DOTALL)
+        self._patterns.append((tool_name, pattern, renames))
+
+    def match(self, text: str) -> Optional[Intent]:
+        """The tool call `text` determines, or None if it is not unambiguous."""
+        intents = set()
+        for tool_name, pattern, renames in self._patterns:
+            match = pattern.fullmatch(text)
+            if not match:
+                continue
+            arguments = {}
+            for group, value in match.groupdict().items():
+                if value is None or group.endswith("_q"):
+                    continue
+                if group == "doc_id":
+                    value = self._doc_ids.get(value.casefold())
+                    if value is None:
+                        return None
+                arguments[renames.get(group, group)] = value
+            intents.add((tool_name, tuple(sorted(arguments.items()))))
+        if len(intents) != 1:
+            return None
+        tool_name, arguments = intents.pop()
+        return Intent(tool_name, dict(arguments))
+
+    async def route(self, text: str, mcp_client: "MCPClient") -> Optional[Intent]:
+        """
+        Matches `text` against patterns for the client's current tools and
+        docs. Both come from the client's caches, which change
+        notifications refresh, and are only looked at for turns starting
+        with a command verb.
+        """
+        if not _COMMAND.match(text):
+            self._stats["fell_through"] += 1
+            return None
+        tools = await mcp_client.list_tools()
+        doc_ids = getattr(mcp_client, "doc_ids", None)
+        if doc_ids is None:
+            try:
+                doc_ids = set(await mcp_client.read_resource(DOCS_URI))
+            except Exception:
+                # Servers without a docs listing
+                doc_ids = set()
+        self.compile(tools, doc_ids)
+        intent = self.match(text)
+        if intent:
+            # Checked as the model's tool calls are, before anything is sent
+            tool = next(tool for tool in tools if tool.name == intent.tool_name)
+            arguments, errors = validators.validate(tool, intent.arguments)
+            if errors:
+                print(f"[DEBUG] Invalid arguments for {intent.tool_name}: {errors}")
+                intent = None
+            else:
+                intent = Intent(intent.tool_name, arguments)
+        self._stats["routed" if intent else "fell_through"] += 1
+        return intent
+
+    def record(self, seconds: float):
+        """Records the time a routed turn took, tool call included."""
+        self._stats["routed_seconds"] += seconds
+
+    def stats(self) -> dict[str, Any]:
+        routed = self._stats["routed"]
+        return {
+            "routed": routed,
+            "fell_through": self._stats["fell_through"],
+            "avg_routed_ms": round(1000 * self._stats["routed_seconds"] / routed, 2) if routed else None,
+        }
@@ -0,0 +1,277 @@
+import asyncio
+import itertools
+import json
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional
+
+from mcp import types
+
+if TYPE_CHECKING:
+    from mcp_client import MCPClient
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = frozenset({SUCCEEDED, FAILED, CANCELLED})
+
+# Server tools that track jobs; see the job_* tools in mcp_server.py
+JOB_TOOLS = frozenset({"job_status", "job_wait", "job_cancel"})
+
+# Seconds one job_wait request blocks on the server before it is repeated
+WAIT_SECONDS = 30.0
+
+# Called with (progress, total, message)
+ProgressFn = Callable[[float, Optional[float], Optional[str]], Awaitable[None]]
+
+
+class Job:
+    """A tool call running in the background on the server."""
+
+    def __init__(self, job_id: str, tool_name: str):
+        self.id = job_id
+        self.tool_name = tool_name
+        self.status = PENDING
+        self.progress = 0.0
+        self.total: Optional[float] = None
+        self.message: Optional[str] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        # Replaced on every change; waiters hold the one they saw
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    def _touch(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def report(self, progress: float, total: Optional[float] = None, message: Optional[str] = None):
+        """Progress callback handed to the job's work."""
+        self.progress = progress
+        self.total = total
+        self.message = message
+        self._touch()
+
+    def snapshot(self) -> dict[str, Any]:
+        snapshot = {
+            "job_id": self.id,
+            "tool": self.tool_name,
+            "status": self.status,
+            "progress": self.progress,
+            "total": self.total,
+            "message": self.message,
+            "elapsed": round((self.finished or time.time()) - self.created, 3),
+        }
+        if self.status == SUCCEEDED:
+            snapshot["result"] = self.result
+        elif self.status == FAILED:
+            snapshot["error"] = self.error
+        return snapshot
+
+
+class JobManager:
+    """
+    Runs long tool calls as background jobs on the server's event loop.
+
+    `submit` starts the work and returns its job at once; the tool returns
+    the job's snapshot as a handle. The work gets a progress callback,
+    which `wait` forwards to the waiting request as MCP progress
+    notifications. Finished jobs are kept for `retention` seconds.
+
+    Args:
+        prefix: Prepended to job ids, e.g. the shard name, so ids are
+            unique across server processes.
+        retention: Seconds a finished job stays queryable.
+    """
+
+    def __init__(self, prefix: str = "job", retention: float = 600.0):
+        self.prefix = prefix
+        self.retention = retention
+        self.jobs: dict[str, Job] = {}
+        self._ids = itertools.count(1)
+        self._stats = {"submitted": 0, "succeeded": 0, "failed": 0, "cancelled": 0}
+
+    def submit(self, tool_name: str, work: Callable[[ProgressFn], Awaitable[Any]]) -> Job:
+        self._prune()
+        job = Job(f"{self.prefix}:{next(self._ids)}", tool_name)
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, work))
+        self._stats["submitted"] += 1
+        return job
+
+    async def _run(self, job: Job, work: Callable[[ProgressFn], Awaitable[Any]]):
+        job.status = RUNNING
+        job._touch()
+        try:
+            job.result = await work(job.report)
+            self._finish(job, SUCCEEDED)
+        except asyncio.CancelledError:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, FAILED)
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished = time.time()
+        self._stats[status] += 1
+        job._touch()
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done and job.finished < cutoff]:
+            del self.jobs[job_id]
+
+    def get(self, job_id: str) -> Job:
+        if job_id not in self.jobs:
+            raise ValueError(f"Job {job_id} not found; finished jobs are kept for {self.retention:.0f}s")
+        return self.jobs[job_id]
+
+    async def wait(self, job_id: str, timeout: float, on_progress: Optional[ProgressFn] = None) -> Job:
+        """Waits up to `timeout` seconds for the job to finish, reporting its progress."""
+        job = self.get(job_id)
+        deadline = time.monotonic() + timeout
+        while True:
+            changed = job._changed
+            if on_progress:
+                await on_progress(job.progress, job.total, job.message)
+            remaining = deadline - time.monotonic()
+            if job.done or remaining <= 0:
+                return job
+            try:
+                await asyncio.wait_for(changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return job
+
+    async def cancel(self, job_id: str) -> Job:
+        job = self.get(job_id)
+        if not job.done and job.task:
+            job.task.cancel()
+            await asyncio.wait([job.task])
+        if not job.done:
+            # Cancelled before its task started, so _run never ran
+            self._finish(job, CANCELLED)
+        return job
+
+    def stats(self) -> dict[str, Any]:
+        running = sum(1 for job in self.jobs.values() if not job.done)
+        return {**self._stats, "running": running}
+
+
+def job_handle(result: Optional[types.CallToolResult]) -> Optional[dict[str, Any]]:
+    """The job snapshot a tool returned, if it returned one."""
+    if result is None or result.isError:
+        return None
+    value = result.structuredContent
+    if value is None:
+        texts = [item.text for item in result.content if isinstance(item, types.TextContent)]
+        try:
+            value = json.loads(texts[0]) if len(texts) == 1 else None
+        except json.JSONDecodeError:
+            return None
+    if isinstance(value, dict) and isinstance(value.get("result"), dict) and len(value) == 1:
+        # FastMCP wraps dict results of annotated tools
+        value = value["result"]
+    if isinstance(value, dict) and "job_id" in value and "status" in value:
+        return value
+    return None
+
+
+class JobTracker:
+    """
+    Follows the jobs a client's tool calls started, so turns return as
+    soon as a job is submitted and the conversation goes on meanwhile.
+
+    Each job is awaited in a background task through repeated `job_wait`
+    calls, which stream the job's progress. `poll`, `wait` and `cancel`
+    work for any job id. Callbacks registered with `on_finished` are
+    called with the final snapshot.
+
+    Args:
+        client: MCPClient (or ShardedMCPClient) serving the job tools.
+    """
+
+    def __init__(self, client: "MCPClient"):
+        self.client = client
+        # job id -> latest snapshot
+        self.jobs: dict[str, dict[str, Any]] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._on_finished: list[Callable[[dict[str, Any]], Any]] = []
+
+    def on_finished(self, callback: Callable[[dict[str, Any]], Any]):
+        self._on_finished.append(callback)
+
+    def observe(self, result: Optional[types.CallToolResult]):
+        """Starts following the job `result` is a handle for, if any."""
+        handle = job_handle(result)
+        if handle and handle["job_id"] not in self._tasks:
+            self.jobs[handle["job_id"]] = handle
+            if handle["status"] not in FINISHED:
+                self._tasks[handle["job_id"]] = asyncio.create_task(self._follow(handle["job_id"]))
+
+    async def _follow(self, job_id: str):
+        try:
+            snapshot = await self.wait(job_id)
+        except Exception as e:
+            snapshot = {**self.jobs[job_id], "status": FAILED, "error": f"Lost track of the job: {e}"}
+            self.jobs[job_id] = snapshot
+        finally:
+            self._tasks.pop(job_id, None)
+        for callback in self._on_finished:
+            callback(snapshot)
+
+    async def _call(self, tool_name: str, arguments: dict, **kwargs) -> dict[str, Any]:
+        result = await self.client.call_tool(tool_name, arguments, **kwargs)
+        if result is None or result.isError:
+            text = " ".join(getattr(item, "text", "") for item in (result.content if result else []))
+            raise RuntimeError(text or f"{tool_name} failed")
+        snapshot = job_handle(result)
+        if snapshot is None:
+            raise RuntimeError(f"{tool_name} did not return a job")
+        self.jobs[snapshot["job_id"]] = snapshot
+        return snapshot
+
+    async def poll(self, job_id: str) -> dict[str, Any]:
+        return await self._call("job_status", {"job_id": job_id})
+
+    async def wait(
+        self,
+        job_id: str,
+        timeout: Optional[float] = None,
+        on_progress: Optional[ProgressFn] = None,
+    ) -> dict[str, Any]:
+        """Waits for the job to finish (or `timeout` seconds); returns its snapshot."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        async def progress(value: float, total: Optional[float], message: Optional[str]):
+            self.jobs[job_id] = {**self.jobs.get(job_id, {}), "progress": value, "total": total, "message": message}
+            if on_progress:
+                await on_progress(value, total, message)
+
+        while True:
+            wait = WAIT_SECONDS if deadline is None else max(0.0, min(WAIT_SECONDS, deadline - time.monotonic()))
+            snapshot = await self._call(
+                "job_wait",
+                {"job_id": job_id, "timeout": wait},
+                timeout=wait + WAIT_SECONDS,
+                progress_callback=progress,
+            )
+            if snapshot["status"] in FINISHED or (deadline is not None and time.monotonic() >= deadline):
+                return snapshot
+
+    async def cancel(self, job_id: str) -> dict[str, Any]:
+        return await self._call("job_cancel", {"job_id": job_id})
+
+    def running(self) -> list[dict[str, Any]]:
+        return [snapshot for snapshot in self.jobs.values() if snapshot.get("status") not in FINISHED]
+
+    def close(self):
+        for task in self._tasks.values():
+            task.cancel()
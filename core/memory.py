@@ -0,0 +1,222 @@
+import os
+import sys
+import tracemalloc
+import types
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional
+
+MB = 1024 * 1024
+
+# Objects whose size is not theirs to account for, or that lead everywhere
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.MethodType, types.BuiltinFunctionType)
+_ATOMIC = (str, bytes, bytearray, int, float, complex, bool, type(None))
+
+
+def deep_size(obj: Any, seen: Optional[set[int]] = None) -> int:
+    """
+    Bytes held by `obj` and everything reachable from it through
+    containers, instance dicts and slots. Objects already in `seen` are
+    not counted again.
+    """
+    seen = set() if seen is None else seen
+    size = 0
+    pending = [obj]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, _OPAQUE):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, _ATOMIC):
+            continue
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            pending.extend(obj)
+        else:
+            if hasattr(obj, "__dict__"):
+                pending.append(obj.__dict__)
+            for cls in type(obj).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    value = getattr(obj, slot, None)
+                    if value is not None:
+                        pending.append(value)
+    return size
+
+
+def container_memory_limit() -> Optional[int]:
+    """The cgroup (v2 or v1) memory limit of this process, if there is one."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # v1 reports "no limit" as a huge number
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    return None
+
+
+def resident_bytes() -> Optional[int]:
+    """Current resident set size, where /proc is available."""
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@dataclass
+class MemoryAccount:
+    name: str
+    roots: Callable[[], Iterable[Any]]
+    evict: Optional[Callable[[int], None]]
+    budget: Optional[int]
+    priority: int
+    bytes: int = 0
+    evictions: int = 0
+    evicted_bytes: int = 0
+
+
+class MemoryWatchdog:
+    """
+    Attributes memory to named accounts (session history, tool results,
+    caches) and evicts from them when budgets are exceeded.
+
+    Each account gives the objects it owns and a callback that frees about
+    the given number of bytes, e.g. by compacting history or clearing a
+    cache. Accounts are measured in registration order and an object
+    reachable from several accounts is charged to the first one, so the
+    total is not counted twice. An account over its own budget is evicted
+    from directly. When the Python memory traced by tracemalloc goes over
+    `high_water` of the process budget, accounts are evicted in priority
+    order until it is back under `low_water`.
+
+    Measuring walks everything the accounts own, so `check`, called after
+    every turn, only measures every `check_every` calls. The traced total
+    costs nothing to read and is looked at on every call, so pressure on
+    the process budget is handled at once.
+
+    Args:
+        budget: Process budget in bytes for traced Python memory (None = no
+            process-wide eviction).
+        session_budget: Budget in bytes for one session's history.
+        high_water: Fraction of `budget` that triggers eviction.
+        low_water: Fraction of `budget` eviction aims for.
+        nframes: Traceback depth recorded by tracemalloc.
+        check_every: Calls of `check` between measurements of the accounts.
+    """
+
+    def __init__(
+        self,
+        budget: Optional[int] = None,
+        session_budget: Optional[int] = None,
+        high_water: float = 0.9,
+        low_water: float = 0.7,
+        nframes: int = 1,
+        check_every: int = 10,
+    ):
+        self.budget = budget
+        self.session_budget = session_budget
+        self.high_water = high_water
+        self.low_water = low_water
+        self.check_every = check_every
+        self.accounts: dict[str, MemoryAccount] = {}
+        self._stats = {"checks": 0, "measurements": 0, "pressure_events": 0}
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(nframes)
+
+    def register(
+        self,
+        name: str,
+        roots: Callable[[], Iterable[Any]],
+        evict: Optional[Callable[[int], None]] = None,
+        budget: Optional[int] = None,
+        priority: int = 0,
+    ):
+        """
+        Adds an account. `roots` returns the objects it owns; `evict` is
+        called with the number of bytes to free. Accounts with a lower
+        `priority` are evicted from first under process pressure.
+        """
+        self.accounts[name] = MemoryAccount(name, roots, evict, budget, priority)
+
+    def measure(self) -> dict[str, int]:
+        seen: set[int] = set()
+        for account in self.accounts.values():
+            account.bytes = sum(deep_size(root, seen) for root in account.roots())
+        return {name: account.bytes for name, account in self.accounts.items()}
+
+    def _evict(self, account: MemoryAccount, excess: int):
+        if account.evict is None or excess <= 0:
+            return
+        before = account.bytes
+        account.evict(excess)
+        account.bytes = sum(deep_size(root) for root in account.roots())
+        account.evictions += 1
+        freed = max(0, before - account.bytes)
+        account.evicted_bytes += freed
+        if freed:
+            print(f"[DEBUG] Evicted {freed} bytes from {account.name}")
+
+    def check(self, force: bool = False):
+        """
+        Evicts where budgets are exceeded. Accounts are measured every
+        `check_every` calls, when `force` is set, or when traced memory is
+        over the high-water mark.
+        """
+        self._stats["checks"] += 1
+        traced, _ = tracemalloc.get_traced_memory()
+        pressure = self.budget is not None and traced > self.budget * self.high_water
+        if not (force or pressure or self._stats["checks"] % self.check_every == 0):
+            return
+
+        self._stats["measurements"] += 1
+        self.measure()
+        for account in self.accounts.values():
+            if account.budget is not None and account.bytes > account.budget:
+                self._evict(account, account.bytes - int(account.budget * self.low_water))
+
+        if self.budget is None:
+            return
+        traced, _ = tracemalloc.get_traced_memory()
+        if traced <= self.budget * self.high_water:
+            return
+        self._stats["pressure_events"] += 1
+        for account in sorted(self.accounts.values(), key=lambda account: account.priority):
+            self._evict(account, traced - int(self.budget * self.low_water))
+            traced, _ = tracemalloc.get_traced_memory()
+            if traced <= self.budget * self.low_water:
+                break
+
+    def stats(self, top: int = 5) -> dict[str, Any]:
+        """Account sizes as of the last measurement; `top` > 0 also snapshots the top allocation sites."""
+        traced, peak = tracemalloc.get_traced_memory()
+        attributed = sum(account.bytes for account in self.accounts.values())
+        top_allocations = []
+        if top > 0:
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__)]
+            )
+            top_allocations = [str(stat) for stat in snapshot.statistics("lineno")[:top]]
+        return {
+            **self._stats,
+            "budget_mb": round(self.budget / MB, 2) if self.budget else None,
+            "traced_mb": round(traced / MB, 2),
+            "peak_mb": round(peak / MB, 2),
+            "resident_mb": round(resident_bytes() / MB, 2) if resident_bytes() else None,
+            "unattributed_mb": round(max(0, traced - attributed) / MB, 2),
+            "accounts": {
+                name: {
+                    "mb": round(account.bytes / MB, 3),
+                    "budget_mb": round(account.budget / MB, 2) if account.budget else None,
+                    "evictions": account.evictions,
+                    "evicted_mb": round(account.evicted_bytes / MB, 3),
+                }
+                for name, account in self.accounts.items()
+            },
+            "top_allocations": top_allocations,
+        }
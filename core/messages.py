@@ -0,0 +1,54 @@
+import sys
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Union
+
+# Roles are compared and stored on every message, so keep one shared copy
+ROLE_USER = sys.intern("user")
+ROLE_ASSISTANT = sys.intern("assistant")
+
+
+@dataclass(slots=True)
+class TextBlock:
+    """Wrapper class to mimic Anthropic's text block structure"""
+    text: str
+    type: str = field(default="text", init=False)
+
+
+@dataclass(slots=True)
+class ToolUseBlock:
+    """Wrapper class to mimic tool use in messages"""
+    id: str
+    name: str
+    input: dict
+    type: str = field(default="tool_use", init=False)
+
+
+@dataclass(slots=True)
+class ToolResultBlock:
+    """
+    Result of a tool call. The text is kept here once and referenced from
+    replies and history instead of being copied into other blocks.
+    `model_content` is the shorter view sent to the model in its place
+    when the result was spilled.
+    """
+    tool_use_id: str
+    content: str
+    is_error: bool = False
+    model_content: Optional[str] = None
+    type: str = field(default="tool_result", init=False)
+
+
+Block = Union[TextBlock, ToolUseBlock, ToolResultBlock]
+
+
+@dataclass(slots=True)
+class GeminiMessage:
+    """Wrapper class to mimic Anthropic's Message structure"""
+    content: Union[List[Any], str]
+    role: str = ROLE_ASSISTANT
+    stop_reason: Optional[str] = None
+
+    def __post_init__(self):
+        if not isinstance(self.content, list):
+            self.content = [TextBlock(self.content)]
+        self.role = sys.intern(self.role)
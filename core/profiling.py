@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Optional
+
+# Seconds between samples of the event loop thread
+SAMPLE_INTERVAL = 0.001
+
+IDLE = "(awaiting I/O)"
+LOOP = "(event loop)"
+
+
+def _label(code, line: Optional[int], root: str) -> str:
+    """`root` is the working directory plus a separator, taken once per profile."""
+    name = getattr(code, "co_qualname", code.co_name)
+    filename = code.co_filename
+    if filename.startswith(root):
+        filename = filename[len(root) :]
+    else:
+        filename = os.path.basename(filename)
+    # Collapsed stacks separate frames with ';'
+    return f"{name} ({filename}:{line or code.co_firstlineno})".replace(";", ",")
+
+
+def _is_handle_run(frame) -> bool:
+    code = frame.f_code
+    return code.co_name == "_run" and code.co_filename.endswith(os.path.join("asyncio", "events.py"))
+
+
+def _thread_stack(frame, root: str) -> tuple[list[str], bool]:
+    """
+    Labels of `frame` and its callers, outermost first, cut below the
+    callback the event loop is running. Also whether the loop is idle in
+    its selector.
+    """
+    idle = frame.f_code.co_filename.endswith("selectors.py")
+    stack = []
+    while frame is not None and not _is_handle_run(frame):
+        stack.append(_label(frame.f_code, frame.f_lineno, root))
+        frame = frame.f_back
+    stack.reverse()
+    return stack, idle
+
+
+def _await_stack(task: "asyncio.Task", root: str) -> list[str]:
+    """Labels of the coroutines `task` is suspended in, outermost first."""
+    stack = []
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None) or getattr(
+            awaitable, "ag_frame", None
+        )
+        if frame is None:
+            if isinstance(awaitable, asyncio.Future):
+                stack.append(f"await {type(awaitable).__name__}")
+            break
+        stack.append(_label(frame.f_code, frame.f_lineno, root))
+        awaitable = (
+            getattr(awaitable, "cr_await", None)
+            or getattr(awaitable, "gi_yieldfrom", None)
+            or getattr(awaitable, "ag_await", None)
+        )
+    return stack
+
+
+class TurnProfiler:
+    """
+    Sampling profiler for one chat turn.
+
+    A background thread samples the event loop thread every `interval`
+    seconds. Each sample is rooted at the asyncio task running at that
+    moment, so time is split across task switches. While the loop is idle
+    in its selector, the sample is the stack of coroutines the turn is
+    suspended in, ending in "(awaiting I/O)": MCP and model calls show up
+    as the awaits they are waiting on. Nothing runs outside `start` and
+    `stop`.
+
+    Args:
+        name: Profile name used in the output files.
+        interval: Seconds between samples.
+    """
+
+    def __init__(self, name: str = "turn", interval: float = SAMPLE_INTERVAL):
+        self.name = name
+        self.interval = interval
+        # Stack (outermost first) -> sampled seconds
+        self.samples: Counter[tuple[str, ...]] = Counter()
+        # Stacks in sample order with their weights, for the timeline view
+        self.timeline: list[tuple[tuple[str, ...], float]] = []
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Starts sampling the calling thread's running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._turn_task = asyncio.current_task()
+        self._thread_id = threading.get_ident()
+        self._root = os.getcwd() + os.sep
+        self._started = time.perf_counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="turn-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.duration = time.perf_counter() - self._started
+
+    async def __aenter__(self) -> "TurnProfiler":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.stop()
+
+    def _sample(self) -> Optional[tuple[str, ...]]:
+        frame = sys._current_frames().get(self._thread_id)
+        if frame is None:
+            return None
+        stack, idle = _thread_stack(frame, self._root)
+        task = asyncio.current_task(self._loop)
+        if task is not None:
+            return (f"task {task.get_name()}", *stack)
+        if idle and self._turn_task is not None:
+            return (f"task {self._turn_task.get_name()}", *_await_stack(self._turn_task, self._root), IDLE)
+        return (LOOP, *stack)
+
+    def _sample_loop(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            stack = self._sample()
+            now = time.perf_counter()
+            # A sample taken while stopping shows only the profiler itself
+            if stack and not self._stop.is_set():
+                self.samples[stack] += now - last
+                self.timeline.append((stack, now - last))
+            last = now
+
+    def collapsed(self) -> str:
+        """Collapsed stacks (flamegraph.pl / inferno input), weighted in microseconds."""
+        return "".join(
+            f"{';'.join(stack)} {round(seconds * 1e6)}\n"
+            for stack, seconds in sorted(self.samples.items())
+            if round(seconds * 1e6)
+        )
+
+    def speedscope(self) -> dict[str, Any]:
+        """The profile in speedscope's file format."""
+        frames: dict[str, int] = {}
+        samples = []
+        weights = []
+        for stack, seconds in self.timeline:
+            samples.append([frames.setdefault(label, len(frames)) for label in stack])
+            weights.append(seconds)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": [{"name": label} for label in frames]},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": self.name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+            "name": self.name,
+            "activeProfileIndex": 0,
+            "exporter": "chat-agent",
+        }
+
+    def write(self, directory: str) -> dict[str, str]:
+        """Writes `<name>.collapsed` and `<name>.speedscope.json`; returns their paths."""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.name)
+        paths = {"collapsed": base + ".collapsed", "speedscope": base + ".speedscope.json"}
+        with open(paths["collapsed"], "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        with open(paths["speedscope"], "w", encoding="utf-8") as f:
+            json.dump(self.speedscope(), f)
+        return paths
+
+    def summary(self, top: int = 10) -> list[tuple[str, float]]:
+        """Frames with the most inclusive sampled time, in seconds."""
+        inclusive: Counter[str] = Counter()
+        for stack, seconds in self.samples.items():
+            for label in set(stack):
+                inclusive[label] += seconds
+        return [(label, round(seconds, 4)) for label, seconds in inclusive.most_common(top)]
@@ -0,0 +1,123 @@
+from abc import ABC, abstractmethod
+from typing import Any
+
+from core.messages import ROLE_ASSISTANT, ROLE_USER, GeminiMessage, TextBlock
+from core.scheduler import PRIORITY_INTERACTIVE
+
+
+class LLMProvider(ABC):
+    """
+    Async interface shared by the model backends.
+
+    `chat` sends a conversation to the model; `query_with_tools` answers a
+    single user query, calling MCP tools as needed, and raises on failure so
+    callers such as the router can fail over. `handle_user_query_with_tools`
+    is the forgiving variant used by the chat loop.
+    """
+
+    name = "provider"
+
+    @abstractmethod
+    async def chat(
+        self,
+        messages,
+        system=None,
+        temperature=0.7,
+        stop_sequences=None,
+        tools=None,
+        priority=PRIORITY_INTERACTIVE,
+        timeout=None,
+        **kwargs,
+    ) -> Any:
+        ...
+
+    @abstractmethod
+    async def query_with_tools(
+        self,
+        user_query: str,
+        mcp_client,
+        system=None,
+        temperature=0.7,
+        stop_sequences=None,
+        priority=PRIORITY_INTERACTIVE,
+        timeout=None,
+    ) -> Any:
+        ...
+
+    async def generate_text(
+        self,
+        messages,
+        system=None,
+        temperature=0.7,
+        stop_sequences=None,
+        priority=PRIORITY_INTERACTIVE,
+        timeout=None,
+    ) -> str:
+        """Plain text completion without tools, e.g. for hedged requests."""
+        message = await self.chat(
+            messages,
+            system=system,
+            temperature=temperature,
+            stop_sequences=stop_sequences,
+            priority=priority,
+            timeout=timeout,
+        )
+        return self.text_from_message(message)
+
+    async def handle_user_query_with_tools(
+        self,
+        user_query: str,
+        mcp_client,
+        system=None,
+        temperature=0.7,
+        stop_sequences=None,
+        priority=PRIORITY_INTERACTIVE,
+        timeout=None,
+    ) -> Any:
+        """Like `query_with_tools`, but reports errors as a reply message."""
+        try:
+            return await self.query_with_tools(
+                user_query,
+                mcp_client,
+                system=system,
+                temperature=temperature,
+                stop_sequences=stop_sequences,
+                priority=priority,
+                timeout=timeout,
+            )
+        except Exception as e:
+            print(f"[DEBUG] Error in handle_user_query_with_tools: {e}")
+            return self.text_message(
+                f"I encountered an error while processing your request: {str(e)}. Please try again."
+            )
+
+    def text_message(self, text: str) -> GeminiMessage:
+        return GeminiMessage(content=[TextBlock(text)], role=ROLE_ASSISTANT)
+
+    def add_user_message(self, messages: list, message):
+        messages.append({"role": ROLE_USER, "content": getattr(message, "content", message)})
+
+    def add_assistant_message(self, messages: list, message):
+        messages.append({"role": ROLE_ASSISTANT, "content": getattr(message, "content", message)})
+
+    def text_from_message(self, message) -> str:
+        content = getattr(message, "content", None)
+        if isinstance(content, list):
+            return "\n".join(
+                [block.text for block in content if getattr(block, "type", None) == "text"]
+            )
+        return str(message)
+
+    def caches(self) -> list[Any]:
+        """Memoized data held by the provider, for memory accounting."""
+        return []
+
+    def clear_caches(self):
+        """Drops memoized data; called under memory pressure."""
+
+    def stats(self) -> dict[str, Any]:
+        stats = {}
+        for component in ("scheduler", "hedger", "spill_store", "speculator"):
+            if getattr(self, component, None) is not None:
+                stats[component] = getattr(self, component).stats()
+        return stats
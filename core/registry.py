@@ -0,0 +1,25 @@
+import importlib
+from typing import Any
+
+from core.provider import LLMProvider
+
+# Provider name -> "module:class". Modules are imported on first use so an
+# SDK is only loaded once its backend is actually selected.
+PROVIDERS = {
+    "gemini": "core.gemini:Gemini",
+    "claude": "core.claude:Claude",
+}
+
+
+def load_provider(name: str) -> type[LLMProvider]:
+    """Imports and returns the provider class registered under `name`."""
+    if name not in PROVIDERS:
+        raise ValueError(
+            f"Unknown AI service '{name}', expected one of {sorted(PROVIDERS)}"
+        )
+    module_name, class_name = PROVIDERS[name].split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def create_provider(name: str, **kwargs: Any) -> LLMProvider:
+    return load_provider(name)(**kwargs)
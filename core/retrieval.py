@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+from typing import Callable, Iterable, List, Mapping, Optional
+
+import numpy as np
+
+# Embeds a batch of texts into an (n, dim) float32 array
+EmbeddingFunction = Callable[[List[str]], np.ndarray]
+
+VECTORS_FILE = "vectors.f32"
+CHUNKS_FILE = "chunks.json"
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbedding:
+    """
+    Local embedding by feature hashing: words and word bigrams are hashed
+    into `dim` buckets and the counts are L2-normalized. Needs no model
+    download; any callable with the same signature can replace it.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _bucket(self, feature: str) -> tuple[int, float]:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        # The top bit picks a sign so colliding features tend to cancel out
+        return value % self.dim, 1.0 if value >> 63 else -1.0
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _TOKEN_PATTERN.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            for feature in features:
+                bucket, sign = self._bucket(feature)
+                vectors[row, bucket] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+def chunk_text(text: str, size: int = 800, overlap: int = 100) -> List[str]:
+    """Splits text into chunks of about `size` characters, breaking at whitespace."""
+    if len(text) <= size:
+        return [text] if text.strip() else []
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + size)
+        if end < len(text):
+            # Prefer to end a chunk at whitespace in its last quarter
+            space = text.rfind(" ", start + size * 3 // 4, end)
+            end = space if space > start else end
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+class EmbeddingIndex:
+    """
+    Vector index over document chunks for top-k retrieval.
+
+    Chunk vectors live in one contiguous float32 matrix backed by a memory
+    mapped file, so a search is a single matrix-vector product. Updating a
+    document only re-embeds that document: its old rows are freed and
+    reused by later chunks. With a `directory`, the matrix and chunk
+    metadata persist across restarts and `sync` re-embeds only documents
+    whose content changed. Methods may be called from several threads.
+
+    Args:
+        directory: Where the index is stored; a temporary file if None.
+        embed: Embedding function, `HashingEmbedding(dim)` by default.
+        dim: Width of the vectors `embed` returns.
+        chunk_size: Target chunk length in characters.
+        chunk_overlap: Characters shared by consecutive chunks.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        embed: Optional[EmbeddingFunction] = None,
+        dim: int = 256,
+        chunk_size: int = 800,
+        chunk_overlap: int = 100,
+    ):
+        self.directory = directory
+        self.embed = embed or HashingEmbedding(dim)
+        self.dim = dim
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+        # Per row: owning doc id (None for a free row) and chunk text
+        self._row_docs: List[Optional[str]] = []
+        self._row_texts: List[str] = []
+        self._free: List[int] = []
+        self._doc_rows: dict[str, List[int]] = {}
+        self._doc_hashes: dict[str, str] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._lock = threading.RLock()
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._file = open(os.path.join(directory, VECTORS_FILE), "a+b")
+            self._load()
+        else:
+            self._file = tempfile.TemporaryFile()
+        self._vectors = self._map(max(len(self._row_docs), 16))
+
+    def __len__(self) -> int:
+        return len(self._doc_rows)
+
+    def _map(self, capacity: int) -> np.memmap:
+        size = capacity * self.dim * np.dtype(np.float32).itemsize
+        self._file.seek(0, os.SEEK_END)
+        if self._file.tell() < size:
+            self._file.truncate(size)
+        return np.memmap(self._file, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _load(self):
+        path = os.path.join(self.directory, CHUNKS_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("dim") != self.dim:
+            # Runs in the stdio server, whose stdout carries the protocol
+            print(f"[DEBUG] Embedding width changed, rebuilding index in {self.directory}", file=sys.stderr)
+            return
+        self._row_docs = meta["row_docs"]
+        self._row_texts = meta["row_texts"]
+        self._doc_hashes = meta["doc_hashes"]
+        for row, doc_id in enumerate(self._row_docs):
+            if doc_id is None:
+                self._free.append(row)
+            else:
+                self._doc_rows.setdefault(doc_id, []).append(row)
+        self._alive = np.array([doc_id is not None for doc_id in self._row_docs], dtype=bool)
+
+    def _save(self):
+        if not self.directory:
+            return
+        self._vectors.flush()
+        path = os.path.join(self.directory, CHUNKS_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "dim": self.dim,
+                    "row_docs": self._row_docs,
+                    "row_texts": self._row_texts,
+                    "doc_hashes": self._doc_hashes,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(path + ".tmp", path)
+
+    def _allocate(self, count: int) -> List[int]:
+        rows = [self._free.pop() for _ in range(min(count, len(self._free)))]
+        start = len(self._row_docs)
+        new = count - len(rows)
+        if new:
+            self._row_docs.extend([None] * new)
+            self._row_texts.extend([""] * new)
+            self._alive = np.concatenate([self._alive, np.zeros(new, dtype=bool)])
+            rows.extend(range(start, start + new))
+            if len(self._row_docs) > self._vectors.shape[0]:
+                self._vectors.flush()
+                self._vectors = self._map(max(len(self._row_docs), 2 * self._vectors.shape[0]))
+        return rows
+
+    def _remove_rows(self, doc_id: str):
+        for row in self._doc_rows.pop(doc_id, []):
+            self._row_docs[row] = None
+            self._row_texts[row] = ""
+            self._alive[row] = False
+            self._free.append(row)
+
+    def update(self, doc_id: str, text: str, save: bool = True):
+        """(Re-)indexes one document; a no-op if its content is unchanged."""
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        if self._doc_hashes.get(doc_id) == digest:
+            return
+        # Embedding is the slow part and needs no lock
+        chunks = chunk_text(text, self.chunk_size, self.chunk_overlap)
+        vectors = self.embed(chunks) if chunks else None
+        with self._lock:
+            self._remove_rows(doc_id)
+            if chunks:
+                rows = self._allocate(len(chunks))
+                self._vectors[rows] = vectors
+                for row, chunk in zip(rows, chunks):
+                    self._row_docs[row] = doc_id
+                    self._row_texts[row] = chunk
+                self._alive[rows] = True
+                self._doc_rows[doc_id] = rows
+            self._doc_hashes[doc_id] = digest
+            if save:
+                self._save()
+
+    def remove(self, doc_id: str, save: bool = True):
+        with self._lock:
+            self._remove_rows(doc_id)
+            self._doc_hashes.pop(doc_id, None)
+            if save:
+                self._save()
+
+    def sync(self, docs: Mapping[str, str]):
+        """Brings the index in line with `docs`, re-embedding only changed ones."""
+        for doc_id in [doc_id for doc_id in self._doc_hashes if doc_id not in docs]:
+            self.remove(doc_id, save=False)
+        for doc_id, text in docs.items():
+            self.update(doc_id, text, save=False)
+        with self._lock:
+            self._save()
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        doc_ids: Optional[Iterable[str]] = None,
+    ) -> List[dict]:
+        """
+        Top-k chunks by cosine similarity to `query`.
+
+        Returns:
+            Dicts with "doc_id", "score" and "text", best first.
+        """
+        if k <= 0:
+            return []
+        query_vector = self.embed([query])[0]
+        with self._lock:
+            count = len(self._row_docs)
+            if not count:
+                return []
+            mask = self._alive
+            if doc_ids is not None:
+                mask = mask.copy()
+                mask[:] = False
+                for doc_id in doc_ids:
+                    mask[self._doc_rows.get(doc_id, [])] = True
+
+            # Rows are unit length, so the dot product is the cosine similarity
+            scores = self._vectors[:count] @ query_vector
+            scores[~mask] = -np.inf
+            k = min(k, int(mask.sum()))
+            if k == 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                {
+                    "doc_id": self._row_docs[row],
+                    "score": round(float(scores[row]), 4),
+                    "text": self._row_texts[row],
+                }
+                for row in top
+            ]
+
+    def close(self):
+        self._vectors.flush()
+        del self._vectors
+        self._file.close()
@@ -0,0 +1,213 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from core.provider import LLMProvider
+from core.scheduler import PRIORITY_INTERACTIVE
+
+
+@dataclass
+class ProviderHealth:
+    latency: Optional[float] = None  # EWMA of successful call latency, seconds
+    error_rate: float = 0.0  # EWMA of failures (1) and successes (0)
+    consecutive_failures: int = 0
+    down_until: float = 0.0
+    calls: int = 0
+    failures: int = 0
+
+
+class ToolCallGuard:
+    """
+    Wraps the MCP client of a routed attempt and notes whether a tool that
+    may change something was called, after which the attempt must not be
+    repeated on another provider.
+    """
+
+    def __init__(self, mcp_client):
+        self._mcp_client = mcp_client
+        self.side_effects = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._mcp_client, name)
+
+    async def call_tool(self, tool_name: str, tool_input: dict, *args, **kwargs) -> Any:
+        if not self._mcp_client.is_read_only(tool_name):
+            # Set before the call: a call that times out may still apply
+            self.side_effects = True
+        return await self._mcp_client.call_tool(tool_name, tool_input, *args, **kwargs)
+
+
+class ProviderRouter(LLMProvider):
+    """
+    Routes model calls across several providers and fails over when one is
+    slow or down. Providers given an MCP client run tools themselves; once
+    an attempt has called a tool that is not read-only, its failure is
+    raised instead of running the turn, and the tool, again elsewhere.
+
+    Args:
+        providers: Providers in preference order.
+        strategy: How healthy providers are ranked: "priority" (given order),
+            "latency", "error_rate" or "cost".
+        costs: Price per 1k tokens by provider name, for the "cost" strategy.
+        attempt_timeout: Seconds before a provider attempt is abandoned in
+            favour of the next one. None waits for the provider's own deadline.
+        failure_threshold: Consecutive failures after which a provider is
+            taken out of rotation for `cooldown` seconds.
+        cooldown: Seconds a failing provider stays out of rotation.
+        alpha: Smoothing factor of the latency and error-rate averages.
+    """
+
+    name = "router"
+    STRATEGIES = ("priority", "latency", "error_rate", "cost")
+
+    def __init__(
+        self,
+        providers: list[LLMProvider],
+        strategy: str = "priority",
+        costs: Optional[dict[str, float]] = None,
+        attempt_timeout: Optional[float] = None,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        alpha: float = 0.2,
+    ):
+        if not providers:
+            raise ValueError("ProviderRouter needs at least one provider")
+        if strategy not in self.STRATEGIES:
+            raise ValueError(
+                f"Unknown routing strategy '{strategy}', expected one of {self.STRATEGIES}"
+            )
+        self.providers = providers
+        self.strategy = strategy
+        self.costs = costs or {}
+        self.attempt_timeout = attempt_timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.health = {id(p): ProviderHealth() for p in providers}
+
+    def _rank_key(self, index: int, provider: LLMProvider):
+        health = self.health[id(provider)]
+        if self.strategy == "latency":
+            # Untried providers rank first so they get a latency sample
+            return (health.latency or 0.0, index)
+        if self.strategy == "error_rate":
+            return (health.error_rate, index)
+        if self.strategy == "cost":
+            return (self.costs.get(provider.name, 0.0), index)
+        return (index,)
+
+    def ranked(self) -> list[LLMProvider]:
+        """Providers in the order they will be tried; downed ones go last."""
+        now = time.monotonic()
+        ordered = sorted(
+            enumerate(self.providers), key=lambda item: self._rank_key(*item)
+        )
+        up = [p for _, p in ordered if self.health[id(p)].down_until <= now]
+        down = [p for _, p in ordered if self.health[id(p)].down_until > now]
+        return up + down
+
+    def _record(self, provider: LLMProvider, latency: float, failed: bool):
+        health = self.health[id(provider)]
+        health.calls += 1
+        health.error_rate += self.alpha * ((1.0 if failed else 0.0) - health.error_rate)
+        if failed:
+            health.failures += 1
+            health.consecutive_failures += 1
+            if health.consecutive_failures >= self.failure_threshold:
+                health.down_until = time.monotonic() + self.cooldown
+                print(f"[DEBUG] Provider {provider.name} marked down for {self.cooldown}s")
+            return
+        health.consecutive_failures = 0
+        health.down_until = 0.0
+        health.latency = (
+            latency
+            if health.latency is None
+            else health.latency + self.alpha * (latency - health.latency)
+        )
+
+    async def _route(self, method: str, *args, mcp_client=None, **kwargs) -> Any:
+        errors = []
+        for provider in self.ranked():
+            started = time.monotonic()
+            guard = ToolCallGuard(mcp_client) if mcp_client is not None else None
+            try:
+                call = (
+                    getattr(provider, method)(*args, mcp_client=guard, **kwargs)
+                    if guard
+                    else getattr(provider, method)(*args, **kwargs)
+                )
+                result = await asyncio.wait_for(call, self.attempt_timeout)
+            except Exception as e:
+                self._record(provider, time.monotonic() - started, failed=True)
+                if guard and guard.side_effects:
+                    print(f"[DEBUG] Provider {provider.name} failed after a tool with side effects ran; not failing over")
+                    raise
+                print(f"[DEBUG] Provider {provider.name} failed ({e!r}); failing over")
+                errors.append(f"{provider.name}: {e!r}")
+                continue
+            self._record(provider, time.monotonic() - started, failed=False)
+            return result
+        raise ConnectionError(f"All model providers failed: {'; '.join(errors)}")
+
+    async def chat(
+        self,
+        messages,
+        system=None,
+        temperature=0.7,
+        stop_sequences=None,
+        tools=None,
+        priority=PRIORITY_INTERACTIVE,
+        timeout=None,
+        **kwargs,
+    ) -> Any:
+        return await self._route(
+            "chat",
+            messages,
+            system=system,
+            temperature=temperature,
+            stop_sequences=stop_sequences,
+            tools=tools,
+            priority=priority,
+            timeout=timeout,
+            **kwargs,
+        )
+
+    async def query_with_tools(
+        self,
+        user_query: str,
+        mcp_client,
+        system=None,
+        temperature=0.7,
+        stop_sequences=None,
+        priority=PRIORITY_INTERACTIVE,
+        timeout=None,
+    ) -> Any:
+        return await self._route(
+            "query_with_tools",
+            user_query,
+            mcp_client=mcp_client,
+            system=system,
+            temperature=temperature,
+            stop_sequences=stop_sequences,
+            priority=priority,
+            timeout=timeout,
+        )
+
+    def caches(self) -> list[Any]:
+        return [cache for provider in self.providers for cache in provider.caches()]
+
+    def clear_caches(self):
+        for provider in self.providers:
+            provider.clear_caches()
+
+    def stats(self) -> dict[str, Any]:
+        names = [provider.name for provider in self.providers]
+        return {
+            # Providers sharing a name are told apart by their position
+            (name if names.count(name) == 1 else f"{name}#{index}"): {
+                **vars(self.health[id(provider)]),
+                **provider.stats(),
+            }
+            for index, (name, provider) in enumerate(zip(names, self.providers))
+        }
@@ -0,0 +1,260 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Lower value is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504, 529})
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a model call cannot finish before its deadline"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Returns True for timeouts, connection errors and retryable HTTP statuses."""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    # google.api_core exceptions expose `code`, anthropic ones `status_code`
+    status = getattr(error, "code", None)
+    if not isinstance(status, int):
+        status = getattr(error, "status_code", None)
+    return status in RETRYABLE_STATUS_CODES
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute` tokens per minute"""
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are now)."""
+        self._refill()
+        # A single call larger than the bucket must still be admitted eventually
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        # May go negative; the debt is repaid by later refills
+        self.tokens -= amount
+
+    def refund(self, amount: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 20.0
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (1-based) retry."""
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        )
+
+
+class ModelCallScheduler:
+    """
+    Admits model calls in priority order under request/token per-minute
+    limits, retrying retryable failures with jittered exponential backoff.
+
+    Args:
+        requests_per_minute: Request quota, or None for no limit.
+        tokens_per_minute: Token quota, or None for no limit.
+        retry: Retry policy for retryable errors.
+        timeout: Default deadline in seconds for a call, including queueing
+            and retries. None means no deadline.
+        retryable: Predicate deciding whether an error is worth retrying.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        retry: Optional[RetryPolicy] = None,
+        timeout: Optional[float] = None,
+        retryable: Callable[[BaseException], bool] = is_retryable,
+    ):
+        self._requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self._tokens = (
+            TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        )
+        self.retry = retry or RetryPolicy()
+        self.timeout = timeout
+        self._retryable = retryable
+        self._waiters: list[list] = []
+        self._counter = itertools.count()
+        self._changed: Optional[asyncio.Condition] = None
+        self._stats = {
+            "calls": 0,
+            "retries": 0,
+            "failures": 0,
+            "deadline_exceeded": 0,
+            "throttled_seconds": 0.0,
+        }
+
+    def stats(self) -> dict[str, Any]:
+        return {**self._stats, "queued": len(self._waiters)}
+
+    def _condition(self) -> asyncio.Condition:
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    def _admission_delay(self, tokens: int) -> float:
+        delay = 0.0
+        if self._requests:
+            delay = max(delay, self._requests.wait_time(1))
+        if self._tokens and tokens:
+            delay = max(delay, self._tokens.wait_time(tokens))
+        return delay
+
+    @staticmethod
+    def _remaining(deadline: Optional[float]) -> Optional[float]:
+        if deadline is None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Model call deadline exceeded")
+        return remaining
+
+    async def _acquire(
+        self, priority: int, tokens: int, deadline: Optional[float]
+    ):
+        condition = self._condition()
+        entry = [priority, next(self._counter)]
+        started = time.monotonic()
+        async with condition:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    wait = None
+                    if self._waiters[0] is entry:
+                        wait = self._admission_delay(tokens)
+                        if wait == 0:
+                            heapq.heappop(self._waiters)
+                            if self._requests:
+                                self._requests.consume(1)
+                            if self._tokens and tokens:
+                                self._tokens.consume(tokens)
+                            self._stats["throttled_seconds"] += (
+                                time.monotonic() - started
+                            )
+                            condition.notify_all()
+                            return
+
+                    remaining = self._remaining(deadline)
+                    if wait is not None and remaining is not None and wait > remaining:
+                        raise DeadlineExceeded(
+                            f"Rate limit would delay the call by {wait:.1f}s, "
+                            "past its deadline"
+                        )
+                    # The head sleeps until its tokens refill, everyone else
+                    # until the head changes (or their deadline passes)
+                    timeout = wait if wait is not None else remaining
+                    try:
+                        await asyncio.wait_for(condition.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    condition.notify_all()
+                raise
+
+    def record_usage(self, estimated: int, actual: Optional[int]):
+        """Reconciles the token bucket once the real usage is known."""
+        if not self._tokens or actual is None:
+            return
+        if actual > estimated:
+            self._tokens.consume(actual - estimated)
+        elif actual < estimated:
+            self._tokens.refund(estimated - actual)
+
+    async def submit(
+        self,
+        call: Callable[[], Awaitable[T]],
+        priority: int = PRIORITY_INTERACTIVE,
+        tokens: int = 0,
+        timeout: Optional[float] = None,
+        usage: Optional[Callable[[T], Optional[int]]] = None,
+    ) -> T:
+        """
+        Runs `call` once admitted, retrying retryable failures.
+
+        Args:
+            call: Zero-argument factory creating the awaitable for one attempt.
+            priority: Queue priority; lower values are admitted first.
+            tokens: Estimated tokens the call will consume.
+            timeout: Overall deadline in seconds, defaults to `self.timeout`.
+            usage: Optional extractor of the actual token usage from a result.
+
+        Returns:
+            The result of the first successful attempt.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        attempt = 0
+
+        try:
+            while True:
+                await self._acquire(priority, tokens, deadline)
+                self._stats["calls"] += 1
+                try:
+                    result = await asyncio.wait_for(
+                        call(), self._remaining(deadline)
+                    )
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    attempt += 1
+                    if attempt >= self.retry.max_attempts or not self._retryable(e):
+                        self._stats["failures"] += 1
+                        raise
+                    delay = self.retry.backoff(attempt)
+                    if deadline is not None and time.monotonic() + delay >= deadline:
+                        raise DeadlineExceeded(
+                            f"Model call deadline exceeded after {attempt} attempt(s): {e!r}"
+                        ) from e
+                    self._stats["retries"] += 1
+                    print(
+                        f"[DEBUG] Model call failed ({e!r}); retrying in {delay:.2f}s "
+                        f"(attempt {attempt + 1}/{self.retry.max_attempts})"
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+
+                if usage is not None:
+                    self.record_usage(tokens, usage(result))
+                return result
+        except DeadlineExceeded:
+            self._stats["deadline_exceeded"] += 1
+            raise
@@ -0,0 +1,456 @@
+import asyncio
+import hashlib
+import json
+from bisect import bisect_right
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Iterable, Optional
+
+from mcp import types
+
+from core.jobs import CANCELLED, FAILED, FINISHED, JOB_TOOLS, RUNNING, SUCCEEDED, JobTracker, ProgressFn, job_handle
+
+if TYPE_CHECKING:
+    from mcp_client import MCPClient
+
+DOCS_URI = "docs://documents"
+
+# Tools sharded servers offer for ShardedMCPClient's own use, hidden from the model
+SHARD_TOOLS = frozenset(
+    {"bulk_edit_prepare", "bulk_edit_commit", "shard_export", "shard_import", "shard_rebalance"}
+)
+
+
+def shard_names(count: int) -> list[str]:
+    return [f"shard-{index}" for index in range(count)]
+
+
+def _hash(key: str) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping keys (doc ids) to shard names.
+
+    Each shard is placed on the ring at `replicas` points, so keys spread
+    evenly and adding a shard moves only about 1/n of them, all to the new
+    shard.
+
+    Args:
+        shards: Shard names.
+        replicas: Ring points per shard.
+    """
+
+    def __init__(self, shards: Iterable[str] = (), replicas: int = 64):
+        self.replicas = replicas
+        self.shards: list[str] = []
+        self._points: list[int] = []
+        self._owners: list[str] = []
+        for shard in shards:
+            self.add(shard)
+
+    def add(self, shard: str):
+        if shard in self.shards:
+            return
+        self.shards.append(shard)
+        ring = sorted(
+            [*zip(self._points, self._owners)]
+            + [(_hash(f"{shard}#{replica}"), shard) for replica in range(self.replicas)]
+        )
+        self._points = [point for point, _ in ring]
+        self._owners = [owner for _, owner in ring]
+
+    def node(self, key: str) -> str:
+        if not self._points:
+            raise LookupError("Hash ring has no shards")
+        i = bisect_right(self._points, _hash(key)) % len(self._points)
+        return self._owners[i]
+
+    def moved(self, keys: Iterable[str], other: "HashRing") -> dict[str, str]:
+        """Keys owned by a different shard in `other`, mapped to that shard."""
+        moved = {}
+        for key in keys:
+            owner = other.node(key)
+            if owner != self.node(key):
+                moved[key] = owner
+        return moved
+
+
+def _result_json(result: types.CallToolResult) -> Any:
+    if result.structuredContent is not None:
+        return result.structuredContent.get("result", result.structuredContent)
+    items = [json.loads(item.text) for item in result.content if isinstance(item, types.TextContent)]
+    return items[0] if len(items) == 1 else items
+
+
+def _json_result(value: Any) -> types.CallToolResult:
+    return types.CallToolResult(
+        content=[types.TextContent(type="text", text=json.dumps(value, indent=2))]
+    )
+
+
+def _merge_results(values: list[Any]) -> Any:
+    # Per-shard dicts are combined key by key: lists joined, counts summed
+    if not all(isinstance(value, dict) for value in values):
+        return values
+    merged: dict[str, Any] = {}
+    for value in values:
+        for key, item in value.items():
+            if key not in merged:
+                merged[key] = list(item) if isinstance(item, list) else item
+            elif isinstance(item, list):
+                merged[key] += item
+            elif isinstance(item, (int, float)) and not isinstance(item, bool):
+                merged[key] += item
+    return merged
+
+
+def _merge_jobs(snapshots: list[dict[str, Any]]) -> dict[str, Any]:
+    """One handle for the per-shard jobs of a scattered call."""
+    statuses = {snapshot["status"] for snapshot in snapshots}
+    if statuses - FINISHED:
+        status = RUNNING
+    else:
+        status = next((status for status in (FAILED, CANCELLED) if status in statuses), SUCCEEDED)
+    totals = [snapshot.get("total") for snapshot in snapshots]
+    merged = {
+        "job_id": ",".join(snapshot["job_id"] for snapshot in snapshots),
+        "tool": snapshots[0].get("tool"),
+        "status": status,
+        "progress": sum(snapshot.get("progress") or 0 for snapshot in snapshots),
+        "total": None if None in totals else sum(totals),
+        "message": "; ".join(snapshot["message"] for snapshot in snapshots if snapshot.get("message")) or None,
+        "elapsed": max(snapshot.get("elapsed") or 0 for snapshot in snapshots),
+    }
+    if status == SUCCEEDED:
+        merged["result"] = _merge_results([snapshot.get("result") for snapshot in snapshots])
+    errors = [snapshot["error"] for snapshot in snapshots if snapshot.get("error")]
+    if errors:
+        merged["error"] = "; ".join(errors)
+    return merged
+
+
+class ShardedMCPClient:
+    """
+    Routes requests to document server shards, each owning the doc ids the
+    hash ring assigns to it (see SHARD_INDEX/SHARD_COUNT in mcp_server.py).
+
+    Calls naming a doc go to its owner. The docs listing, `retrieve`
+    without a doc id and `bulk_edit` across shards are scattered to every
+    shard involved and their results merged; a cross-shard `bulk_edit` is
+    prepared on every shard before any commits it. Other calls go to the
+    first shard. Job ids start with the shard name, so job calls go to the
+    shard running the job; `ingest_documents` runs on every shard under
+    one combined job id. Offers the same interface as MCPClient, so the
+    rest of the app can use it in its place.
+
+    Args:
+        clients: Connected shard clients, in shard index order.
+        start_shard: Starts and connects the server for shard `index` of
+            `count`; used by `add_shard`.
+    """
+
+    def __init__(
+        self,
+        clients: list["MCPClient"],
+        start_shard: Optional[Callable[[int, int], Awaitable["MCPClient"]]] = None,
+    ):
+        self.clients = list(clients)
+        self.start_shard = start_shard
+        self.ring = HashRing(shard_names(len(self.clients)))
+        self.edited_doc_ids = self.clients[0].edited_doc_ids
+        # Registered on every shard, including ones added later
+        self._listeners: list[tuple[str, Callable[..., Any]]] = []
+        # Jobs are followed here, under their combined ids
+        for client in self.clients:
+            client.jobs = None
+        self.jobs = JobTracker(self)
+
+    def _owner(self, doc_id: str) -> "MCPClient":
+        return self.clients[self.ring.shards.index(self.ring.node(doc_id))]
+
+    @property
+    def doc_ids(self) -> Optional[set[str]]:
+        shard_ids = [client.doc_ids for client in self.clients]
+        if any(ids is None for ids in shard_ids):
+            return None
+        return set().union(*shard_ids)
+
+    @property
+    def prompt_cache_stats(self) -> dict[str, int]:
+        stats = {"hits": 0, "misses": 0}
+        for client in self.clients:
+            for key in stats:
+                stats[key] += client.prompt_cache_stats[key]
+        return stats
+
+    def on(self, event: str, callback: Callable[..., Any]):
+        self._listeners.append((event, callback))
+        for client in self.clients:
+            client.on(event, callback)
+
+    def is_read_only(self, tool_name: str) -> bool:
+        return self.clients[0].is_read_only(tool_name)
+
+    def doc_version(self, doc_id: str) -> int:
+        return self._owner(doc_id).doc_version(doc_id)
+
+    def invalidate_doc(self, doc_id: str):
+        self._owner(doc_id).invalidate_doc(doc_id)
+
+    def caches(self) -> list[Any]:
+        return [cache for client in self.clients for cache in client.caches()]
+
+    def clear_caches(self):
+        for client in self.clients:
+            client.clear_caches()
+
+    async def list_tools(self) -> list[types.Tool]:
+        # Every shard records which of its tools are read-only
+        results = await asyncio.gather(*(client.list_tools() for client in self.clients))
+        return [tool for tool in results[0] if tool.name not in SHARD_TOOLS]
+
+    async def list_prompts(self) -> list[types.Prompt]:
+        return await self.clients[0].list_prompts()
+
+    async def get_prompt(self, prompt_name, args: dict[str, str]):
+        client = self._owner(args["doc_id"]) if args.get("doc_id") else self.clients[0]
+        return await client.get_prompt(prompt_name, args)
+
+    async def read_resource(self, uri: str) -> Any:
+        if uri == DOCS_URI:
+            listings = await asyncio.gather(*(client.read_resource(uri) for client in self.clients))
+            return [doc_id for listing in listings for doc_id in listing]
+        if uri.startswith(DOCS_URI + "/"):
+            return await self._owner(uri[len(DOCS_URI) + 1 :]).read_resource(uri)
+        return await self.clients[0].read_resource(uri)
+
+    async def call_tool(
+        self,
+        tool_name: str,
+        tool_input: dict,
+        timeout: Optional[float] = None,
+        progress_callback: Optional[ProgressFn] = None,
+    ) -> types.CallToolResult | None:
+        if tool_name in JOB_TOOLS:
+            return await self._job_call(tool_name, tool_input, timeout, progress_callback)
+        if tool_input.get("doc_id"):
+            result = await self._owner(str(tool_input["doc_id"])).call_tool(
+                tool_name, tool_input, timeout, progress_callback
+            )
+        elif tool_name == "retrieve":
+            result = await self._retrieve(tool_input, timeout)
+        elif tool_name == "bulk_edit":
+            result = await self._bulk_edit(tool_input, timeout)
+        elif tool_name == "ingest_documents":
+            result = await self._ingest(tool_input, timeout)
+        else:
+            result = await self.clients[0].call_tool(tool_name, tool_input, timeout, progress_callback)
+        self.jobs.observe(result)
+        return result
+
+    def _job_owner(self, job_id: str) -> "MCPClient":
+        shard = job_id.split(":", 1)[0]
+        if shard not in self.ring.shards:
+            raise ValueError(f"Job {job_id} not found")
+        return self.clients[self.ring.shards.index(shard)]
+
+    async def _job_call(
+        self,
+        tool_name: str,
+        tool_input: dict,
+        timeout: Optional[float],
+        progress_callback: Optional[ProgressFn],
+    ) -> types.CallToolResult:
+        job_ids = str(tool_input.get("job_id", "")).split(",")
+        if len(job_ids) == 1:
+            return await self._job_owner(job_ids[0]).call_tool(tool_name, tool_input, timeout, progress_callback)
+
+        # job id -> (progress, total), reported as one sum
+        progress: dict[str, tuple[float, Optional[float]]] = {}
+
+        def shard_progress(job_id: str) -> Optional[ProgressFn]:
+            if progress_callback is None:
+                return None
+
+            async def report(value: float, total: Optional[float], message: Optional[str]):
+                progress[job_id] = (value, total)
+                totals = [total for _, total in progress.values()]
+                await progress_callback(
+                    sum(value for value, _ in progress.values()),
+                    None if None in totals or len(progress) < len(job_ids) else sum(totals),
+                    message,
+                )
+
+            return report
+
+        results = await asyncio.gather(
+            *(
+                self._job_owner(job_id).call_tool(
+                    tool_name, {**tool_input, "job_id": job_id}, timeout, shard_progress(job_id)
+                )
+                for job_id in job_ids
+            )
+        )
+        for result in results:
+            if result.isError:
+                return result
+        return _json_result(_merge_jobs([job_handle(result) for result in results]))
+
+    async def _ingest(self, tool_input: dict, timeout: Optional[float]) -> types.CallToolResult:
+        # Every shard ingests the files it owns from the directory
+        results = await asyncio.gather(
+            *(client.call_tool("ingest_documents", tool_input, timeout) for client in self.clients)
+        )
+        for result in results:
+            if result.isError:
+                return result
+        handles = [job_handle(result) for result in results]
+        if all(handles):
+            return _json_result(_merge_jobs(handles))
+        return _json_result(_merge_results([_result_json(result) for result in results]))
+
+    async def _retrieve(self, tool_input: dict, timeout: Optional[float]) -> types.CallToolResult:
+        results = await asyncio.gather(
+            *(client.call_tool("retrieve", tool_input, timeout) for client in self.clients)
+        )
+        for result in results:
+            if result.isError:
+                return result
+        chunks = [chunk for result in results for chunk in _result_json(result)]
+        chunks.sort(key=lambda chunk: chunk["score"], reverse=True)
+        chunks = chunks[: int(tool_input.get("k", 5))]
+        return types.CallToolResult(
+            content=[types.TextContent(type="text", text=json.dumps(chunk, indent=2)) for chunk in chunks],
+            structuredContent={"result": chunks},
+        )
+
+    @staticmethod
+    def _error(result: types.CallToolResult) -> str:
+        return " ".join(getattr(item, "text", "") for item in result.content)
+
+    async def _bulk_edit(self, tool_input: dict, timeout: Optional[float]) -> types.CallToolResult:
+        by_client: dict[int, list] = {}
+        for operation in tool_input.get("operations") or []:
+            doc_id = str(operation.get("doc_id", "")) if isinstance(operation, dict) else ""
+            index = self.clients.index(self._owner(doc_id)) if doc_id else 0
+            by_client.setdefault(index, []).append(operation)
+        if len(by_client) <= 1:
+            client = self.clients[next(iter(by_client), 0)]
+            return await client.call_tool("bulk_edit", tool_input, timeout)
+
+        dry_run = str(tool_input.get("dry_run", False)).lower() == "true"
+        if dry_run:
+            results = await asyncio.gather(
+                *(
+                    self.clients[index].call_tool(
+                        "bulk_edit", {"operations": operations, "dry_run": True}, timeout
+                    )
+                    for index, operations in by_client.items()
+                )
+            )
+        else:
+            # Two phases, in the foreground: every shard stages its part and
+            # locks its docs, then all commit, or all abort if any failed
+            results = await asyncio.gather(
+                *(
+                    self.clients[index].call_tool("bulk_edit_prepare", {"operations": operations}, timeout)
+                    for index, operations in by_client.items()
+                ),
+                return_exceptions=True,
+            )
+            prepared = {
+                index: _result_json(result)["transaction"]
+                for index, result in zip(by_client, results)
+                if isinstance(result, types.CallToolResult) and not result.isError
+            }
+            failed = len(prepared) < len(by_client)
+            commits = await asyncio.gather(
+                *(
+                    self.clients[index].call_tool(
+                        "bulk_edit_commit", {"transaction": transaction, "commit": not failed}, timeout
+                    )
+                    for index, transaction in prepared.items()
+                ),
+                return_exceptions=True,
+            )
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+                if result.isError:
+                    return result
+            for index, commit in zip(prepared, commits):
+                if isinstance(commit, BaseException) or commit.isError:
+                    # Locked docs cannot fail to commit, so the shard itself
+                    # is gone; what it staged is lost with it
+                    error = commit if isinstance(commit, BaseException) else self._error(commit)
+                    raise RuntimeError(f"{self.ring.shards[index]} failed to commit a prepared bulk edit: {error}")
+
+        merged = {"applied": not dry_run, "total_matches": 0, "documents": {}}
+        for result in results:
+            if result.isError:
+                return result
+            part = _result_json(result)
+            merged["total_matches"] += part["total_matches"]
+            merged["documents"].update(part["documents"])
+        return _json_result(merged)
+
+    async def add_shard(self, client: Optional["MCPClient"] = None) -> list[str]:
+        """
+        Adds a shard and moves the documents the grown ring assigns to it.
+        The new shard imports them before the old shards drop them, so a
+        failure part way leaves every document readable where it was.
+
+        Args:
+            client: Connected client of the new shard's server, started
+                with `start_shard` if None.
+
+        Returns:
+            The ids of the moved documents.
+        """
+        count = len(self.clients) + 1
+        if client is None:
+            if self.start_shard is None:
+                raise RuntimeError("No way to start a shard; pass a connected client")
+            client = await self.start_shard(count - 1, count)
+
+        exports = await asyncio.gather(
+            *(shard.call_tool("shard_export", {"shard_count": count}) for shard in self.clients)
+        )
+        moved: list[str] = []
+        documents: dict[str, str] = {}
+        for shard, result in zip(self.ring.shards, exports):
+            if result.isError:
+                raise RuntimeError(f"{shard} could not export its documents: {self._error(result)}")
+            export = _result_json(result)
+            moved += export["moved"]
+            documents.update(export["documents"])
+        if documents:
+            result = await client.call_tool("shard_import", {"documents": documents})
+            if result.isError:
+                raise RuntimeError(f"The new shard could not import documents: {self._error(result)}")
+
+        # From here on the new shard serves the moved docs
+        client.jobs = None
+        for event, callback in self._listeners:
+            client.on(event, callback)
+        self.clients.append(client)
+        self.ring.add(shard_names(count)[-1])
+        for doc_id in moved:
+            client.invalidate_doc(doc_id)
+
+        results = await asyncio.gather(
+            *(shard.call_tool("shard_rebalance", {"shard_count": count}) for shard in self.clients[:-1]),
+            return_exceptions=True,
+        )
+        for shard, result in zip(self.ring.shards, results):
+            if isinstance(result, BaseException) or result.isError:
+                # Its stale copies are unreachable, since the ring routes past them
+                error = result if isinstance(result, BaseException) else self._error(result)
+                print(f"[DEBUG] {shard} could not drop the moved documents: {error}")
+        return moved
+
+    async def cleanup(self):
+        self.jobs.close()
+        for client in reversed(self.clients):
+            await client.cleanup()
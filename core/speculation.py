@@ -0,0 +1,113 @@
+import asyncio
+import re
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from mcp.types import CallToolResult
+    from mcp_client import MCPClient
+
+# Words that look like a document id, optionally written as an @mention
+DOC_ID_PATTERN = re.compile(r"@?([\w\-]+\.[A-Za-z0-9]{1,5})\b")
+
+
+def _call_key(tool_name: str, tool_input: dict) -> tuple:
+    # Parsed tool calls carry string arguments, so compare them as strings
+    return tool_name, tuple(sorted((key, str(value)) for key, value in tool_input.items()))
+
+
+class Speculation:
+    """
+    Speculative tool calls started for one query.
+
+    `call_tool` hands back an already started call when the model asks for
+    the same tool and arguments, and makes the call normally otherwise.
+    `discard` drops whatever the model did not ask for.
+    """
+
+    def __init__(self, speculator: "ToolSpeculator", mcp_client: "MCPClient"):
+        self._speculator = speculator
+        self._mcp_client = mcp_client
+        self._tasks: dict[tuple, "asyncio.Task[CallToolResult | None]"] = {}
+
+    def start(self, tool_name: str, tool_input: dict):
+        key = _call_key(tool_name, tool_input)
+        if key in self._tasks:
+            return
+        print(f"[DEBUG] Speculatively calling {tool_name} with {tool_input}")
+        self._tasks[key] = asyncio.ensure_future(
+            self._mcp_client.call_tool(tool_name, tool_input)
+        )
+        self._speculator._stats["started"] += 1
+
+    async def call_tool(self, tool_name: str, tool_input: dict) -> "CallToolResult | None":
+        task = self._tasks.pop(_call_key(tool_name, tool_input), None)
+        if task is not None:
+            self._speculator._stats["hits"] += 1
+            return await task
+
+        self._speculator._stats["misses"] += 1
+        if not self._mcp_client.is_read_only(tool_name):
+            # A speculative read of a doc this call may edit could be stale
+            for doc_id in self._mcp_client.edited_doc_ids(tool_input):
+                for key in [key for key in self._tasks if ("doc_id", doc_id) in key[1]]:
+                    self._drop(self._tasks.pop(key))
+        return await self._mcp_client.call_tool(tool_name, tool_input)
+
+    def discard(self):
+        for task in self._tasks.values():
+            self._drop(task)
+        self._tasks.clear()
+
+    def _drop(self, task: "asyncio.Task"):
+        self._speculator._stats["wasted"] += 1
+        # Left to finish rather than cancelled, so the session's request
+        # bookkeeping stays intact; the result is simply not used
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+class ToolSpeculator:
+    """
+    Starts the read-only tool call a query will most likely need while the
+    model is still deciding, e.g. `read_doc_contents` for a document the
+    query names.
+
+    Candidate ids are words shaped like a document id; when the client
+    has listed its documents, only listed ids are used. The tool is only
+    called speculatively if the server marked it read-only.
+
+    Args:
+        tool_name: Read-only tool to call speculatively.
+        argument: Name of the tool's document id argument.
+        max_calls: Most speculative calls started for one query.
+    """
+
+    def __init__(
+        self,
+        tool_name: str = "read_doc_contents",
+        argument: str = "doc_id",
+        max_calls: int = 3,
+    ):
+        self.tool_name = tool_name
+        self.argument = argument
+        self.max_calls = max_calls
+        self._stats = {"started": 0, "hits": 0, "misses": 0, "wasted": 0}
+
+    def candidates(self, text: str, doc_ids: Optional[set[str]] = None) -> list[str]:
+        found = dict.fromkeys(DOC_ID_PATTERN.findall(text))
+        if doc_ids is not None:
+            found = [doc_id for doc_id in found if doc_id in doc_ids]
+        return list(found)[: self.max_calls]
+
+    def start(self, mcp_client: "MCPClient", query: str) -> Speculation:
+        speculation = Speculation(self, mcp_client)
+        if mcp_client.is_read_only(self.tool_name):
+            for doc_id in self.candidates(query, mcp_client.doc_ids):
+                speculation.start(self.tool_name, {self.argument: doc_id})
+        return speculation
+
+    def stats(self) -> dict[str, Any]:
+        started = self._stats["started"]
+        return {
+            **self._stats,
+            "hit_rate": self._stats["hits"] / started if started else 0.0,
+        }
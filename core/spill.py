@@ -0,0 +1,175 @@
+import hashlib
+import mmap
+import os
+import tempfile
+import uuid
+from dataclasses import dataclass
+from typing import Any, Optional
+
+FETCH_TOOL_NAME = "fetch_tool_result"
+HANDLE_PREFIX = "spill:"
+
+
+@dataclass(frozen=True)
+class VirtualTool:
+    """A tool answered by the agent itself; mirrors the fields of mcp.types.Tool"""
+    name: str
+    description: str
+    inputSchema: dict
+
+
+FETCH_TOOL = VirtualTool(
+    name=FETCH_TOOL_NAME,
+    description=(
+        "Read more of a large tool result that was truncated. Pass the handle "
+        "and the offset given at the end of the truncated result."
+    ),
+    inputSchema={
+        "type": "object",
+        "properties": {
+            "handle": {"type": "string", "description": "Handle of the truncated result, e.g. spill:3f9a2c1b-1"},
+            "offset": {"type": "integer", "description": "Byte offset to continue reading from"},
+            "length": {"type": "integer", "description": "Maximum number of bytes to return"},
+        },
+        "required": ["handle"],
+    },
+)
+
+
+class SpillStore:
+    """
+    Keeps large tool results out of memory and out of the conversation.
+
+    A result larger than `threshold` bytes is appended to one temporary file
+    and replaced by a preview plus a handle. Only that view is sent to the
+    model and kept in the history; the model reads further with the
+    `fetch_tool_result` tool. The file is read through a memory map, so
+    fetching a slice of a result does not load the rest of it. Handles
+    carry a prefix unique to the store, so a handle from another process
+    or an earlier run is reported as unknown instead of naming a
+    different result. Spilling the same text again reuses its handle, so a
+    result spilled for the model and again for the history is stored once.
+
+    Args:
+        threshold: Results up to this many UTF-8 bytes are passed through.
+        preview_bytes: Size of the preview that replaces a spilled result.
+        fetch_bytes: Default size of a `fetch_tool_result` slice.
+        directory: Directory for the temporary file (system default if None).
+    """
+
+    def __init__(
+        self,
+        threshold: int = 64 * 1024,
+        preview_bytes: int = 2000,
+        fetch_bytes: int = 8000,
+        directory: Optional[str] = None,
+    ):
+        self.threshold = threshold
+        self.preview_bytes = preview_bytes
+        self.fetch_bytes = fetch_bytes
+        # Unlinked on creation, so nothing is left behind after a crash
+        self._file = tempfile.TemporaryFile(dir=directory)
+        self._map: Optional[mmap.mmap] = None
+        self._size = 0
+        # handle -> (start, length) in bytes within the file
+        self._entries: dict[str, tuple[int, int]] = {}
+        # Digest of each spilled text -> its handle
+        self._handles: dict[bytes, str] = {}
+        self._handle_prefix = f"{HANDLE_PREFIX}{uuid.uuid4().hex[:8]}-"
+        self._stats = {"spilled": 0, "spilled_bytes": 0, "fetches": 0}
+
+    def __contains__(self, handle: str) -> bool:
+        return handle in self._entries
+
+    def put(self, text: str, threshold: Optional[int] = None) -> str:
+        """
+        Returns `text` itself if small, otherwise spills it and returns its
+        view. `threshold` overrides the store's, e.g. to spill more under
+        memory pressure.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        if len(text) <= threshold // 4:
+            # Even at 4 bytes per character this is under the threshold
+            return text
+        data = text.encode("utf-8")
+        if len(data) <= threshold:
+            return text
+
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        handle = self._handles.get(digest)
+        if handle is None:
+            self._file.seek(0, os.SEEK_END)
+            self._file.write(data)
+            self._file.flush()
+            handle = f"{self._handle_prefix}{len(self._entries) + 1}"
+            self._entries[handle] = (self._size, len(data))
+            self._handles[digest] = handle
+            self._size += len(data)
+            self._stats["spilled"] += 1
+            self._stats["spilled_bytes"] += len(data)
+            print(f"[DEBUG] Spilled {len(data)} byte tool result to {handle}")
+
+        preview, next_offset = self.read(handle, 0, self.preview_bytes)
+        return f"{preview}\n\n{self._continuation(handle, next_offset, len(data))}"
+
+    def read(self, handle: str, offset: int = 0, length: Optional[int] = None) -> tuple[str, Optional[int]]:
+        """
+        Reads part of a spilled result.
+
+        Returns:
+            The text and the offset to continue from, or None at the end.
+        """
+        if handle not in self._entries:
+            raise ValueError(f"Unknown tool result handle {handle}; it may be from an earlier session")
+        start, size = self._entries[handle]
+        offset = max(0, min(offset, size))
+        length = self.fetch_bytes if length is None else max(1, length)
+        mapped = self._mapped()
+
+        begin = self._char_boundary(mapped, start + offset, start + size)
+        end = self._char_boundary(mapped, min(begin + length, start + size), start + size)
+        text = mapped[begin:end].decode("utf-8")
+        return text, (end - start if end < start + size else None)
+
+    def fetch(self, arguments: dict[str, Any]) -> str:
+        """Answers a `fetch_tool_result` call."""
+        self._stats["fetches"] += 1
+        handle = str(arguments.get("handle", "")).strip()
+        offset = int(arguments.get("offset") or 0)
+        length = int(arguments["length"]) if arguments.get("length") else None
+        text, next_offset = self.read(handle, offset, length)
+        _, size = self._entries[handle]
+        return f"{text}\n\n{self._continuation(handle, next_offset, size)}"
+
+    def stats(self) -> dict[str, Any]:
+        return {**self._stats, "resident_handles": len(self._entries), "file_bytes": self._size}
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    @staticmethod
+    def _continuation(handle: str, next_offset: Optional[int], size: int) -> str:
+        if next_offset is None:
+            return f"[End of {handle}, {size} bytes]"
+        return (
+            f"[Truncated at byte {next_offset} of {size}. Call {FETCH_TOOL_NAME} "
+            f"with handle={handle} and offset={next_offset} to read more.]"
+        )
+
+    @staticmethod
+    def _char_boundary(mapped: mmap.mmap, position: int, stop: int) -> int:
+        # Skip UTF-8 continuation bytes so slices never split a character
+        while position < stop and mapped[position] & 0xC0 == 0x80:
+            position += 1
+        return position
+
+    def _mapped(self) -> mmap.mmap:
+        # The file only grows, so a map is reused until a later spill outgrows it
+        if self._map is None or len(self._map) < self._size:
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
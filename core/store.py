@@ -0,0 +1,197 @@
+import dataclasses
+import json
+import os
+import sys
+from typing import Any, Dict, Iterator, Optional
+
+MessageParam = Dict[str, Any]
+
+JOURNAL_FILE = "journal.jsonl"
+SNAPSHOT_FILE = "snapshot.json"
+
+
+def _encode(obj: Any) -> Any:
+    """JSON fallback for content blocks (Gemini wrappers, Anthropic models)"""
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if hasattr(obj, "__dict__"):
+        return vars(obj)
+    return str(obj)
+
+
+def _intern_role(message: MessageParam) -> MessageParam:
+    # Every loaded message would otherwise carry its own copy of the role
+    if isinstance(message.get("role"), str):
+        message["role"] = sys.intern(message["role"])
+    return message
+
+
+# Where a message starts in the journal: (byte offset, message index)
+Position = tuple[int, int]
+
+
+class ConversationStore:
+    """
+    Append-only on-disk journal of a conversation with snapshots.
+
+    Every message is appended to `journal.jsonl` and never rewritten. Every
+    `snapshot_every` messages the journal position where the resident
+    tail of the conversation starts is written to `snapshot.json`, so
+    resuming reads only the journal lines from there instead of replaying
+    the whole session. Resumed messages always come from the journal, so
+    they are the originals even if the resident copies were spilled.
+
+    Args:
+        directory: Root directory for stored sessions.
+        session_id: Name of the session sub-directory.
+        resident_messages: How many recent messages stay in memory; older
+            ones are only kept in the journal.
+        snapshot_every: Number of appended messages between snapshots.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        session_id: str = "default",
+        resident_messages: int = 50,
+        snapshot_every: int = 20,
+    ):
+        self.path = os.path.join(directory, session_id)
+        self.resident_messages = resident_messages
+        self.snapshot_every = snapshot_every
+        self.message_count = 0
+        self._since_snapshot = 0
+        os.makedirs(self.path, exist_ok=True)
+        self._journal = open(os.path.join(self.path, JOURNAL_FILE), "ab")
+        if self._journal.seek(0, os.SEEK_END):
+            with open(self._journal.name, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+            if torn:
+                # Keep the next message off a line torn by a crash
+                self._journal.write(b"\n")
+
+    def load(self) -> list[tuple[Position, MessageParam]]:
+        """Returns the resident tail of the stored conversation with each message's position."""
+        start: Position = (0, 0)
+        snapshot_path = os.path.join(self.path, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            # Snapshots that held messages themselves are replayed from the start
+            if "resident_offset" in snapshot:
+                start = (snapshot["resident_offset"], snapshot["resident_index"])
+
+        offset, index = start
+        messages = []
+        for offset, message in self._read_journal(offset):
+            messages.append(((offset, index), message))
+            index += 1
+        self.message_count = index
+        return messages[-self.resident_messages :] if messages else messages
+
+    def _read_journal(self, offset: int = 0) -> Iterator[tuple[int, MessageParam]]:
+        self._journal.flush()
+        with open(os.path.join(self.path, JOURNAL_FILE), "rb") as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    yield offset, _intern_role(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write
+                    print(f"[DEBUG] Skipping unreadable journal line in {self.path}")
+                offset += len(line)
+
+    def iter_history(self) -> Iterator[MessageParam]:
+        """Streams the full conversation from disk, including paged-out turns."""
+        return (message for _, message in self._read_journal())
+
+    def append(self, message: MessageParam) -> Position:
+        line = json.dumps(message, default=_encode, ensure_ascii=False).encode("utf-8") + b"\n"
+        position = (self._journal.tell(), self.message_count)
+        self._journal.write(line)
+        self._journal.flush()
+        self.message_count += 1
+        self._since_snapshot += 1
+        return position
+
+    def should_snapshot(self) -> bool:
+        return self._since_snapshot >= self.snapshot_every
+
+    def snapshot(self, resident_start: Position):
+        """Atomically records that the resident messages start at `resident_start`."""
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        offset, index = resident_start
+        snapshot = {
+            "resident_offset": offset,
+            "resident_index": index,
+        }
+        snapshot_path = os.path.join(self.path, SNAPSHOT_FILE)
+        tmp_path = snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, snapshot_path)
+        self._since_snapshot = 0
+
+    def close(self):
+        if not self._journal.closed:
+            self._journal.close()
+
+
+class PersistentMessages(list):
+    """
+    A message list that journals every message appended to it and pages
+    out old turns, keeping at most about `store.resident_messages` in memory.
+
+    Assigning to an index changes only the resident copy, e.g. a message
+    the memory watchdog spilled; the journal keeps the original, and a
+    resumed session reads it from there.
+    """
+
+    def __init__(self, store: ConversationStore):
+        loaded = store.load()
+        super().__init__(message for _, message in loaded)
+        self.store = store
+        # Journal position of each resident message, in the same order
+        self._positions: list[Position] = [position for position, _ in loaded]
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        del self._positions[index]
+
+    def _trim_point(self) -> Optional[int]:
+        """Index of the first resident message, at a plain user turn boundary."""
+        start = len(self) - self.store.resident_messages
+        for i in range(max(start, 1), len(self)):
+            message = self[i]
+            if message.get("role") == "user" and isinstance(message.get("content"), str):
+                return i
+        return None
+
+    def _after_write(self):
+        if len(self) > 2 * self.store.resident_messages:
+            cut = self._trim_point()
+            if cut:
+                del self[:cut]
+        if self.store.should_snapshot() and self._positions:
+            self.store.snapshot(self._positions[0])
+
+    def append(self, message: MessageParam):
+        self._positions.append(self.store.append(message))
+        super().append(message)
+        self._after_write()
+
+    def extend(self, messages):
+        for message in messages:
+            self._positions.append(self.store.append(message))
+            super().append(message)
+        self._after_write()
+
+    def __iadd__(self, messages):
+        self.extend(messages)
+        return self
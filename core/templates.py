@@ -0,0 +1,42 @@
+from string import Template
+from typing import List, Union
+
+
+class PromptTemplate:
+    """
+    A `string.Template` parsed once into literal text and placeholder names.
+
+    Rendering joins the pieces with the given values instead of re-scanning
+    the template text with a regex on every call.
+
+    Args:
+        text: Template text using `$name` / `${name}` placeholders (`$$` escapes).
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        # Literal strings, and placeholder names wrapped in a 1-tuple
+        self._pieces: List[Union[str, tuple[str]]] = []
+        position = 0
+        for match in Template.pattern.finditer(text):
+            if match.start() > position:
+                self._pieces.append(text[position : match.start()])
+            if match.group("escaped") is not None:
+                self._pieces.append("$")
+            elif match.group("invalid") is not None:
+                raise ValueError(f"Invalid placeholder in prompt template at index {match.start()}")
+            else:
+                self._pieces.append((match.group("named") or match.group("braced"),))
+            position = match.end()
+        if position < len(text):
+            self._pieces.append(text[position:])
+        self.names = frozenset(piece[0] for piece in self._pieces if isinstance(piece, tuple))
+
+    def render(self, **values: str) -> str:
+        missing = self.names - values.keys()
+        if missing:
+            raise KeyError(f"Missing prompt arguments: {sorted(missing)}")
+        return "".join(
+            str(values[piece[0]]) if isinstance(piece, tuple) else piece
+            for piece in self._pieces
+        )
@@ -1,8 +1,12 @@
 import json
-from typing import Optional, Literal, List, Dict, Any, Union
-from mcp.types import CallToolResult, Tool, TextContent
-from mcp_client import MCPClient
-from core.gemini import GeminiMessage
+from typing import Optional, Literal, List, Dict, Any, Union, TYPE_CHECKING
+from core.messages import GeminiMessage
+from core.spill import FETCH_TOOL, FETCH_TOOL_NAME, SpillStore
+from core.validation import format_errors, validators
+
+if TYPE_CHECKING:
+    from mcp.types import CallToolResult, Tool
+    from mcp_client import MCPClient
 
 # Support only Gemini message types
 Message = GeminiMessage
@@ -11,9 +15,19 @@ ToolResultBlockParam = Dict[str, Union[str, bool]]
 
 class ToolManager:
     @classmethod
-    async def get_all_tools(cls, clients: dict[str, MCPClient]) -> list[Tool]:
-        """Gets all tools from the provided clients."""
+    async def get_all_tools(
+        cls, clients: dict[str, "MCPClient"], spill: Optional[SpillStore] = None
+    ) -> list["Tool"]:
+        """Gets all tools from the provided clients, plus the spill fetch tool."""
         tools = []
+        if spill:
+            tools.append(
+                {
+                    "name": FETCH_TOOL.name,
+                    "description": FETCH_TOOL.description,
+                    "input_schema": FETCH_TOOL.inputSchema,
+                }
+            )
         for client in clients.values():
             tool_models = await client.list_tools()
             tools += [
@@ -28,15 +42,15 @@ class ToolManager:
 
     @classmethod
     async def _find_client_with_tool(
-        cls, clients: list[MCPClient], tool_name: str
-    ) -> Optional[MCPClient]:
-        """Finds the first client that has the specified tool."""
+        cls, clients: list["MCPClient"], tool_name: str
+    ) -> tuple[Optional["MCPClient"], Optional["Tool"]]:
+        """Finds the first client that has the specified tool, and the tool."""
         for client in clients:
             tools = await client.list_tools()
             tool = next((t for t in tools if t.name == tool_name), None)
             if tool:
-                return client
-        return None
+                return client, tool
+        return None, None
 
     @classmethod
     def _build_tool_result_part(
@@ -55,7 +69,10 @@ class ToolManager:
 
     @classmethod
     async def execute_tool_requests(
-        cls, clients: dict[str, MCPClient], message: Message
+        cls,
+        clients: dict[str, "MCPClient"],
+        message: Message,
+        spill: Optional[SpillStore] = None,
     ) -> List[ToolResultBlockParam]:
         print("[DEBUG] execute_tool_requests called")  # Debug log
         # Handle both Gemini and Anthropic message types
@@ -74,7 +91,25 @@ class ToolManager:
 
             print(f"[DEBUG] Processing tool request: {tool_name} with input: {tool_input}")  # Debug log
 
-            client = await cls._find_client_with_tool(
+            if spill and tool_name == FETCH_TOOL_NAME:
+                tool_input, errors = validators.validate(FETCH_TOOL, tool_input)
+                if errors:
+                    tool_result_blocks.append(
+                        cls._build_tool_result_part(tool_use_id, format_errors(tool_name, errors), "error")
+                    )
+                    continue
+                try:
+                    tool_result_part = cls._build_tool_result_part(
+                        tool_use_id, spill.fetch(tool_input), "success"
+                    )
+                except ValueError as e:
+                    tool_result_part = cls._build_tool_result_part(
+                        tool_use_id, str(e), "error"
+                    )
+                tool_result_blocks.append(tool_result_part)
+                continue
+
+            client, tool = await cls._find_client_with_tool(
                 list(clients.values()), tool_name
             )
 
@@ -85,17 +120,29 @@ class ToolManager:
                 tool_result_blocks.append(tool_result_part)
                 continue
 
+            # Malformed arguments go straight back to the model, without
+            # a round trip to the server
+            tool_input, errors = validators.validate(tool, tool_input)
+            if errors:
+                print(f"[DEBUG] Rejected {tool_name} arguments: {errors}")  # Debug log
+                tool_result_blocks.append(
+                    cls._build_tool_result_part(tool_use_id, format_errors(tool_name, errors), "error")
+                )
+                continue
+
             try:
-                tool_output: CallToolResult | None = await client.call_tool(
+                tool_output: "CallToolResult | None" = await client.call_tool(
                     tool_name, tool_input
                 )
                 items = []
                 if tool_output:
                     items = tool_output.content
                 content_list = [
-                    item.text for item in items if isinstance(item, TextContent)
+                    item.text for item in items if getattr(item, "type", None) == "text"
                 ]
                 content_json = json.dumps(content_list)
+                if spill:
+                    content_json = spill.put(content_json)
                 tool_result_part = cls._build_tool_result_part(
                     tool_use_id,
                     content_json,
@@ -0,0 +1,271 @@
+import json
+from typing import Any, Callable, Iterable, Optional
+
+# Compiled schema: (value, path, errors) -> coerced value. Problems are
+# appended to `errors` instead of raised, so a call's errors are all
+# reported together.
+Validator = Callable[[Any, str, list], Any]
+
+_TRUE = {"true", "1", "yes", "on"}
+_FALSE = {"false", "0", "no", "off"}
+
+# Values compared against enums and returned for invalid input
+_INVALID = object()
+
+
+def _error(errors: list, path: str, message: str):
+    errors.append({"path": path or "arguments", "error": message})
+    return _INVALID
+
+
+def _parse_json(value: Any, kind: type) -> Any:
+    # Key=value arguments arrive as text, e.g. operations=[{...}]
+    if isinstance(value, str) and value.strip()[:1] in ("[", "{"):
+        try:
+            parsed = json.loads(value)
+        except json.JSONDecodeError:
+            return value
+        return parsed if isinstance(parsed, kind) else value
+    return value
+
+
+def _coerce_integer(value, path, errors):
+    if isinstance(value, bool):
+        return _error(errors, path, "expected an integer, got a boolean")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    return _error(errors, path, f"expected an integer, got {value!r}")
+
+
+def _coerce_number(value, path, errors):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            pass
+    return _error(errors, path, f"expected a number, got {value!r}")
+
+
+def _coerce_boolean(value, path, errors):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    return _error(errors, path, f"expected true or false, got {value!r}")
+
+
+def _coerce_string(value, path, errors):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return _error(errors, path, f"expected a string, got {type(value).__name__}")
+
+
+def _coerce_null(value, path, errors):
+    if value is None or (isinstance(value, str) and value.strip().lower() in ("null", "none")):
+        return None
+    return _error(errors, path, f"expected null, got {value!r}")
+
+
+_SCALARS = {
+    "integer": _coerce_integer,
+    "number": _coerce_number,
+    "boolean": _coerce_boolean,
+    "string": _coerce_string,
+    "null": _coerce_null,
+}
+
+
+class SchemaCompiler:
+    """
+    Compiles the JSON Schema subset MCP tool schemas use (types, required
+    and unknown properties, arrays, enums, anyOf/oneOf and local $refs)
+    into nested validator functions. Values are coerced where the intent
+    is clear, e.g. "5" for an integer or a JSON string for an array.
+    """
+
+    def __init__(self, root: dict[str, Any]):
+        self.root = root
+        self._refs: dict[str, Validator] = {}
+
+    def _resolve(self, ref: str) -> Validator:
+        if ref not in self._refs:
+            # Placeholder first, so recursive definitions terminate
+            self._refs[ref] = lambda value, path, errors: compiled(value, path, errors)
+            target: Any = self.root
+            for part in ref.lstrip("#/").split("/"):
+                target = target.get(part, {}) if isinstance(target, dict) else {}
+            compiled = self.compile(target)
+            self._refs[ref] = compiled
+        return self._refs[ref]
+
+    def compile(self, schema: dict[str, Any]) -> Validator:
+        if not isinstance(schema, dict):
+            return lambda value, path, errors: value
+        if "$ref" in schema:
+            return self._resolve(schema["$ref"])
+        for key in ("anyOf", "oneOf"):
+            if key in schema:
+                return self._any_of([self.compile(branch) for branch in schema[key]])
+
+        schema_type = schema.get("type")
+        if isinstance(schema_type, list):
+            validator = self._any_of([self.compile({**schema, "type": kind}) for kind in schema_type])
+        elif schema_type == "object" or "properties" in schema:
+            validator = self._object(schema)
+        elif schema_type == "array":
+            validator = self._array(schema)
+        elif schema_type in _SCALARS:
+            validator = _SCALARS[schema_type]
+        else:
+            validator = lambda value, path, errors: value
+
+        if "enum" in schema:
+            return self._enum(validator, schema["enum"])
+        return validator
+
+    @staticmethod
+    def _any_of(branches: list[Validator]) -> Validator:
+        def validate(value, path, errors):
+            messages = []
+            for branch in branches:
+                branch_errors: list = []
+                result = branch(value, path, branch_errors)
+                if not branch_errors:
+                    return result
+                messages.extend(error["error"] for error in branch_errors)
+            return _error(errors, path, " or ".join(dict.fromkeys(messages)))
+
+        return validate
+
+    @staticmethod
+    def _enum(validator: Validator, allowed: list) -> Validator:
+        def validate(value, path, errors):
+            result = validator(value, path, errors)
+            if result is not _INVALID and result not in allowed:
+                return _error(errors, path, f"must be one of {allowed}, got {value!r}")
+            return result
+
+        return validate
+
+    def _array(self, schema: dict[str, Any]) -> Validator:
+        item = self.compile(schema.get("items", {}))
+
+        def validate(value, path, errors):
+            value = _parse_json(value, list)
+            if not isinstance(value, list):
+                return _error(errors, path, f"expected an array, got {type(value).__name__}")
+            return [item(element, f"{path}[{i}]", errors) for i, element in enumerate(value)]
+
+        return validate
+
+    def _object(self, schema: dict[str, Any]) -> Validator:
+        properties = {
+            name: self.compile(subschema) for name, subschema in (schema.get("properties") or {}).items()
+        }
+        required = list(schema.get("required") or [])
+        extra = schema.get("additionalProperties")
+        extra_validator = self.compile(extra) if isinstance(extra, dict) else None
+
+        def validate(value, path, errors):
+            value = _parse_json(value, dict)
+            if not isinstance(value, dict):
+                return _error(errors, path, f"expected an object, got {type(value).__name__}")
+            prefix = f"{path}." if path else ""
+            result = {}
+            for name in required:
+                if name not in value:
+                    _error(errors, prefix + name, "required parameter is missing")
+            for name, element in value.items():
+                if name in properties:
+                    result[name] = properties[name](element, prefix + name, errors)
+                elif extra_validator:
+                    result[name] = extra_validator(element, prefix + name, errors)
+                elif extra:
+                    result[name] = element
+                else:
+                    _error(
+                        errors,
+                        prefix + name,
+                        f"unknown parameter; expected one of {sorted(properties)}",
+                    )
+            return result
+
+        return validate
+
+
+class ToolValidators:
+    """
+    Validators compiled from tools' `inputSchema`, cached per tool name.
+    Clients call `invalidate` when they fetch a tool listing, so a tool
+    whose schema changed is compiled again.
+    """
+
+    def __init__(self):
+        # tool name -> validator
+        self._compiled: dict[str, Validator] = {}
+        self.stats = {"compiled": 0, "validated": 0, "rejected": 0}
+
+    def invalidate(self, names: Optional[Iterable[str]] = None):
+        """Drops the validators of the tools `names`, or of every tool."""
+        if names is None:
+            self._compiled.clear()
+        for name in names or ():
+            self._compiled.pop(name, None)
+
+    def _validator(self, tool: Any) -> Optional[Validator]:
+        validator = self._compiled.get(tool.name)
+        if validator is not None:
+            return validator
+        schema = getattr(tool, "inputSchema", None)
+        if not isinstance(schema, dict):
+            return None
+        validator = SchemaCompiler(schema).compile(schema)
+        self._compiled[tool.name] = validator
+        self.stats["compiled"] += 1
+        return validator
+
+    def validate(self, tool: Any, arguments: Any) -> tuple[dict[str, Any], list[dict[str, str]]]:
+        """
+        Checks and coerces `arguments` for `tool`.
+
+        Returns:
+            The coerced arguments and a list of {"path", "error"} problems,
+            empty when the call can be sent.
+        """
+        validator = self._validator(tool)
+        if validator is None:
+            return arguments, []
+        errors: list[dict[str, str]] = []
+        coerced = validator(arguments if arguments is not None else {}, "", errors)
+        self.stats["validated"] += 1
+        if errors:
+            self.stats["rejected"] += 1
+        return coerced if isinstance(coerced, dict) else {}, errors
+
+
+def format_errors(tool_name: str, errors: list[dict[str, str]]) -> str:
+    """Validation errors as a tool result the model can correct its call from."""
+    return json.dumps(
+        {
+            "error": f"Invalid arguments for tool '{tool_name}'; the call was not sent",
+            "details": errors,
+        }
+    )
+
+
+# Shared by ToolManager and the Gemini tool-call parser
+validators = ToolValidators()
@@ -3,9 +3,21 @@ import sys
 import os
 from dotenv import load_dotenv
 from contextlib import AsyncExitStack
+from typing import Optional
 
 from mcp_client import MCPClient
-from core.gemini import Gemini
+from core.cascade import ModelCascade
+from core.provider import LLMProvider
+from core.registry import create_provider
+from core.router import ProviderRouter
+from core.hedging import Hedger
+from core.intents import IntentRouter
+from core.memory import MB, MemoryWatchdog, container_memory_limit
+from core.scheduler import ModelCallScheduler
+from core.speculation import ToolSpeculator
+from core.spill import SpillStore
+from core.sharding import ShardedMCPClient
+from core.store import ConversationStore
 
 from core.cli_chat import CliChat
 from core.cli import CliApp
@@ -14,8 +26,59 @@ load_dotenv()
 
 # Gemini Configuration
 gemini_model = os.getenv("GEMINI_MODEL", "")
+# Optional small model that routes tools and answers simple turns first
+gemini_router_model = os.getenv("GEMINI_ROUTER_MODEL", "")
+gemini_router_max_tokens = int(os.getenv("GEMINI_ROUTER_MAX_TOKENS", "1024"))
+
+# Output token limit of turns that pick a tool; longer replies are
+# generated again with the full limit (0 = always the full limit)
+gemini_routing_max_tokens = int(os.getenv("GEMINI_ROUTING_MAX_TOKENS", "128"))
 google_api_key = os.getenv("GOOGLE_API_KEY", "")
 
+# Model call limits: requests/tokens per minute and per-call deadline (0 = none)
+gemini_rpm = float(os.getenv("GEMINI_RPM", "0"))
+gemini_tpm = float(os.getenv("GEMINI_TPM", "0"))
+gemini_timeout = float(os.getenv("GEMINI_TIMEOUT", "0"))
+
+# Opt-in hedging of slow Gemini calls: "same" (duplicate to Gemini) or "claude"
+gemini_hedge = os.getenv("GEMINI_HEDGE", "")
+gemini_hedge_percentile = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "0.95"))
+gemini_hedge_max_rate = float(os.getenv("GEMINI_HEDGE_MAX_RATE", "0.1"))
+
+# Optional Claude backend for provider failover
+claude_model = os.getenv("CLAUDE_MODEL", "")
+anthropic_api_key = os.getenv("ANTHROPIC_API_KEY", "")
+provider_strategy = os.getenv("PROVIDER_STRATEGY", "priority")
+provider_timeout = float(os.getenv("PROVIDER_TIMEOUT", "0"))
+
+# Conversation persistence (disabled when CHAT_STORE_DIR is empty)
+chat_store_dir = os.getenv("CHAT_STORE_DIR", "")
+chat_session = os.getenv("CHAT_SESSION", "default")
+
+# Tool results above this many bytes are spilled to disk (0 = never)
+tool_spill_bytes = int(os.getenv("TOOL_SPILL_BYTES", "65536"))
+tool_spill_dir = os.getenv("TOOL_SPILL_DIR", "") or None
+
+# Read documents named in a query while the model is still answering
+tool_speculation = os.getenv("TOOL_SPECULATION", "1") == "1"
+
+# Run commands like "read plan.md" as direct tool calls, without the model
+intent_router = os.getenv("INTENT_ROUTER", "1") == "1"
+
+# Memory budgets in MB for traced Python memory and one session's history.
+# "auto" uses 75% of the container's memory limit; empty leaves it off
+memory_budget_mb = os.getenv("MEMORY_BUDGET_MB", "")
+memory_session_mb = float(os.getenv("MEMORY_SESSION_MB", "0"))
+
+# Where /profile writes its collapsed-stack and speedscope files
+profile_dir = os.getenv("PROFILE_DIR", "profiles")
+
+# Deadline for one MCP tool call, passed on to the server (0 = none)
+tool_timeout = float(os.getenv("TOOL_TIMEOUT", "0"))
+
+# Split the documents across this many document server processes
+doc_shards = int(os.getenv("DOC_SHARDS", "1"))
+
 # Validate Gemini configuration
 if not gemini_model:
     raise ValueError("Error: GEMINI_MODEL cannot be empty. Update .env file")
@@ -24,9 +87,86 @@ if not google_api_key:
 
 print(f"🚀 Starting Gemini Agent with model: {gemini_model}")
 
+def create_ai_service(spill_store: SpillStore | None = None) -> LLMProvider:
+    """Builds the model provider; SDKs are imported here, not at startup"""
+    scheduler = ModelCallScheduler(
+        requests_per_minute=gemini_rpm or None,
+        tokens_per_minute=gemini_tpm or None,
+        timeout=gemini_timeout or None,
+    )
+    claude = None
+    if claude_model and anthropic_api_key:
+        claude = create_provider("claude", model=claude_model)
+
+    hedger = None
+    if gemini_hedge:
+        hedger = Hedger(
+            percentile=gemini_hedge_percentile,
+            max_hedge_rate=gemini_hedge_max_rate,
+        )
+    ai_service_instance = create_provider(
+        "gemini",
+        model=gemini_model,
+        scheduler=scheduler,
+        hedger=hedger,
+        hedge_provider=claude if gemini_hedge == "claude" else None,
+        spill_store=spill_store,
+        speculator=ToolSpeculator() if tool_speculation else None,
+        routing_max_tokens=gemini_routing_max_tokens,
+    )
+
+    if claude:
+        print(f"🔀 Claude failover enabled with model: {claude_model}")
+        ai_service_instance = ProviderRouter(
+            [ai_service_instance, claude],
+            strategy=provider_strategy,
+            attempt_timeout=provider_timeout or None,
+        )
+
+    if gemini_router_model:
+        print(f"🪜 Model cascade enabled with router model: {gemini_router_model}")
+        fast = create_provider(
+            "gemini",
+            model=gemini_router_model,
+            scheduler=scheduler,
+            spill_store=spill_store,
+            speculator=ToolSpeculator() if tool_speculation else None,
+            max_output_tokens=gemini_router_max_tokens,
+            routing_max_tokens=gemini_routing_max_tokens,
+        )
+        ai_service_instance = ModelCascade(fast, ai_service_instance)
+    return ai_service_instance
+
+
+def create_memory_watchdog() -> Optional[MemoryWatchdog]:
+    if not memory_budget_mb and not memory_session_mb:
+        return None
+    budget = None
+    if memory_budget_mb == "auto":
+        limit = container_memory_limit()
+        budget = int(0.75 * limit) if limit else None
+    elif memory_budget_mb:
+        budget = int(float(memory_budget_mb) * MB)
+    print(f"🧮 Memory watchdog enabled (budget: {f'{budget / MB:.0f} MB' if budget else 'none'})")
+    return MemoryWatchdog(
+        budget=budget,
+        session_budget=int(memory_session_mb * MB) or None,
+    )
+
+
 async def main():
-    # Initialize Gemini AI service
-    ai_service_instance = Gemini(model=gemini_model)
+    # Started first, so tracemalloc sees the allocations of the whole session
+    memory = create_memory_watchdog()
+
+    spill_store = None
+    if tool_spill_bytes:
+        spill_store = SpillStore(threshold=tool_spill_bytes, directory=tool_spill_dir)
+
+    # Import the model SDKs and build the clients in a worker thread while
+    # the MCP servers are spawned
+    ai_service_task = asyncio.create_task(
+        asyncio.to_thread(create_ai_service, spill_store)
+    )
 
     server_scripts = sys.argv[1:]
     clients = {}
@@ -38,25 +178,65 @@ async def main():
     )
 
     async with AsyncExitStack() as stack:
-        doc_client = await stack.enter_async_context(
-            MCPClient(command=command, args=args)
-        )
+        if spill_store:
+            stack.callback(spill_store.close)
+
+        if doc_shards > 1:
+            async def start_shard(index: int, count: int) -> MCPClient:
+                shard_env = {
+                    **os.environ,
+                    "SHARD_INDEX": str(index),
+                    "SHARD_COUNT": str(count),
+                }
+                return await stack.enter_async_context(
+                    MCPClient(
+                        command=command,
+                        args=args,
+                        env=shard_env,
+                        tool_timeout=tool_timeout or None,
+                    )
+                )
+
+            shards = [await start_shard(index, doc_shards) for index in range(doc_shards)]
+            doc_client = ShardedMCPClient(shards, start_shard=start_shard)
+        else:
+            doc_client = await stack.enter_async_context(
+                MCPClient(command=command, args=args, tool_timeout=tool_timeout or None)
+            )
         clients["doc_client"] = doc_client
 
         for i, server_script in enumerate(server_scripts):
             client_id = f"client_{i}_{server_script}"
             client = await stack.enter_async_context(
-                MCPClient(command="uv", args=["run", server_script])
+                MCPClient(
+                    command="uv",
+                    args=["run", server_script],
+                    tool_timeout=tool_timeout or None,
+                )
             )
             clients[client_id] = client
 
+        ai_service_instance = await ai_service_task
+
+        store = None
+        history_file = None
+        if chat_store_dir:
+            store = ConversationStore(chat_store_dir, session_id=chat_session)
+            stack.callback(store.close)
+            history_file = os.path.join(store.path, "prompt_history")
+
         chat = CliChat(
             doc_client=doc_client,
             clients=clients,
             ai_service=ai_service_instance,
+            store=store,
+            spill=spill_store,
+            intents=IntentRouter() if intent_router else None,
+            profile_dir=profile_dir,
+            memory=memory,
         )
 
-        cli = CliApp(chat)
+        cli = CliApp(chat, history_file=history_file)
         await cli.initialize()
         await cli.run()
 
@@ -1,9 +1,66 @@
 import sys
 import asyncio
-from typing import Optional, Any
+import inspect
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Optional, Any
 from contextlib import AsyncExitStack
+from datetime import timedelta
 from mcp import ClientSession, StdioServerParameters, types
+from mcp.shared.exceptions import McpError
 from mcp.client.stdio import stdio_client
+from pydantic import AnyUrl
+
+from core.jobs import JOB_TOOLS, JobTracker, ProgressFn
+from core.validation import validators
+
+# Rendered prompts kept per client, least recently used evicted first
+PROMPT_CACHE_SIZE = 128
+
+DOCS_URI = "docs://documents"
+
+# Error code of the McpError a session raises when a request times out
+REQUEST_TIMEOUT = 408
+
+# Extra seconds a tool call waits past its deadline for the server's own
+# deadline error before giving up on the response
+DEADLINE_GRACE = 1.0
+
+# `_meta` key of the id the client gives each tool call
+CALL_ID = "callId"
+
+
+class _RequestIdRecorder:
+    """
+    Wraps the session's write stream and records the JSON-RPC id of each
+    outgoing tool call by the call id in its `_meta`, which the
+    cancellation notification for an abandoned call must name.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        # call id -> JSON-RPC request id
+        self.request_ids: dict[str, types.RequestId] = {}
+
+    async def send(self, message):
+        request = message.message.root
+        if isinstance(request, types.JSONRPCRequest) and request.method == "tools/call":
+            meta = (request.params or {}).get("_meta") or {}
+            if CALL_ID in meta:
+                self.request_ids[meta[CALL_ID]] = request.id
+        await self._stream.send(message)
+
+    async def __aenter__(self):
+        await self._stream.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self._stream.__aexit__(*exc_info)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
 
 
 class MCPClient:
@@ -12,12 +69,33 @@ class MCPClient:
         command: str,
         args: list[str],
         env: Optional[dict] = None,
+        tool_timeout: Optional[float] = None,
     ):
         self._command = command
         self._args = args
         self._env = env
+        # Default deadline in seconds for tool calls (None = unlimited)
+        self.tool_timeout = tool_timeout
         self._session: Optional[ClientSession] = None
+        self._requests: Optional[_RequestIdRecorder] = None
         self._exit_stack: AsyncExitStack = AsyncExitStack()
+        # Tools from the last listing, None until listed or after the
+        # server announced a change
+        self.tools: Optional[list[types.Tool]] = None
+        # Tools the server marked read-only; any other call may change a doc
+        self._read_only_tools: set[str] = set()
+        # Doc ids from the last docs listing, None until one is read
+        self.doc_ids: Optional[set[str]] = None
+        # Local version per doc id, bumped whenever a call may have edited it
+        self._doc_versions: dict[str, int] = {}
+        # (prompt name, doc id, doc version, arguments) -> rendered prompt messages
+        self._prompt_cache: OrderedDict[tuple, list[types.PromptMessage]] = OrderedDict()
+        self.prompt_cache_stats = {"hits": 0, "misses": 0}
+        # Notification name -> callbacks, see `on`
+        self._listeners: dict[str, list[Callable[..., Any]]] = {}
+        self._callback_tasks: set[asyncio.Task] = set()
+        # Follows background jobs started by tool calls (None = not tracked)
+        self.jobs: Optional[JobTracker] = JobTracker(self)
 
     async def connect(self):
         server_params = StdioServerParameters(
@@ -29,11 +107,64 @@ class MCPClient:
             stdio_client(server_params)
         )
         _stdio, _write = stdio_transport
+        self._requests = _RequestIdRecorder(_write)
         self._session = await self._exit_stack.enter_async_context(
-            ClientSession(_stdio, _write)
+            ClientSession(_stdio, self._requests, message_handler=self._handle_message)
         )
         await self._session.initialize()
 
+        try:
+            # Updates for every document instead of one subscription each
+            await self._session.subscribe_resource(AnyUrl(DOCS_URI))
+        except Exception:
+            # Servers without document resources or subscriptions
+            pass
+
+        # Tool annotations are known before the first turn
+        await self.list_tools()
+
+    def on(self, event: str, callback: Callable[..., Any]):
+        """
+        Registers a callback for a server notification: "resource_updated"
+        (called with the uri), "resource_list_changed",
+        "prompt_list_changed" or "tool_list_changed". Callbacks may be
+        coroutine functions.
+        """
+        self._listeners.setdefault(event, []).append(callback)
+
+    def _emit(self, event: str, *args):
+        for callback in self._listeners.get(event, []):
+            result = callback(*args)
+            if inspect.isawaitable(result):
+                # Run as a task: a callback awaiting a request from inside
+                # the message handler would block reading its response
+                task = asyncio.ensure_future(result)
+                self._callback_tasks.add(task)
+                task.add_done_callback(self._callback_tasks.discard)
+
+    async def _handle_message(self, message):
+        if not isinstance(message, types.ServerNotification):
+            return
+        notification = message.root
+        if isinstance(notification, types.ResourceUpdatedNotification):
+            uri = str(notification.params.uri)
+            print(f"[DEBUG] Resource updated: {uri}")  # Debug log
+            if uri.startswith(DOCS_URI + "/"):
+                self.invalidate_doc(uri[len(DOCS_URI) + 1 :])
+            self._emit("resource_updated", uri)
+        elif isinstance(notification, types.ResourceListChangedNotification):
+            print("[DEBUG] Resource list changed")  # Debug log
+            self.doc_ids = None
+            self._emit("resource_list_changed")
+        elif isinstance(notification, types.PromptListChangedNotification):
+            print("[DEBUG] Prompt list changed")  # Debug log
+            self._prompt_cache.clear()
+            self._emit("prompt_list_changed")
+        elif isinstance(notification, types.ToolListChangedNotification):
+            print("[DEBUG] Tool list changed")  # Debug log
+            self.tools = None
+            self._emit("tool_list_changed")
+
     def session(self) -> ClientSession:
         if self._session is None:
             raise ConnectionError(
@@ -41,27 +172,143 @@ class MCPClient:
             )
         return self._session
 
-    async def list_tools(self) -> list[types.Tool]:
-        print("[DEBUG] list_tools called")  # Debug log
+    async def list_tools(self, refresh: bool = False) -> list[types.Tool]:
+        """
+        The server's tools. The listing is fetched on connect and again
+        only after the server announces a change, or with `refresh`.
+        """
+        if self.tools is not None and not refresh:
+            return self.tools
         result = await self.session().list_tools()
         print(f"[DEBUG] Tools discovered: {[tool.name for tool in result.tools]}")  # Debug log
+        self._read_only_tools = {
+            tool.name
+            for tool in result.tools
+            if tool.annotations and tool.annotations.readOnlyHint
+        }
+        self.tools = result.tools
+        # Schemas may have changed since the tools were last listed
+        validators.invalidate(tool.name for tool in result.tools)
         return result.tools
 
     async def call_tool(
-        self, tool_name: str, tool_input: dict
+        self,
+        tool_name: str,
+        tool_input: dict,
+        timeout: Optional[float] = None,
+        progress_callback: Optional[ProgressFn] = None,
     ) -> types.CallToolResult | None:
+        """
+        Calls a server tool. With a timeout (or `tool_timeout`), the deadline
+        is sent in the request's `_meta` so the server can give up on queued
+        work, and a call that times out or is cancelled here is cancelled on
+        the server too. A job handle in the result is followed by `jobs`.
+        """
         print(f"[DEBUG] call_tool called with tool_name: {tool_name}, tool_input: {tool_input}")  # Debug log
-        result = await self.session().call_tool(tool_name, tool_input)
+        session = self.session()
+        timeout = timeout or self.tool_timeout
+        call_id = uuid.uuid4().hex
+        meta: dict[str, Any] = {CALL_ID: call_id}
+        if timeout:
+            meta["deadline"] = time.time() + timeout
+        try:
+            result = await session.call_tool(
+                tool_name,
+                tool_input,
+                read_timeout_seconds=timedelta(seconds=timeout + DEADLINE_GRACE) if timeout else None,
+                progress_callback=progress_callback,
+                meta=meta,
+            )
+        except (asyncio.CancelledError, McpError) as e:
+            if isinstance(e, asyncio.CancelledError) or e.error.code == REQUEST_TIMEOUT:
+                request_id = self._requests.request_ids.get(call_id)
+                if request_id is not None:
+                    await self._cancel_request(request_id, f"{tool_name} was abandoned by the client")
+            raise
+        finally:
+            self._requests.request_ids.pop(call_id, None)
+            # Even a failed call may have partially applied an edit
+            if tool_name not in self._read_only_tools:
+                for doc_id in self.edited_doc_ids(tool_input):
+                    self.invalidate_doc(doc_id)
         print(f"[DEBUG] Tool execution result: {result}")  # Debug log
+        if self.jobs and tool_name not in JOB_TOOLS:
+            self.jobs.observe(result)
         return result
 
+    async def _cancel_request(self, request_id: types.RequestId, reason: str):
+        try:
+            await self.session().send_notification(
+                types.ClientNotification(
+                    types.CancelledNotification(
+                        params=types.CancelledNotificationParams(requestId=request_id, reason=reason)
+                    )
+                )
+            )
+        except Exception:
+            # The session is already closed
+            pass
+
+    @staticmethod
+    def edited_doc_ids(tool_input: dict) -> set[str]:
+        """Doc ids named in a call's input, including bulk_edit operations."""
+        doc_ids = set()
+        if "doc_id" in tool_input:
+            doc_ids.add(str(tool_input["doc_id"]))
+        for operation in tool_input.get("operations") or []:
+            if isinstance(operation, dict) and "doc_id" in operation:
+                doc_ids.add(str(operation["doc_id"]))
+        return doc_ids
+
+    def is_read_only(self, tool_name: str) -> bool:
+        """Whether the server marked the tool read-only (as of the last tool listing)."""
+        return tool_name in self._read_only_tools
+
+    def doc_version(self, doc_id: str) -> int:
+        """Local version of a doc; changes whenever a call may have edited it."""
+        return self._doc_versions.get(doc_id, 0)
+
+    def invalidate_doc(self, doc_id: str):
+        """Marks a doc as changed so prompts rendered for it are fetched again."""
+        self._doc_versions[doc_id] = self._doc_versions.get(doc_id, 0) + 1
+        for key in [key for key in self._prompt_cache if key[1] == doc_id]:
+            del self._prompt_cache[key]
+
+    def caches(self) -> list[Any]:
+        """Rendered prompts held by the client, for memory accounting."""
+        return [self._prompt_cache]
+
+    def clear_caches(self):
+        self._prompt_cache.clear()
+
     async def list_prompts(self) -> list[types.Prompt]:
-        # TODO: Return a list of prompts defined by the MCP server
-        return []
+        result = await self.session().list_prompts()
+        return result.prompts
 
     async def get_prompt(self, prompt_name, args: dict[str, str]):
-        # TODO: Get a particular prompt defined by the MCP server
-        return []
+        """
+        Returns the server's rendered prompt messages, cached per prompt,
+        arguments and doc version so repeating a command on an unchanged
+        doc makes no request.
+        """
+        doc_id = args.get("doc_id")
+        key = (
+            prompt_name,
+            doc_id,
+            self.doc_version(doc_id),
+            frozenset(args.items()),
+        )
+        if key in self._prompt_cache:
+            self._prompt_cache.move_to_end(key)
+            self.prompt_cache_stats["hits"] += 1
+            return self._prompt_cache[key]
+
+        self.prompt_cache_stats["misses"] += 1
+        result = await self.session().get_prompt(prompt_name, args)
+        self._prompt_cache[key] = result.messages
+        if len(self._prompt_cache) > PROMPT_CACHE_SIZE:
+            self._prompt_cache.popitem(last=False)
+        return result.messages
 
     # async def read_resource(self, uri: str) -> Any:
     #     try:
@@ -73,10 +320,21 @@ class MCPClient:
     #         return f"Error reading file '{uri}': {e}"
 
     async def read_resource(self, uri: str) -> Any:
-        # TODO: Read a resource, parse the contents and return it
-        return []
+        result = await self.session().read_resource(AnyUrl(uri))
+        resource = result.contents[0]
+
+        if isinstance(resource, types.TextResourceContents):
+            if resource.mimeType == "application/json":
+                data = json.loads(resource.text)
+                if uri == DOCS_URI:
+                    self.doc_ids = set(data)
+                return data
+            return resource.text
+        return resource.blob
 
     async def cleanup(self):
+        if self.jobs:
+            self.jobs.close()
         await self._exit_stack.aclose()
         self._session = None
 
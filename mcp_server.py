@@ -1,10 +1,77 @@
-from mcp.server.fastmcp import FastMCP
-from pydantic import Field
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+import weakref
+from contextlib import asynccontextmanager
+from typing import Iterable, Optional
 
-mcp = FastMCP("DocumentMCP", log_level="ERROR")
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.server.fastmcp.prompts import base
+from mcp.types import ToolAnnotations
+from pydantic import AnyUrl, BaseModel, Field
 
+from core.edits import apply_operations
+from core.executor import CPU, INLINE, IO, ToolExecutor
+from core.ingest import DirectoryWatcher, DocumentStore, Ingestor
+from core.jobs import JobManager, ProgressFn
+from core.retrieval import EmbeddingIndex
+from core.sharding import HashRing, shard_names
+from core.templates import PromptTemplate
 
-docs = {
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    """Ingests and watches DOCS_DIR, if set, for as long as the server runs."""
+    directory = os.getenv("DOCS_DIR")
+    if not directory:
+        await asyncio.to_thread(index.sync, docs)
+        try:
+            yield
+        finally:
+            close_ingestor()
+            executor.close()
+        return
+
+    watcher = DirectoryWatcher(
+        directory,
+        docs,
+        shared_ingestor(),
+        interval=float(os.getenv("DOCS_POLL_SECONDS", "2")),
+        owns=owns,
+    )
+    # ingest_documents calls under DOCS_DIR share this watcher
+    watchers[os.path.realpath(directory)] = watcher
+    # The first scan finishes before requests are served; later ones
+    # re-index and notify as files change
+    await watcher.scan()
+    await asyncio.to_thread(index.sync, docs)
+    watcher.on_change = on_docs_changed
+    task = asyncio.create_task(watcher.run())
+    try:
+        yield
+    finally:
+        task.cancel()
+        close_ingestor()
+        executor.close()
+
+
+mcp = FastMCP("DocumentMCP", log_level="ERROR", lifespan=lifespan)
+
+
+# This process serves the doc ids the hash ring assigns to shard
+# SHARD_INDEX of SHARD_COUNT; see core.sharding.ShardedMCPClient
+SHARD_INDEX = int(os.getenv("SHARD_INDEX", "0"))
+SHARD_NAME = shard_names(SHARD_INDEX + 1)[-1]
+shard_ring = HashRing(shard_names(int(os.getenv("SHARD_COUNT", "1"))))
+
+
+def owns(doc_id: str) -> bool:
+    return shard_ring.node(doc_id) == SHARD_NAME
+
+
+SAMPLE_DOCS = {
     "deposition.md": "This deposition covers the testimony of Angela Smith, P.E.",
     "report.pdf": "The report details the state of a 20m condenser tower.",
     "financials.docx": "These financials outline the project's budget and expenditures.",
@@ -13,39 +80,612 @@ docs = {
     "spec.txt": "These specifications define the technical requirements for the equipment.",
 }
 
+# Built-in samples; with DOCS_DIR set, files from that directory are added
+# and kept up to date by the lifespan's watcher
+docs = DocumentStore({doc_id: text for doc_id, text in SAMPLE_DOCS.items() if owns(doc_id)})
+
+DOCS_URI = "docs://documents"
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+# Blocking tool work runs here instead of on the event loop
+executor = ToolExecutor(
+    max_processes=_env_int("TOOL_PROCESSES"),
+    max_threads=_env_int("TOOL_THREADS"),
+)
+
+# Plain edits of up to this many characters run on the event loop; a
+# worker process would cost more, since the text is pickled both ways
+INLINE_EDIT_CHARS = 64 * 1024
+# Regex and diff work over more text than this runs in the process pool
+PROCESS_EDIT_CHARS = 1 << 20
+
+
+def edit_kind(chars: int, heavy: bool = False) -> str:
+    """Executor kind for an edit over `chars` characters; `heavy` for regex or diffs."""
+    if heavy and chars > PROCESS_EDIT_CHARS:
+        return CPU
+    if heavy or chars > INLINE_EDIT_CHARS:
+        return IO
+    return INLINE
+
+
+# One extraction cache for every directory the server ingests
+INGEST_CACHE_DIR = os.getenv("INGEST_CACHE_DIR") or (
+    os.path.join(os.environ["DOCS_DIR"], ".ingest-cache")
+    if os.getenv("DOCS_DIR")
+    else os.path.join(tempfile.gettempdir(), "document-mcp-ingest-cache")
+)
+
+# Directories ingest_documents may read from: INGEST_ROOTS (separated by
+# os.pathsep), else DOCS_DIR. With neither set the tool is refused
+INGEST_ROOTS = [
+    os.path.realpath(root)
+    for root in (os.getenv("INGEST_ROOTS") or os.getenv("DOCS_DIR") or "").split(os.pathsep)
+    if root
+]
+
+_ingestor: Optional[Ingestor] = None
+
+
+def shared_ingestor() -> Ingestor:
+    """The server's ingestor, created on first use."""
+    global _ingestor
+    if _ingestor is None:
+        _ingestor = Ingestor(INGEST_CACHE_DIR, max_workers=_env_int("INGEST_WORKERS"))
+    return _ingestor
+
+
+def ingest_directory(directory: str) -> tuple[str, str]:
+    """
+    Resolves a directory the model asked to ingest, relative to the first
+    ingest root, and rejects anything outside the ingest roots.
+
+    Returns:
+        The innermost ingest root holding the directory, and its path.
+    """
+    if not INGEST_ROOTS:
+        raise ValueError("Ingesting is disabled; set INGEST_ROOTS or DOCS_DIR on the server")
+    path = os.path.realpath(os.path.join(INGEST_ROOTS[0], directory))
+    roots = [root for root in INGEST_ROOTS if os.path.commonpath([path, root]) == root]
+    if not roots:
+        raise ValueError(f"Directory {directory} is outside the ingest roots")
+    if not os.path.isdir(path):
+        raise ValueError(f"Directory {directory} not found")
+    return max(roots, key=len), path
+
+
+# One watcher per ingest root for the server's lifetime, so re-ingesting
+# only picks up changed files and keeps edits to unchanged ones
+watchers: dict[str, DirectoryWatcher] = {}
+
+
+def root_watcher(root: str) -> DirectoryWatcher:
+    watcher = watchers.get(root)
+    if watcher is None:
+        watcher = DirectoryWatcher(root, docs, shared_ingestor(), on_change=on_docs_changed, owns=owns)
+        watchers[root] = watcher
+    return watcher
+
+
+def close_ingestor():
+    if _ingestor is not None:
+        _ingestor.close()
+
+
+# Long tool calls run here when a client asks for them in the background
+jobs = JobManager(prefix=SHARD_NAME)
+
+
+def request_deadline() -> Optional[float]:
+    """Wall-clock deadline the client attached to the current request, if any."""
+    try:
+        meta = mcp.get_context().request_context.meta
+    except (LookupError, ValueError):
+        # Called outside a request
+        return None
+    deadline = getattr(meta, "deadline", None) if meta else None
+    return float(deadline) if deadline is not None else None
+
+
+# Cross-shard bulk edits staged by bulk_edit_prepare, by transaction id.
+# Their docs take no other edit until the transaction is committed,
+# aborted or expires, so committing cannot fail on one shard after
+# another shard has applied its part.
+PREPARED_EDIT_SECONDS = 60.0
+prepared_edits: dict[str, dict] = {}
+
+
+def check_unlocked(doc_ids: Iterable[str]):
+    now = time.monotonic()
+    for transaction in [key for key, edit in prepared_edits.items() if edit["expires"] < now]:
+        del prepared_edits[transaction]
+    for doc_id in doc_ids:
+        if any(doc_id in edit["doc_ids"] for edit in prepared_edits.values()):
+            raise ValueError(f"Doc with id {doc_id} is part of a pending cross-shard edit; try again")
+
+
+def check_unchanged(texts: dict[str, str]):
+    # Edits run off the loop on a snapshot; refuse to overwrite a doc that
+    # another request changed or locked in the meantime
+    check_unlocked(texts)
+    for doc_id, text in texts.items():
+        if docs.get(doc_id) != text:
+            raise ValueError(f"Doc with id {doc_id} changed during the edit; try again")
+
+
+# Session -> resource uris it subscribed to. A subscription to DOCS_URI
+# covers every document in it.
+subscriptions: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+@mcp._mcp_server.subscribe_resource()
+async def subscribe(uri: AnyUrl):
+    session = mcp._mcp_server.request_context.session
+    subscriptions.setdefault(session, set()).add(str(uri))
+
+
+@mcp._mcp_server.unsubscribe_resource()
+async def unsubscribe(uri: AnyUrl):
+    session = mcp._mcp_server.request_context.session
+    subscriptions.get(session, set()).discard(str(uri))
+
+
+async def notify_docs_changed(doc_ids: Iterable[str], list_changed: bool = False):
+    """Sends resource-updated (and list-changed) notifications to subscribed clients."""
+    doc_ids = list(doc_ids)
+    for session, uris in list(subscriptions.items()):
+        try:
+            if list_changed:
+                await session.send_resource_list_changed()
+            for doc_id in doc_ids:
+                uri = f"{DOCS_URI}/{doc_id}"
+                if DOCS_URI in uris or uri in uris:
+                    await session.send_resource_updated(AnyUrl(uri))
+        except Exception:
+            # The client went away
+            subscriptions.pop(session, None)
+
+
+# Chunk embeddings for `retrieve`, synced with the docs at startup;
+# persisted when RETRIEVAL_INDEX_DIR is set
+index = EmbeddingIndex(os.getenv("RETRIEVAL_INDEX_DIR") or None)
+
+
+async def on_docs_changed(added: list[str], updated: list[str], removed: list[str]):
+    """Re-indexes ingested documents and tells clients about them."""
+    for doc_id in removed:
+        index.remove(doc_id)
+    for doc_id in added + updated:
+        await executor.run("index_update", IO, index.update, doc_id, docs[doc_id])
+    await notify_docs_changed(updated, list_changed=bool(added or removed))
+
 # TODO: Write a tool to read a doc
 @mcp.tool(
     name="read_doc_contents",
-    description="Read the contents of a document and return it as a string."
+    description="Read the contents of a document and return it as a string.",
+    annotations=ToolAnnotations(readOnlyHint=True),
 )
-def read_document(
+async def read_document(
     doc_id: str = Field(description="Id of the document to read")
 ):
     print(f"[DEBUG] read_document called with doc_id: {doc_id}")  # Debug log
     if doc_id not in docs:
         raise ValueError(f"Doc with id {doc_id} not found")
-    
-    return docs[doc_id]
+
+    # Ingested docs are read from disk
+    return await executor.run(
+        "read_doc_contents", IO, docs.__getitem__, doc_id, deadline=request_deadline()
+    )
 
 # TODO: Write a tool to edit a doc
 @mcp.tool(
     name="edit_document",
-    description="Edit a document by replacing a string in the documents content with a new string."
+    description="Edit a document by replacing a string in the documents content with a new string.",
+    annotations=ToolAnnotations(readOnlyHint=False, destructiveHint=True),
 )
-def edit_document(
+async def edit_document(
     doc_id: str = Field(description="Id of the document that will be edited"),
-    old_str: str = Field(description="The text to replace. Must match exactly, including whitespace."),
-    new_str: str = Field(description="The new text to insert in place of the old text.")
+    old_str: str = Field(description="The text to replace. Must match exactly, including whitespace.", min_length=1),
+    new_str: str = Field(description="The new text to insert in place of the old text."),
 ):
     if doc_id not in docs:
         raise ValueError(f"Doc with id {doc_id} not found")
-    
-    docs[doc_id] = docs[doc_id].replace(old_str, new_str)
+    if not old_str:
+        raise ValueError("old_str must not be empty")
+    check_unlocked([doc_id])
+
+    text = docs[doc_id]
+    edited = await executor.run(
+        "edit_document", edit_kind(len(text)), str.replace, text, old_str, new_str, deadline=request_deadline()
+    )
+    check_unchanged({doc_id: text})
+    docs[doc_id] = edited
+    await executor.run("index_update", IO, index.update, doc_id, edited)
+    await notify_docs_changed([doc_id])
+
+
+class EditOperation(BaseModel):
+    doc_id: str = Field(description="Id of the document to edit")
+    pattern: str = Field(description="Text to replace, or a regular expression if regex is true", min_length=1)
+    replacement: str = Field(description="Replacement text; with regex, may use \\1 or \\g<name> groups")
+    regex: bool = Field(default=False, description="Treat pattern as a regular expression")
+
+
+def start_job(tool_name: str, work) -> dict:
+    """Runs `work(report)` as a background job and returns its handle."""
+    return jobs.submit(tool_name, work).snapshot()
+
+
+def check_operations(operations: list[EditOperation]):
+    for number, operation in enumerate(operations, start=1):
+        if operation.doc_id not in docs:
+            raise ValueError(f"Operation {number}: doc with id {operation.doc_id} not found")
+
+
+async def stage_bulk_edit(
+    tool_name: str,
+    operations: list[EditOperation],
+    dry_run: bool,
+    deadline: Optional[float],
+) -> tuple[dict[str, str], dict[str, str], dict[str, dict]]:
+    """
+    Applies the operations to staged copies, off the loop unless small.
+
+    Returns:
+        The docs' texts before, the staged texts and a report per doc.
+    """
+    texts = {operation.doc_id: docs[operation.doc_id] for operation in operations}
+    check_unlocked(texts)
+    heavy = dry_run or any(operation.regex for operation in operations)
+    staged, reports = await executor.run(
+        tool_name,
+        edit_kind(sum(map(len, texts.values())), heavy),
+        apply_operations,
+        texts,
+        [operation.model_dump() for operation in operations],
+        dry_run,
+        deadline=deadline,
+    )
+    return texts, staged, reports
+
+
+async def apply_staged(staged: dict[str, str], report: Optional[ProgressFn] = None):
+    """Replaces the docs with their staged texts, then re-indexes and notifies."""
+    for doc_id, text in staged.items():
+        docs[doc_id] = text
+    for number, (doc_id, text) in enumerate(staged.items(), start=1):
+        if report:
+            await report(number, len(staged) + 1, f"Re-indexing {doc_id}")
+        await executor.run("index_update", IO, index.update, doc_id, text)
+    await notify_docs_changed(staged)
+
+
+def changed_texts(staged: dict[str, str], reports: dict[str, dict]) -> dict[str, str]:
+    return {doc_id: staged[doc_id] for doc_id, report in reports.items() if report["changed"]}
+
+
+async def run_bulk_edit(
+    operations: list[EditOperation],
+    dry_run: bool,
+    report: ProgressFn,
+    deadline: Optional[float],
+) -> dict:
+    # Docs change only once every operation succeeded
+    await report(0, len({operation.doc_id for operation in operations}) + 1, "Applying operations")
+    texts, staged, reports = await stage_bulk_edit("bulk_edit", operations, dry_run, deadline)
+
+    result = {
+        "applied": not dry_run,
+        "total_matches": sum(report["matches"] for report in reports.values()),
+        "documents": reports,
+    }
+    if not dry_run:
+        check_unchanged(texts)
+        await apply_staged(changed_texts(staged, reports), report)
+    return result
+
+
+@mcp.tool(
+    name="bulk_edit",
+    description="Apply several find-and-replace operations across one or more documents at once. Either every operation is applied or, if any fails, none is. With dry_run, nothing is changed and unified diffs are returned instead. With background, a job handle is returned at once; use job_status or job_wait for the result.",
+    annotations=ToolAnnotations(readOnlyHint=False, destructiveHint=True),
+)
+async def bulk_edit(
+    ctx: Context,
+    operations: list[EditOperation] = Field(description="Edits to apply, in order"),
+    dry_run: bool = Field(default=False, description="Only report match counts and diffs"),
+    background: bool = Field(default=False, description="Run as a background job, for edits across many documents"),
+) -> dict:
+    check_operations(operations)
+    if background:
+        # The job outlives this request and its deadline
+        return start_job("bulk_edit", lambda report: run_bulk_edit(operations, dry_run, report, None))
+    return await run_bulk_edit(operations, dry_run, ctx.report_progress, request_deadline())
+
+
+def shard_tool(name: str, description: str, read_only: bool = False):
+    """
+    Registers a tool that only sharded servers offer. ShardedMCPClient
+    calls these itself and leaves them out of the tools the model sees.
+    """
+
+    def register(func):
+        if os.getenv("SHARD_COUNT"):
+            mcp.tool(
+                name=name,
+                description=description,
+                annotations=ToolAnnotations(readOnlyHint=read_only, destructiveHint=not read_only),
+            )(func)
+        return func
+
+    return register
+
+
+@shard_tool(
+    name="bulk_edit_prepare",
+    description="Stage this shard's part of a cross-shard bulk_edit and lock its documents until bulk_edit_commit.",
+)
+async def bulk_edit_prepare(
+    operations: list[EditOperation] = Field(description="This shard's edits, in order"),
+) -> dict:
+    check_operations(operations)
+    texts, staged, reports = await stage_bulk_edit("bulk_edit_prepare", operations, False, request_deadline())
+    check_unchanged(texts)
+    transaction = uuid.uuid4().hex
+    prepared_edits[transaction] = {
+        "doc_ids": set(texts),
+        "staged": changed_texts(staged, reports),
+        "expires": time.monotonic() + PREPARED_EDIT_SECONDS,
+    }
+    return {
+        "transaction": transaction,
+        "total_matches": sum(report["matches"] for report in reports.values()),
+        "documents": reports,
+    }
+
+
+@shard_tool(
+    name="bulk_edit_commit",
+    description="Apply (commit) or drop (abort) a bulk edit staged by bulk_edit_prepare and unlock its documents.",
+)
+async def bulk_edit_commit(
+    transaction: str = Field(description="Transaction id from bulk_edit_prepare"),
+    commit: bool = Field(default=True, description="False to abort"),
+) -> dict:
+    edit = prepared_edits.pop(transaction, None)
+    if edit is None:
+        raise ValueError(f"Transaction {transaction} not found; it may have expired")
+    if commit:
+        # The docs were locked since they were staged, so nothing changed them
+        await apply_staged(edit["staged"])
+    return {"transaction": transaction, "applied": commit, "changed": list(edit["staged"]) if commit else []}
+
+
+def ingested_from_docs_dir(doc_id: str) -> bool:
+    directory = os.getenv("DOCS_DIR")
+    source = docs.source(doc_id) if docs.is_file_backed(doc_id) else None
+    if not directory or source is None:
+        return False
+    directory = os.path.realpath(directory)
+    return os.path.commonpath([source, directory]) == directory
+
+
+@shard_tool(
+    name="shard_export",
+    description="List the documents this shard hands over when the ring grows to shard_count shards, with the text of those the new shard cannot ingest itself. Changes nothing.",
+    read_only=True,
+)
+def shard_export(
+    shard_count: int = Field(description="Number of shards after the new one is added"),
+) -> dict:
+    ring = HashRing(shard_names(shard_count))
+    moved = [doc_id for doc_id in docs if ring.node(doc_id) != SHARD_NAME]
+    check_unlocked(moved)
+    return {
+        "moved": moved,
+        # Unedited DOCS_DIR files are ingested by the new shard on startup
+        "documents": {doc_id: docs[doc_id] for doc_id in moved if not ingested_from_docs_dir(doc_id)},
+    }
+
+
+@shard_tool(
+    name="shard_import",
+    description="Add documents handed over by other shards to this shard.",
+)
+async def shard_import(
+    documents: dict[str, str] = Field(description="Text by doc id"),
+) -> dict:
+    for doc_id, text in documents.items():
+        docs[doc_id] = text
+        await executor.run("index_update", IO, index.update, doc_id, text)
+    await notify_docs_changed([], list_changed=bool(documents))
+    return {"imported": len(documents)}
+
+
+@shard_tool(
+    name="shard_rebalance",
+    description="Adopt a ring of shard_count shards and drop the documents this shard no longer owns. Call after they were imported by the new shard.",
+)
+async def shard_rebalance(
+    shard_count: int = Field(description="Number of shards after the new one is added"),
+) -> dict:
+    for name in shard_names(shard_count):
+        shard_ring.add(name)
+    dropped = [doc_id for doc_id in docs if not owns(doc_id)]
+    for doc_id in dropped:
+        docs.pop(doc_id, None)
+        index.remove(doc_id)
+    await notify_docs_changed([], list_changed=bool(dropped))
+    return {"dropped": dropped}
+
+
+async def run_ingest(root: str, directory: str, report: ProgressFn) -> dict:
+    # The watcher re-indexes and notifies clients itself
+    watcher = root_watcher(root)
+
+    async def progress(done: int, total: int):
+        await report(done, total, f"Ingested {done} of {total} files")
+
+    subdirectory = os.path.relpath(directory, root)
+    added, updated, removed = await watcher.scan(progress=progress, subdirectory=subdirectory)
+    prefix = "" if subdirectory == "." else subdirectory.replace(os.sep, "/") + "/"
+    return {
+        "added": added,
+        "updated": updated,
+        "removed": removed,
+        # Ids already taken by a document from another file
+        "conflicts": sorted(doc_id for doc_id in watcher.conflicts if doc_id.startswith(prefix)),
+    }
+
+
+@mcp.tool(
+    name="ingest_documents",
+    description="Add every .md, .txt, .pdf and .docx file under a directory on the server to the documents, with ids relative to its ingest root, and update those already added from it. Runs as a background job by default and returns a job handle; use job_status or job_wait for the result.",
+    annotations=ToolAnnotations(readOnlyHint=False, destructiveHint=False),
+)
+async def ingest_documents(
+    ctx: Context,
+    directory: str = Field(description="Directory on the server to ingest, relative to its ingest root"),
+    background: bool = Field(default=True, description="Run as a background job"),
+) -> dict:
+    root, directory = ingest_directory(directory)
+    if background:
+        return start_job("ingest_documents", lambda report: run_ingest(root, directory, report))
+    return await run_ingest(root, directory, ctx.report_progress)
+
+
+@mcp.tool(
+    name="job_status",
+    description="Get the status, progress and, once finished, the result of a background job.",
+    annotations=ToolAnnotations(readOnlyHint=True),
+)
+def job_status(
+    job_id: str = Field(description="Id of the job, from its handle"),
+) -> dict:
+    return jobs.get(job_id).snapshot()
+
+
+@mcp.tool(
+    name="job_wait",
+    description="Wait for a background job to finish, up to a timeout, sending progress notifications meanwhile. Returns the job's status and result.",
+    annotations=ToolAnnotations(readOnlyHint=True),
+)
+async def job_wait(
+    ctx: Context,
+    job_id: str = Field(description="Id of the job, from its handle"),
+    timeout: float = Field(default=30.0, description="Seconds to wait at most"),
+) -> dict:
+    job = await jobs.wait(job_id, min(max(timeout, 0.0), 300.0), ctx.report_progress)
+    return job.snapshot()
+
+
+@mcp.tool(
+    name="job_cancel",
+    description="Cancel a running background job. Edits a cancelled job already applied stay applied.",
+    annotations=ToolAnnotations(readOnlyHint=False, destructiveHint=False),
+)
+async def job_cancel(
+    job_id: str = Field(description="Id of the job, from its handle"),
+) -> dict:
+    job = await jobs.cancel(job_id)
+    return job.snapshot()
+
+
+@mcp.tool(
+    name="retrieve",
+    description="Find the passages of the documents most relevant to a query. Returns the top matching chunks with their document ids and similarity scores.",
+    annotations=ToolAnnotations(readOnlyHint=True),
+)
+async def retrieve(
+    query: str = Field(description="What to search the documents for"),
+    k: int = Field(default=5, description="Number of passages to return"),
+    doc_id: str = Field(default="", description="Only search this document (optional)"),
+) -> list[dict]:
+    # The index lives in this process; NumPy releases the GIL for the search
+    return await executor.run(
+        "retrieve",
+        IO,
+        index.search,
+        query,
+        k,
+        [doc_id] if doc_id else None,
+        deadline=request_deadline(),
+    )
+
+
+@mcp.resource(
+    "docs://documents",
+    mime_type="application/json"
+)
+def list_docs() -> list[str]:
+    return list(docs.keys())
+
+
+@mcp.resource(
+    "docs://documents/{doc_id}",
+    mime_type="text/plain"
+)
+async def fetch_doc(doc_id: str) -> str:
+    if doc_id not in docs:
+        raise ValueError(f"Doc with id {doc_id} not found")
+    return await executor.run("fetch_doc", IO, docs.__getitem__, doc_id)
+
+
+@mcp.resource(
+    "stats://tools",
+    mime_type="application/json"
+)
+def tool_stats() -> dict:
+    """Per-tool call counts, in-flight depth and pool queue depth."""
+    return {**executor.stats(), "jobs": jobs.stats()}
+
+
+# Prompt name -> (description, template). Templates are parsed once here;
+# each request only substitutes the arguments.
+PROMPTS = {
+    "format": (
+        "Rewrites the contents of the document in Markdown format.",
+        PromptTemplate("""Your goal is to reformat a document to be written with markdown syntax.
+
+The id of the document you need to reformat is:
+<document_id>
+$doc_id
+</document_id>
+
+Add in headers, bullet points, tables, etc as necessary. Feel free to add in extra text, but don't change the meaning of the report.
+Use the 'edit_document' tool to edit the document. After the document has been edited, respond with the final version of the doc. Don't explain your changes.
+"""),
+    ),
+    "summarize": (
+        "Summarizes the contents of the document.",
+        PromptTemplate("""Your goal is to summarize the contents of a document.
+
+The id of the document you need to summarize is:
+<document_id>
+$doc_id
+</document_id>
+
+Read the document with the 'read_doc_contents' tool, then write a short summary of its key points. Start with the most important information.
+"""),
+    ),
+}
+
+
+def register_prompt(name: str, description: str, template: PromptTemplate):
+    @mcp.prompt(name=name, description=description)
+    def render_prompt(
+        doc_id: str = Field(description=f"Id of the document to {name}")
+    ) -> list[base.Message]:
+        return [base.UserMessage(template.render(doc_id=doc_id))]
+
 
-# TODO: Write a resource to return all doc id's
-# TODO: Write a resource to return the contents of a particular doc
-# TODO: Write a prompt to rewrite a doc in markdown format
-# TODO: Write a prompt to summarize a doc
+for _name, (_description, _template) in PROMPTS.items():
+    register_prompt(_name, _description, _template)
 
 
 if __name__ == "__main__":
@@ -34,7 +34,7 @@ messages = []
 ai_service_instance.add_user_message(messages, "Hello! Can you tell me a short joke?")
 
 try:
-    response = ai_service_instance.chat(messages)
+    response = asyncio.run(ai_service_instance.chat(messages))
     print(f"\nResponse from {ai_service.title()}:")
     print(ai_service_instance.text_from_message(response))
 except Exception as e:
@@ -0,0 +1,165 @@
+"""Stand-ins for the model SDK and MCP clients shared by the tests"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+from mcp import types
+
+from core.gemini import Gemini
+from core.provider import LLMProvider
+from core.scheduler import ModelCallScheduler, RetryPolicy
+from mcp_client import MCPClient
+
+READ_DOC = types.Tool(
+    name="read_doc_contents",
+    description="Read a document",
+    inputSchema={
+        "type": "object",
+        "properties": {"doc_id": {"type": "string"}},
+        "required": ["doc_id"],
+    },
+)
+
+QUESTION = [{"role": "user", "content": "What is in plan.md?"}]
+
+
+def reply(text, finish_reason="STOP"):
+    return SimpleNamespace(text=text, candidates=[SimpleNamespace(finish_reason=finish_reason)])
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel, answering with scripted replies"""
+
+    def __init__(self, replies, delay=0.0):
+        self.replies = list(replies)
+        self.delay = delay
+        self.prompts = []
+        self.configs = []
+
+    def start_chat(self, history):
+        return SimpleNamespace(send_message_async=self._send)
+
+    async def _send(self, message, generation_config):
+        self.prompts.append(message)
+        self.configs.append(generation_config)
+        await asyncio.sleep(self.delay)
+        return self.replies.pop(0)
+
+
+class FakeClient:
+    """Stands in for MCPClient, answering every tool call with `text`"""
+
+    def __init__(self, text="The plan", tools=(READ_DOC,)):
+        self.text = text
+        self.tools = list(tools)
+        self.calls = []
+
+    async def list_tools(self):
+        return self.tools
+
+    def is_read_only(self, tool_name):
+        return tool_name.startswith("read_")
+
+    async def call_tool(self, tool_name, tool_input, *args, **kwargs):
+        self.calls.append((tool_name, tool_input))
+        return types.CallToolResult(content=[types.TextContent(type="text", text=self.text)])
+
+
+def gemini(model, **kwargs):
+    provider = Gemini("gemini-test", scheduler=ModelCallScheduler(retry=RetryPolicy(base_delay=0.0)), **kwargs)
+    provider.model = model
+    return provider
+
+
+class FakeSession:
+    """Stands in for an MCP ClientSession, counting the requests made"""
+
+    def __init__(self, tools=()):
+        self.tools = list(tools)
+        self.requests = []
+
+    async def list_tools(self):
+        self.requests.append(("list_tools",))
+        return types.ListToolsResult(tools=self.tools)
+
+    async def get_prompt(self, name, arguments):
+        self.requests.append(("get_prompt", name, dict(arguments)))
+        text = f"{name} {arguments['doc_id']}"
+        return types.GetPromptResult(
+            messages=[types.PromptMessage(role="user", content=types.TextContent(type="text", text=text))]
+        )
+
+
+def connected_client(session):
+    """An MCPClient wired to `session` instead of a server process"""
+    client = MCPClient("unused", [])
+    client._session = session
+    return client
+
+
+class FakeDocClient:
+    """Stands in for the document server's MCPClient, serving `docs` from memory"""
+
+    def __init__(self, docs, delay=0.0, tools=()):
+        self.docs = dict(docs)
+        self.delay = delay
+        self.tools = list(tools)
+        self.reads = []
+        self.calls = []
+        self.versions = {}
+        self.doc_ids = None
+        self.prompt_cache_stats = {}
+        # tool name -> JSON items a call to it returns
+        self.results = {}
+
+    edited_doc_ids = staticmethod(MCPClient.edited_doc_ids)
+
+    def on(self, event, callback):
+        pass
+
+    def doc_version(self, doc_id):
+        return self.versions.get(doc_id, 0)
+
+    def is_read_only(self, tool_name):
+        return any(tool.name == tool_name for tool in self.tools) and tool_name.startswith(("read_", "retrieve"))
+
+    async def list_tools(self):
+        return self.tools
+
+    async def read_resource(self, uri):
+        self.reads.append(uri)
+        await asyncio.sleep(self.delay)
+        if uri == "docs://documents":
+            self.doc_ids = set(self.docs)
+            return list(self.docs)
+        return self.docs[uri.rsplit("/", 1)[-1]]
+
+    async def call_tool(self, tool_name, tool_input, *args, **kwargs):
+        self.calls.append((tool_name, tool_input))
+        await asyncio.sleep(self.delay)
+        if tool_name == "read_doc_contents":
+            texts = [self.docs[tool_input["doc_id"]]]
+        else:
+            texts = [json.dumps(item) for item in self.results.get(tool_name, [{"tool": tool_name}])]
+        return types.CallToolResult(content=[types.TextContent(type="text", text=text) for text in texts])
+
+
+class ScriptedProvider(LLMProvider):
+    """Calls `tool` if given, then replies `text` or raises `error`"""
+
+    def __init__(self, text="Done", tool=None, error=None):
+        self.text = text
+        self.tool = tool
+        self.error = error
+        self.queries = []
+
+    async def chat(self, messages, **kwargs):
+        return self.text_message(self.text)
+
+    async def query_with_tools(self, user_query, mcp_client, **kwargs):
+        self.queries.append(user_query)
+        if self.tool:
+            await mcp_client.call_tool(self.tool, {"doc_id": "plan.md"})
+        if self.error:
+            raise self.error
+        return self.text_message(self.text)
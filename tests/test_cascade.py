@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from core.cascade import ESCALATE, ModelCascade
+from fakes import FakeClient, ScriptedProvider
+
+
+def ask(cascade, client):
+    async def scenario():
+        return await cascade.query_with_tools("What is in plan.md?", client)
+
+    return cascade.fast.text_from_message(asyncio.run(scenario()))
+
+
+def test_simple_turn_stays_on_the_fast_model():
+    fast, strong = ScriptedProvider("The plan", tool="read_doc_contents"), ScriptedProvider()
+    cascade = ModelCascade(fast, strong)
+    assert ask(cascade, FakeClient()) == "The plan"
+    assert strong.queries == []
+    assert cascade.stats()["cascade"]["escalation_rate"] == 0.0
+
+
+def test_requested_escalation_goes_to_the_strong_model():
+    fast, strong = ScriptedProvider(ESCALATE, tool="read_doc_contents"), ScriptedProvider("Summary")
+    cascade = ModelCascade(fast, strong)
+    assert ask(cascade, FakeClient()) == "Summary"
+    assert cascade.turns[-1]["reason"] == "requested"
+
+
+def test_failed_read_only_turn_escalates():
+    fast = ScriptedProvider(tool="read_doc_contents", error=RuntimeError("boom"))
+    strong = ScriptedProvider("Recovered")
+    cascade = ModelCascade(fast, strong)
+    assert ask(cascade, FakeClient()) == "Recovered"
+    assert cascade.turns[-1]["reason"] == "error"
+
+
+def test_turn_that_ran_an_edit_never_escalates():
+    client = FakeClient()
+    strong = ScriptedProvider("Edited again")
+
+    # An escalation request after an edit is returned as is
+    cascade = ModelCascade(ScriptedProvider(ESCALATE, tool="edit_document"), strong)
+    assert ask(cascade, client) == ESCALATE
+
+    # A failure after an edit is raised, not retried on the strong model
+    cascade = ModelCascade(ScriptedProvider(tool="edit_document", error=RuntimeError("boom")), strong)
+    with pytest.raises(RuntimeError):
+        ask(cascade, client)
+    assert strong.queries == []
+    assert [name for name, _ in client.calls] == ["edit_document", "edit_document"]
@@ -0,0 +1,59 @@
+import random
+
+from core.completion import CompletionIndex
+
+VALUES = [f"{word}-{i}.md" for word in ("plan", "Report", "notes", "spec", "Design") for i in range(40)]
+
+
+def built(values, limit=50):
+    index = CompletionIndex(limit)
+    index.build(values)
+    return index
+
+
+def assert_same(index, expected):
+    assert len(index) == len(expected)
+    for query in ("", "p", "pl", "plan-1", "r", "RE", "rp", "n3", "dsg", "s-2", "md", "x"):
+        assert index.search(query) == expected.search(query), query
+
+
+def test_update_matches_a_rebuild():
+    rng = random.Random(0)
+    values = set(VALUES)
+    index = built(values)
+    for _ in range(20):
+        removed = rng.sample(sorted(values), 5)
+        added = [f"{rng.choice(['plan', 'pitch', 'readme'])}-new-{rng.randrange(1000)}.md" for _ in range(5)]
+        index.update(added=added, removed=removed)
+        values = (values - set(removed)) | set(added)
+        assert_same(index, built(values))
+
+
+def test_update_ignores_unknown_and_duplicate_values():
+    index = built(VALUES)
+    index.update(added=["plan-1.md"], removed=["missing.md"])
+    assert_same(index, built(VALUES))
+
+
+def test_update_keeps_case_distinct_values():
+    index = built(["Plan.md"])
+    index.update(added=["plan.md"])
+    assert "Plan.md" in index and "plan.md" in index
+    index.update(removed=["Plan.md"])
+    assert "Plan.md" not in index and "plan.md" in index
+
+
+def test_search_after_update_sees_new_fuzzy_matches():
+    index = built(VALUES)
+    # Prime the incremental fuzzy state for "pz", then add a match for it
+    assert index.search("pz") == []
+    index.update(added=["puzzle.md"])
+    assert index.search("pz") == ["puzzle.md"]
+
+
+def test_copy_is_independent():
+    index = built(VALUES)
+    copy = index.copy()
+    copy.update(added=["plan-new.md"], removed=["plan-1.md"])
+    assert_same(index, built(VALUES))
+    assert_same(copy, built((set(VALUES) - {"plan-1.md"}) | {"plan-new.md"}))
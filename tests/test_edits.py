@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+import mcp_server
+from core.edits import apply_operations
+
+TEXTS = {"plan.md": "Step one.\nStep two.\n", "spec.txt": "Width: 20m\n"}
+
+
+def op(doc_id, pattern, replacement, regex=False):
+    return {"doc_id": doc_id, "pattern": pattern, "replacement": replacement, "regex": regex}
+
+
+def test_operations_apply_in_order_to_staged_copies():
+    texts = dict(TEXTS)
+    staged, reports = apply_operations(
+        texts,
+        [op("plan.md", "Step", "Phase"), op("plan.md", r"Phase (\w+)", r"Phase <\1>", regex=True)],
+    )
+    assert staged["plan.md"] == "Phase <one>.\nPhase <two>.\n"
+    assert reports["plan.md"] == {"matches": 4, "changed": True}
+    assert texts == TEXTS
+
+
+def test_plain_replacement_is_literal():
+    staged, _ = apply_operations(TEXTS, [op("spec.txt", "20m", r"\1 (.*)")])
+    assert staged["spec.txt"] == "Width: \\1 (.*)\n"
+
+
+def test_dry_run_reports_a_diff_per_document():
+    _, reports = apply_operations(
+        TEXTS, [op("plan.md", "two", "2"), op("spec.txt", "30m", "40m")], with_diffs=True
+    )
+    diff = reports["plan.md"]["diff"].splitlines()
+    assert diff[:2] == ["--- a/plan.md", "+++ b/plan.md"]
+    assert "-Step two." in diff and "+Step 2." in diff
+    assert reports["spec.txt"] == {"matches": 0, "changed": False, "diff": ""}
+
+
+@pytest.mark.parametrize(
+    "operation, message",
+    [
+        (op("missing.md", "a", "b"), "Operation 2: doc with id missing.md not found"),
+        (op("plan.md", "", "x"), "Operation 2: pattern must not be empty"),
+        (op("plan.md", "", "x", regex=True), "Operation 2: pattern must not be empty"),
+        (op("plan.md", "(", "x", regex=True), "Operation 2: invalid pattern"),
+    ],
+)
+def test_invalid_operation_is_named(operation, message):
+    with pytest.raises(ValueError, match=message.replace("(", r"\(")):
+        apply_operations(TEXTS, [op("plan.md", "one", "1"), operation])
+
+
+def test_edit_tools_reject_empty_patterns():
+    with pytest.raises(ValueError, match="old_str must not be empty"):
+        asyncio.run(mcp_server.edit_document(doc_id="plan.md", old_str="", new_str="x"))
+    schema = mcp_server.EditOperation.model_json_schema()
+    assert schema["properties"]["pattern"]["minLength"] == 1
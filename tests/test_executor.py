@@ -0,0 +1,96 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+from mcp import types
+from mcp.shared.message import SessionMessage
+
+import mcp_server
+from core.executor import CPU, INLINE, IO, ToolExecutor
+from mcp_client import CALL_ID, _RequestIdRecorder
+
+
+def where(_):
+    return os.getpid(), threading.get_ident()
+
+
+@pytest.fixture
+def executor():
+    executor = ToolExecutor(max_processes=1, max_threads=2)
+    yield executor
+    executor.close()
+
+
+def test_each_kind_runs_where_it_should(executor):
+    async def scenario():
+        loop_thread = threading.get_ident()
+        inline = await executor.run("t", INLINE, where, None)
+        io = await executor.run("t", IO, where, None)
+        cpu = await executor.run("t", CPU, where, None)
+        return loop_thread, inline, io, cpu
+
+    loop_thread, inline, io, cpu = asyncio.run(scenario())
+    assert inline == (os.getpid(), loop_thread)
+    assert io[0] == os.getpid() and io[1] != loop_thread
+    assert cpu[0] != os.getpid()
+    stats = executor.stats()
+    assert stats["tools"]["t"]["calls"] == 3 and stats["tools"]["t"]["in_flight"] == 0
+    assert set(stats["pools"]) == {CPU, IO}
+
+
+def test_work_past_its_deadline_is_not_started(executor):
+    calls = []
+
+    async def scenario():
+        for kind in (INLINE, IO):
+            with pytest.raises(TimeoutError):
+                await executor.run("late", kind, calls.append, 1, deadline=time.time() - 1)
+
+    asyncio.run(scenario())
+    assert calls == [] and executor.stats()["tools"]["late"]["timeouts"] == 2
+
+
+def test_slow_call_times_out_at_its_deadline(executor):
+    async def scenario():
+        with pytest.raises(TimeoutError, match="slow did not finish"):
+            await executor.run("slow", IO, time.sleep, 1.0, deadline=time.time() + 0.05)
+
+    started = time.monotonic()
+    asyncio.run(scenario())
+    assert time.monotonic() - started < 0.9
+    assert executor.stats()["tools"]["slow"]["timeouts"] == 1
+
+
+def test_only_large_regex_or_diff_work_goes_to_the_process_pool():
+    small, large = 1000, mcp_server.PROCESS_EDIT_CHARS + 1
+    assert mcp_server.edit_kind(small) == INLINE
+    assert mcp_server.edit_kind(large) == IO
+    assert mcp_server.edit_kind(small, heavy=True) == IO
+    assert mcp_server.edit_kind(large, heavy=True) == CPU
+
+
+class RecordingStream:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+
+def test_request_ids_of_tool_calls_are_recorded():
+    stream = RecordingStream()
+    recorder = _RequestIdRecorder(stream)
+    call = types.JSONRPCRequest(
+        jsonrpc="2.0", id=7, method="tools/call", params={"name": "x", "_meta": {CALL_ID: "abc"}}
+    )
+    other = types.JSONRPCRequest(jsonrpc="2.0", id=8, method="tools/list", params={"_meta": {CALL_ID: "def"}})
+
+    async def send_all():
+        for request in (call, other):
+            await recorder.send(SessionMessage(message=types.JSONRPCMessage(request)))
+
+    asyncio.run(send_all())
+    assert recorder.request_ids == {"abc": 7}
+    assert len(stream.sent) == 2
@@ -0,0 +1,36 @@
+import asyncio
+
+from fakes import QUESTION, READ_DOC, FakeClient, FakeModel, gemini, reply
+
+
+def test_routing_reply_cut_off_is_regenerated_in_full():
+    model = FakeModel([
+        reply("The plan has three parts: first", finish_reason="MAX_TOKENS"),
+        reply("The plan has three parts: first, second and third."),
+    ])
+    provider = gemini(model, max_output_tokens=1000, routing_max_tokens=50)
+    message = asyncio.run(provider.chat(QUESTION, tools=[READ_DOC], mcp_client=FakeClient()))
+
+    assert message.content[0].text.endswith("third.")
+    assert [config["max_output_tokens"] for config in model.configs] == [50, 1000]
+    assert provider.stats()["generation"]["routing_retries"] == 1
+
+
+def test_tool_call_fits_the_routing_limit():
+    model = FakeModel([
+        reply('TOOL_CALL: read_doc_contents(doc_id="plan.md")'),
+        reply("The plan."),
+    ])
+    provider = gemini(model, max_output_tokens=1000, routing_max_tokens=50)
+    asyncio.run(provider.chat(QUESTION, tools=[READ_DOC], mcp_client=FakeClient()))
+
+    assert model.configs[0]["max_output_tokens"] == 50
+    assert provider.stats()["generation"]["routing_retries"] == 0
+
+
+def test_synthesis_turns_use_the_full_limit():
+    model = FakeModel([reply("Done.", finish_reason="MAX_TOKENS")])
+    provider = gemini(model, max_output_tokens=1000, routing_max_tokens=50)
+    asyncio.run(provider.chat(QUESTION))
+
+    assert [config["max_output_tokens"] for config in model.configs] == [1000]
@@ -0,0 +1,53 @@
+import asyncio
+
+from core.messages import ToolResultBlock, ToolUseBlock
+from fakes import QUESTION, READ_DOC, FakeClient, FakeModel, gemini, reply
+
+
+def test_valid_call_runs_the_tool():
+    client = FakeClient()
+    provider = gemini(FakeModel([reply("TOOL_CALL: read_doc_contents:doc_id=plan.md")]))
+    message = asyncio.run(provider.chat(QUESTION, tools=[READ_DOC], mcp_client=client))
+
+    assert message.stop_reason == "tool_use"
+    assert client.calls == [("read_doc_contents", {"doc_id": "plan.md"})]
+    use, result = message.content
+    assert isinstance(use, ToolUseBlock) and use.input == {"doc_id": "plan.md"}
+    assert isinstance(result, ToolResultBlock) and result.content == "The plan"
+
+
+def test_invalid_call_is_corrected_before_the_tool_runs():
+    client = FakeClient()
+    model = FakeModel([
+        reply("TOOL_CALL: read_doc_contents:document=plan.md"),
+        reply("TOOL_CALL: read_doc_contents:doc_id=plan.md"),
+    ])
+    message = asyncio.run(gemini(model).chat(QUESTION, tools=[READ_DOC], mcp_client=client))
+
+    assert message.stop_reason == "tool_use"
+    assert client.calls == [("read_doc_contents", {"doc_id": "plan.md"})]
+    # The re-prompt names the problems and asks for a corrected call
+    assert "doc_id" in model.prompts[1] and "document" in model.prompts[1]
+    assert "corrected TOOL_CALL" in model.prompts[1]
+
+
+def test_gives_up_after_max_corrections():
+    client = FakeClient()
+    model = FakeModel([
+        reply("TOOL_CALL: read_doc_contents:document=plan.md"),
+        reply("TOOL_CALL: read_doc_contents:document=plan.md"),
+    ])
+    message = asyncio.run(gemini(model).chat(QUESTION, tools=[READ_DOC], mcp_client=client, max_corrections=1))
+
+    assert message.stop_reason == "tool_error"
+    assert client.calls == []
+    assert len(model.prompts) == 2
+
+
+def test_no_corrections_when_disabled():
+    client = FakeClient()
+    model = FakeModel([reply("TOOL_CALL: read_doc_contents:document=plan.md")])
+    message = asyncio.run(gemini(model).chat(QUESTION, tools=[READ_DOC], mcp_client=client, max_corrections=0))
+
+    assert message.stop_reason == "tool_error"
+    assert len(model.prompts) == 1
@@ -0,0 +1,173 @@
+import asyncio
+import os
+
+import pytest
+
+from core.ingest import DirectoryWatcher, DocumentStore, Ingestor
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def touch_later(path, text):
+    # A new mtime even on filesystems with coarse timestamps
+    write(path, text)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+@pytest.fixture
+def ingestor(tmp_path):
+    ingestor = Ingestor(str(tmp_path / "cache"), max_workers=1)
+    yield ingestor
+    ingestor.close()
+
+
+def test_unchanged_and_copied_files_come_from_the_cache(tmp_path, ingestor):
+    write(str(tmp_path / "a.md"), "Alpha")
+    write(str(tmp_path / "copy.md"), "Alpha")
+
+    async def scenario():
+        first = await ingestor.ingest(str(tmp_path / "a.md"))
+        again = await ingestor.ingest(str(tmp_path / "a.md"))
+        copy = await ingestor.ingest(str(tmp_path / "copy.md"))
+        return first, again, copy
+
+    first, again, copy = asyncio.run(scenario())
+    assert first == again == copy
+    assert ingestor.stats() == {"parsed": 1, "cache_hits": 2, "failed": 0}
+
+
+def test_scans_report_added_updated_and_removed_docs(tmp_path, ingestor):
+    root = str(tmp_path / "docs")
+    write(os.path.join(root, "a.md"), "Alpha")
+    write(os.path.join(root, "sub", "b.txt"), "Beta")
+    write(os.path.join(root, ".hidden.md"), "Hidden")
+    write(os.path.join(root, "image.png"), "not a document")
+    store = DocumentStore()
+    watcher = DirectoryWatcher(root, store, ingestor)
+
+    async def scenario():
+        results = [await watcher.scan()]
+        touch_later(os.path.join(root, "a.md"), "Alpha 2")
+        os.remove(os.path.join(root, "sub", "b.txt"))
+        results.append(await watcher.scan())
+        results.append(await watcher.scan())
+        return results
+
+    first, second, third = asyncio.run(scenario())
+    assert sorted(first[0]) == ["a.md", "sub/b.txt"]
+    assert second == ([], ["a.md"], ["sub/b.txt"])
+    assert third == ([], [], [])
+    assert dict(store) == {"a.md": "Alpha 2"}
+
+
+def test_edits_survive_rescans_of_unchanged_files(tmp_path, ingestor):
+    root = str(tmp_path / "docs")
+    write(os.path.join(root, "a.md"), "Alpha")
+    store = DocumentStore()
+    watcher = DirectoryWatcher(root, store, ingestor)
+
+    async def scenario():
+        await watcher.scan()
+        store["a.md"] = "Edited"
+        await watcher.scan()
+
+    asyncio.run(scenario())
+    assert store["a.md"] == "Edited" and not store.is_file_backed("a.md")
+
+
+def test_subdirectory_scan_leaves_other_docs_alone(tmp_path, ingestor):
+    root = str(tmp_path / "docs")
+    write(os.path.join(root, "a.md"), "Alpha")
+    write(os.path.join(root, "sub", "b.md"), "Beta")
+    store = DocumentStore()
+    watcher = DirectoryWatcher(root, store, ingestor)
+
+    async def scenario():
+        await watcher.scan(subdirectory="sub")
+        first = sorted(store)
+        os.remove(os.path.join(root, "sub", "b.md"))
+        write(os.path.join(root, "sub", "c.md"), "Gamma")
+        second = await watcher.scan(subdirectory="sub")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == ["sub/b.md"]
+    assert second == (["sub/c.md"], [], ["sub/b.md"])
+
+
+def test_doc_id_taken_by_another_directory_is_not_replaced(tmp_path, ingestor):
+    first_root, second_root = str(tmp_path / "one"), str(tmp_path / "two")
+    write(os.path.join(first_root, "notes.md"), "First")
+    write(os.path.join(second_root, "notes.md"), "Second")
+    store = DocumentStore({"plan.md": "Built in"})
+    write(os.path.join(second_root, "plan.md"), "From disk")
+    first = DirectoryWatcher(first_root, store, ingestor)
+    second = DirectoryWatcher(second_root, store, ingestor)
+
+    async def scenario():
+        await first.scan()
+        return await second.scan()
+
+    added, _, _ = asyncio.run(scenario())
+    assert added == ["plan.md"]
+    assert store["notes.md"] == "First" and store["plan.md"] == "From disk"
+    assert second.conflicts == {"notes.md": os.path.join(second_root, "notes.md")}
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch, ingestor):
+    import mcp_server
+    from core.retrieval import EmbeddingIndex
+
+    roots = [str(tmp_path / "one"), str(tmp_path / "two")]
+    for root in roots:
+        os.makedirs(root)
+    monkeypatch.setattr(mcp_server, "INGEST_ROOTS", [os.path.realpath(root) for root in roots])
+    monkeypatch.setattr(mcp_server, "docs", DocumentStore())
+    monkeypatch.setattr(mcp_server, "watchers", {})
+    monkeypatch.setattr(mcp_server, "_ingestor", ingestor)
+    index = EmbeddingIndex()
+    monkeypatch.setattr(mcp_server, "index", index)
+    yield mcp_server, roots
+    index.close()
+
+
+def ingest(mcp_server, directory):
+    async def ignore(*args):
+        pass
+
+    root, path = mcp_server.ingest_directory(directory)
+    return asyncio.run(mcp_server.run_ingest(root, path, ignore))
+
+
+def test_reingesting_keeps_edits_and_reports_only_changes(server):
+    mcp_server, (root, _) = server
+    write(os.path.join(root, "a.md"), "Alpha")
+    write(os.path.join(root, "b.md"), "Beta")
+
+    first = ingest(mcp_server, ".")
+    mcp_server.docs["a.md"] = "Edited"
+    touch_later(os.path.join(root, "b.md"), "Beta 2")
+    second = ingest(mcp_server, ".")
+
+    assert sorted(first["added"]) == ["a.md", "b.md"]
+    assert (second["added"], second["updated"]) == ([], ["b.md"])
+    assert mcp_server.docs["a.md"] == "Edited"
+    assert len(mcp_server.watchers) == 1
+
+
+def test_same_id_from_another_root_is_reported_not_replaced(server):
+    mcp_server, (first_root, second_root) = server
+    write(os.path.join(first_root, "notes.md"), "First")
+    write(os.path.join(second_root, "notes.md"), "Second")
+
+    ingest(mcp_server, ".")
+    result = ingest(mcp_server, second_root)
+
+    assert result["added"] == [] and result["conflicts"] == ["notes.md"]
+    assert mcp_server.docs["notes.md"] == "First"
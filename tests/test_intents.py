@@ -0,0 +1,112 @@
+import asyncio
+
+from mcp import types
+
+from core.chat import Chat
+from core.intents import IntentRouter
+from core.spill import SpillStore
+from fakes import FakeDocClient, ScriptedProvider
+
+READ_ONLY = types.ToolAnnotations(readOnlyHint=True)
+
+TOOLS = [
+    types.Tool(
+        name="read_doc_contents",
+        inputSchema={"type": "object", "properties": {"doc_id": {"type": "string"}}, "required": ["doc_id"]},
+        annotations=READ_ONLY,
+    ),
+    types.Tool(
+        name="edit_document",
+        inputSchema={
+            "type": "object",
+            "properties": {name: {"type": "string"} for name in ("doc_id", "old_str", "new_str")},
+            "required": ["doc_id", "old_str", "new_str"],
+        },
+    ),
+    types.Tool(
+        name="retrieve",
+        inputSchema={
+            "type": "object",
+            "properties": {"query": {"type": "string", "enum": ["budget", "schedule"]}},
+            "required": ["query"],
+        },
+        annotations=READ_ONLY,
+    ),
+]
+
+
+class DocServer(FakeDocClient):
+    """Counts tool listings; tools named in `failing` raise"""
+
+    def __init__(self, docs, failing=()):
+        super().__init__(docs, tools=TOOLS)
+        self.failing = set(failing)
+        self.listings = 0
+
+    async def list_tools(self):
+        self.listings += 1
+        return await super().list_tools()
+
+    async def call_tool(self, tool_name, tool_input, *args, **kwargs):
+        if tool_name in self.failing:
+            self.calls.append((tool_name, tool_input))
+            raise TimeoutError(f"{tool_name} timed out")
+        return await super().call_tool(tool_name, tool_input, *args, **kwargs)
+
+
+def route(router, text, client):
+    return asyncio.run(router.route(text, client))
+
+
+def test_commands_become_tool_calls():
+    router, client = IntentRouter(), DocServer({"plan.md": "The plan"})
+    assert route(router, "please read plan.md", client).tool_name == "read_doc_contents"
+    edit = route(router, "replace 'plan' with 'outline' in plan.md", client)
+    assert edit.tool_name == "edit_document"
+    assert edit.arguments == {"doc_id": "plan.md", "old_str": "plan", "new_str": "outline"}
+    assert route(router, "read plan.md and summarize it", client) is None
+
+
+def test_turns_without_a_command_verb_skip_the_tool_list():
+    router, client = IntentRouter(), DocServer({"plan.md": "The plan"})
+    assert route(router, "What does plan.md say about costs?", client) is None
+    assert client.listings == 0 and client.reads == []
+    assert router.stats()["fell_through"] == 1
+
+
+def test_arguments_the_schema_rejects_go_to_the_model():
+    router, client = IntentRouter(), DocServer({"plan.md": "The plan"})
+    assert route(router, "search for 'budget'", client).arguments == {"query": "budget"}
+    assert route(router, "search for 'weather'", client) is None
+
+
+def chat_turn(client, query, spill=None):
+    provider = ScriptedProvider("From the model")
+    chat = Chat(ai_service=provider, clients={"doc": client}, intents=IntentRouter(), spill=spill)
+    return asyncio.run(chat.run(query)), chat, provider
+
+
+def test_failed_read_falls_back_to_the_model():
+    client = DocServer({"plan.md": "The plan"}, failing={"read_doc_contents"})
+    response, _, provider = chat_turn(client, "read plan.md")
+    assert response == "From the model"
+    assert provider.queries == ["read plan.md"]
+
+
+def test_failed_edit_is_reported_and_not_retried():
+    client = DocServer({"plan.md": "The plan"}, failing={"edit_document"})
+    response, _, provider = chat_turn(client, "replace 'plan' with 'outline' in plan.md")
+    assert response.startswith("The edit_document operation failed") and "timed out" in response
+    assert provider.queries == []
+    assert [name for name, _ in client.calls] == ["edit_document"]
+
+
+def test_large_routed_result_is_spilled_in_history():
+    text = "The plan\n" * 1000
+    spill = SpillStore(threshold=1000, preview_bytes=100)
+    try:
+        response, chat, _ = chat_turn(DocServer({"plan.md": text}), "show plan.md", spill)
+    finally:
+        spill.close()
+    assert response == text
+    assert len(chat.messages[-1]["content"]) < 500
@@ -0,0 +1,162 @@
+import asyncio
+import json
+
+import pytest
+from mcp import types
+
+from core.jobs import CANCELLED, FAILED, PENDING, RUNNING, SUCCEEDED, JobManager, job_handle
+
+
+def run(coro_fn):
+    return asyncio.run(coro_fn())
+
+
+def test_job_runs_to_success():
+    async def main():
+        jobs = JobManager(prefix="shard-0")
+        release = asyncio.Event()
+
+        async def work(report):
+            await report(1, 2, "half way")
+            await release.wait()
+            return {"edited": 2}
+
+        job = jobs.submit("bulk_edit", work)
+        assert job.id == "shard-0:1"
+        assert job.status == PENDING
+        await asyncio.sleep(0)
+        assert job.status == RUNNING
+        assert (job.progress, job.total, job.message) == (1, 2, "half way")
+        assert jobs.stats()["running"] == 1
+
+        release.set()
+        await jobs.wait(job.id, timeout=1)
+        return jobs, job
+
+    jobs, job = run(main)
+    assert job.status == SUCCEEDED
+    assert job.snapshot()["result"] == {"edited": 2}
+    assert jobs.stats() == {"submitted": 1, "succeeded": 1, "failed": 0, "cancelled": 0, "running": 0}
+
+
+def test_job_failure_records_the_error():
+    async def main():
+        jobs = JobManager()
+
+        async def work(report):
+            raise ValueError("no such document")
+
+        job = jobs.submit("bulk_edit", work)
+        return await jobs.wait(job.id, timeout=1)
+
+    job = run(main)
+    assert job.status == FAILED
+    assert job.snapshot()["error"] == "no such document"
+    assert "result" not in job.snapshot()
+
+
+def test_cancel_running_job():
+    async def main():
+        jobs = JobManager()
+        started = asyncio.Event()
+
+        async def work(report):
+            started.set()
+            await asyncio.sleep(10)
+
+        job = jobs.submit("bulk_edit", work)
+        await started.wait()
+        await jobs.cancel(job.id)
+        return jobs, job
+
+    jobs, job = run(main)
+    assert job.status == CANCELLED
+    assert job.finished is not None
+    assert jobs.stats()["cancelled"] == 1
+
+
+def test_cancel_before_the_job_starts():
+    async def main():
+        jobs = JobManager()
+
+        async def work(report):
+            return "never"
+
+        job = jobs.submit("bulk_edit", work)
+        # No await in between, so the task has not run yet
+        await jobs.cancel(job.id)
+        return jobs, job
+
+    jobs, job = run(main)
+    assert job.status == CANCELLED
+    assert job.result is None
+    assert jobs.stats()["cancelled"] == 1
+
+
+def test_cancel_finished_job_keeps_its_status():
+    async def main():
+        jobs = JobManager()
+
+        async def work(report):
+            return "done"
+
+        job = jobs.submit("bulk_edit", work)
+        await jobs.wait(job.id, timeout=1)
+        await jobs.cancel(job.id)
+        return job
+
+    assert run(main).status == SUCCEEDED
+
+
+def test_wait_times_out_and_reports_progress():
+    async def main():
+        jobs = JobManager()
+        reports = []
+
+        async def work(report):
+            await report(1, None, "started")
+            await asyncio.sleep(10)
+
+        async def on_progress(progress, total, message):
+            reports.append((progress, total, message))
+
+        job = jobs.submit("bulk_edit", work)
+        status = (await jobs.wait(job.id, timeout=0.05, on_progress=on_progress)).status
+        await jobs.cancel(job.id)
+        return status, reports
+
+    status, reports = run(main)
+    assert status == RUNNING
+    assert reports[-1] == (1, None, "started")
+
+
+def test_finished_jobs_are_pruned_after_retention():
+    async def main():
+        jobs = JobManager(retention=0)
+
+        async def work(report):
+            return None
+
+        job = jobs.submit("bulk_edit", work)
+        await jobs.wait(job.id, timeout=1)
+        await asyncio.sleep(0.01)
+        jobs.submit("bulk_edit", work)
+        return jobs, job
+
+    jobs, job = run(main)
+    with pytest.raises(ValueError):
+        jobs.get(job.id)
+
+
+def text_result(value, **kwargs):
+    return types.CallToolResult(content=[types.TextContent(type="text", text=json.dumps(value))], **kwargs)
+
+
+def test_job_handle():
+    snapshot = {"job_id": "job:1", "status": RUNNING}
+    assert job_handle(text_result(snapshot)) == snapshot
+    assert job_handle(types.CallToolResult(content=[], structuredContent={"result": snapshot})) == snapshot
+    assert job_handle(text_result({"edited": 1})) is None
+    assert job_handle(text_result(snapshot, isError=True)) is None
+    assert job_handle(types.CallToolResult(content=[types.TextContent(type="text", text="not json")])) is None
+    assert job_handle(None) is None
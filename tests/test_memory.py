@@ -0,0 +1,77 @@
+import tracemalloc
+
+import pytest
+
+from core.memory import MemoryWatchdog, deep_size
+
+
+@pytest.fixture(autouse=True)
+def stop_tracing():
+    # The watchdog starts tracemalloc, which slows every later test
+    tracing = tracemalloc.is_tracing()
+    yield
+    if not tracing:
+        tracemalloc.stop()
+
+
+class Account:
+    """Owns `items`; evicting drops them all and logs the account's name"""
+
+    def __init__(self, name, log, size=1000):
+        self.name = name
+        self.log = log
+        self.items = ["x" * size]
+        self.measured = 0
+
+    def roots(self):
+        self.measured += 1
+        return [self.items]
+
+    def evict(self, excess):
+        self.log.append(self.name)
+        self.items = []
+
+
+def test_shared_objects_are_charged_to_the_first_account():
+    shared = ["y" * 1000]
+    watchdog = MemoryWatchdog()
+    watchdog.register("first", lambda: [shared])
+    watchdog.register("second", lambda: [shared, "z" * 10])
+    sizes = watchdog.measure()
+    assert sizes["first"] == deep_size(shared)
+    assert sizes["second"] < 100
+
+
+def test_accounts_are_measured_only_every_few_checks():
+    log = []
+    account = Account("history", log)
+    watchdog = MemoryWatchdog(check_every=3)
+    watchdog.register("history", account.roots, account.evict)
+    for _ in range(5):
+        watchdog.check()
+    assert account.measured == 1
+    watchdog.check(force=True)
+    assert account.measured == 2
+
+
+def test_account_over_its_budget_is_evicted_alone():
+    log = []
+    big, small = Account("big", log, size=5000), Account("small", log, size=10)
+    watchdog = MemoryWatchdog(check_every=1)
+    watchdog.register("big", big.roots, big.evict, budget=1000)
+    watchdog.register("small", small.roots, small.evict, budget=1000)
+    watchdog.check()
+    assert log == ["big"]
+    assert watchdog.accounts["big"].bytes < 1000 and watchdog.accounts["big"].evictions == 1
+
+
+def test_process_pressure_evicts_in_priority_order_on_every_check():
+    log = []
+    accounts = [Account(name, log) for name in ("history", "tool_results", "caches")]
+    # Any traced memory is over a one-byte budget
+    watchdog = MemoryWatchdog(budget=1, check_every=100)
+    for account, priority in zip(accounts, (2, 1, 0)):
+        watchdog.register(account.name, account.roots, account.evict, priority=priority)
+    watchdog.check()
+    assert log == ["caches", "tool_results", "history"]
+    assert watchdog.stats(top=0)["pressure_events"] == 1
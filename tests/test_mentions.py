@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+from core.cli_chat import CliChat
+from fakes import FakeDocClient
+
+DOCS = {"plan.md": "The plan.", "spec.txt": "The spec.", "report.pdf": "The report."}
+
+
+def cli_chat(client, **kwargs):
+    return CliChat(doc_client=client, clients={"doc": client}, ai_service=None, **kwargs)
+
+
+def test_mentions_are_fetched_in_parallel():
+    client = FakeDocClient(DOCS, delay=0.2)
+    chat = cli_chat(client)
+
+    async def scenario():
+        await chat.list_docs_ids()
+        started = time.monotonic()
+        context = await chat._extract_resources("Compare @plan.md @spec.txt and @report.pdf")
+        return context, time.monotonic() - started
+
+    context, elapsed = asyncio.run(scenario())
+    assert elapsed < 0.5
+    for doc_id, text in DOCS.items():
+        assert f'<document id="{doc_id}">\n{text}\n</document>' in context
+
+
+def test_prefetched_mention_is_not_read_again():
+    client = FakeDocClient(DOCS)
+    chat = cli_chat(client)
+
+    async def scenario():
+        await chat.list_docs_ids()
+        chat.prefetch_doc("plan.md")
+        await chat._extract_resources("What is in @plan.md?")
+        await chat._extract_resources("And @plan.md again?")
+
+    asyncio.run(scenario())
+    assert client.reads.count("docs://documents/plan.md") == 1
+
+
+def test_edited_doc_is_fetched_again():
+    client = FakeDocClient(DOCS)
+    chat = cli_chat(client)
+
+    async def scenario():
+        await chat.list_docs_ids()
+        await chat._extract_resources("@plan.md")
+        client.docs["plan.md"] = "The new plan."
+        client.versions["plan.md"] = 1
+        return await chat._extract_resources("@plan.md")
+
+    assert "The new plan." in asyncio.run(scenario())
+
+
+def test_unknown_mention_lists_the_docs_again():
+    client = FakeDocClient(DOCS)
+    chat = cli_chat(client)
+
+    async def scenario():
+        await chat.list_docs_ids()
+        client.docs["new.md"] = "Just added."
+        return await chat._extract_resources("@new.md @missing.md")
+
+    context = asyncio.run(scenario())
+    assert "Just added." in context and "missing.md" not in context
+    assert client.reads.count("docs://documents") == 2
+
+
+def test_mentions_are_cut_to_the_byte_budget():
+    client = FakeDocClient({"a.md": "a" * 80, "b.md": "b" * 80})
+    chat = cli_chat(client, context_byte_budget=100)
+
+    context = asyncio.run(chat._extract_resources("@a.md @b.md"))
+    assert "a" * 80 in context
+    assert "b" * 20 in context and "b" * 21 not in context
+    assert "[Truncated to 20 of 80 bytes]" in context
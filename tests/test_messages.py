@@ -0,0 +1,26 @@
+import asyncio
+
+from core.messages import ROLE_USER, GeminiMessage, TextBlock, ToolResultBlock, ToolUseBlock
+from core.store import _intern_role
+from fakes import FakeClient, FakeModel, gemini, reply
+
+
+def test_blocks_have_no_instance_dict():
+    for block in (TextBlock("hi"), ToolUseBlock("t1", "read_doc_contents", {}), ToolResultBlock("t1", "text")):
+        assert not hasattr(block, "__dict__")
+
+
+def test_roles_are_interned():
+    role = "".join(["assist", "ant"])
+    assert GeminiMessage("hi", role=role).role is GeminiMessage("hi").role
+    loaded = _intern_role({"role": "".join(["us", "er"]), "content": "hi"})
+    assert loaded["role"] is ROLE_USER
+
+
+def test_query_with_tools_reuses_the_tool_result():
+    client = FakeClient(text="The plan has three parts.")
+    provider = gemini(FakeModel([reply("TOOL_CALL: read_doc_contents:doc_id=plan.md")]))
+    message = asyncio.run(provider.query_with_tools("What is in plan.md?", client))
+
+    assert len(client.calls) == 1
+    assert provider.text_from_message(message) == "The plan has three parts."
@@ -0,0 +1,89 @@
+import asyncio
+
+from mcp import types
+from pydantic import AnyUrl
+
+import mcp_server
+from fakes import FakeSession, connected_client
+
+
+def notification(root):
+    return types.ServerNotification(root)
+
+
+def resource_updated(uri):
+    return notification(
+        types.ResourceUpdatedNotification(
+            method="notifications/resources/updated",
+            params=types.ResourceUpdatedNotificationParams(uri=AnyUrl(uri)),
+        )
+    )
+
+
+def test_updated_doc_is_invalidated_and_announced():
+    client = connected_client(FakeSession())
+    updates, async_updates = [], []
+
+    async def on_async(uri):
+        async_updates.append(uri)
+
+    client.on("resource_updated", updates.append)
+    client.on("resource_updated", on_async)
+
+    async def scenario():
+        await client.get_prompt("summarize", {"doc_id": "plan.md"})
+        await client.get_prompt("summarize", {"doc_id": "spec.txt"})
+        await client._handle_message(resource_updated("docs://documents/plan.md"))
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert client.doc_version("plan.md") == 1 and client.doc_version("spec.txt") == 0
+    assert [key[1] for key in client._prompt_cache] == ["spec.txt"]
+    assert updates == async_updates == ["docs://documents/plan.md"]
+
+
+def test_list_changes_drop_the_cached_listings():
+    client = connected_client(FakeSession())
+    events = []
+    client.on("resource_list_changed", lambda: events.append("resources"))
+    client.on("prompt_list_changed", lambda: events.append("prompts"))
+    client.doc_ids = {"plan.md"}
+
+    async def scenario():
+        await client.get_prompt("summarize", {"doc_id": "plan.md"})
+        await client._handle_message(
+            notification(types.ResourceListChangedNotification(method="notifications/resources/list_changed"))
+        )
+        await client._handle_message(
+            notification(types.PromptListChangedNotification(method="notifications/prompts/list_changed"))
+        )
+
+    asyncio.run(scenario())
+    assert client.doc_ids is None and not client._prompt_cache
+    assert events == ["resources", "prompts"]
+
+
+class SubscribedSession:
+    def __init__(self):
+        self.sent = []
+
+    async def send_resource_updated(self, uri):
+        self.sent.append(str(uri))
+
+    async def send_resource_list_changed(self):
+        self.sent.append("list_changed")
+
+
+def test_server_notifies_only_subscribers_of_the_doc():
+    everything, one_doc, other_doc = SubscribedSession(), SubscribedSession(), SubscribedSession()
+    mcp_server.subscriptions[everything] = {"docs://documents"}
+    mcp_server.subscriptions[one_doc] = {"docs://documents/plan.md"}
+    mcp_server.subscriptions[other_doc] = {"docs://documents/spec.txt"}
+    try:
+        asyncio.run(mcp_server.notify_docs_changed(["plan.md"], list_changed=True))
+    finally:
+        mcp_server.subscriptions.clear()
+
+    assert everything.sent == ["list_changed", "docs://documents/plan.md"]
+    assert one_doc.sent == ["list_changed", "docs://documents/plan.md"]
+    assert other_doc.sent == ["list_changed"]
@@ -0,0 +1,62 @@
+import asyncio
+import json
+import os
+import time
+
+from core.profiling import IDLE, TurnProfiler
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+async def turn():
+    busy(0.05)
+    await asyncio.sleep(0.05)
+
+
+def profile(interval=0.001):
+    async def scenario():
+        async with TurnProfiler("test-turn", interval=interval) as profiler:
+            await turn()
+        return profiler
+
+    return asyncio.run(scenario())
+
+
+def test_busy_and_awaiting_time_are_attributed_to_the_turn():
+    profiler = profile()
+    labels = dict(profiler.summary(top=50))
+    busy_label = next(label for label in labels if label.startswith("busy ("))
+    turn_label = next(label for label in labels if label.startswith("turn ("))
+    assert labels[busy_label] > 0.02
+    assert labels[turn_label] > labels[busy_label]
+    idle = [stack for stack in profiler.samples if stack[-1] == IDLE]
+    assert idle and any(label.startswith("turn (") for label in idle[0])
+
+
+def test_files_hold_the_same_samples(tmp_path):
+    profiler = profile()
+    paths = profiler.write(str(tmp_path))
+
+    with open(paths["collapsed"], encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+    with open(paths["speedscope"], encoding="utf-8") as f:
+        speedscope = json.load(f)
+    sampled = speedscope["profiles"][0]
+    frames = speedscope["shared"]["frames"]
+    assert len(sampled["samples"]) == len(sampled["weights"]) == len(profiler.timeline)
+    assert all(0 <= index < len(frames) for sample in sampled["samples"] for index in sample)
+    assert abs(sampled["endValue"] - sum(profiler.samples.values())) < 1e-6
+
+
+def test_labels_are_relative_to_the_working_directory(monkeypatch):
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    profiler = profile()
+    labels = {label for stack in profiler.samples for label in stack}
+    assert any("(tests/test_profiling.py:" in label for label in labels)
+    assert not any(";" in label for label in labels)
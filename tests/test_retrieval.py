@@ -0,0 +1,102 @@
+import asyncio
+
+from mcp import types
+
+from core.cli_chat import CliChat
+from core.retrieval import EmbeddingIndex, chunk_text
+from fakes import READ_DOC, FakeDocClient, FakeSession, connected_client
+
+DOCS = {
+    "tower.md": "The condenser tower is 20m tall and cools the plant's water.",
+    "budget.md": "The budget covers staff salaries, equipment and travel expenses.",
+    "plan.md": "The plan lists the project milestones for the next two years.",
+}
+RETRIEVE = types.Tool(name="retrieve", inputSchema={"type": "object"})
+
+
+def test_chunks_cover_the_text_with_overlap():
+    text = " ".join(f"word{i}" for i in range(400))
+    chunks = chunk_text(text, size=200, overlap=50)
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert chunks[0].startswith("word0") and chunks[-1].endswith("word399")
+    assert chunk_text("   ") == []
+
+
+def test_search_ranks_the_matching_document_first():
+    index = EmbeddingIndex()
+    index.sync(DOCS)
+
+    results = index.search("how tall is the condenser tower", k=2)
+    assert [result["doc_id"] for result in results][0] == "tower.md"
+    assert results[0]["score"] >= results[1]["score"]
+    assert index.search("condenser tower", doc_ids=["budget.md"])[0]["doc_id"] == "budget.md"
+
+
+def test_updated_and_removed_docs_leave_the_results():
+    index = EmbeddingIndex()
+    index.sync(DOCS)
+    index.update("tower.md", "Nothing about cooling any more.")
+    index.remove("budget.md")
+
+    doc_ids = {result["doc_id"] for result in index.search("condenser tower salaries", k=5)}
+    assert doc_ids == {"tower.md", "plan.md"}
+    assert "condenser" not in " ".join(result["text"] for result in index.search("condenser", k=5))
+
+
+def test_persisted_index_only_embeds_changed_docs(tmp_path):
+    EmbeddingIndex(str(tmp_path)).sync(DOCS)
+
+    embedded = []
+
+    class CountingIndex(EmbeddingIndex):
+        def update(self, doc_id, text, save=True):
+            before = self._doc_hashes.get(doc_id)
+            super().update(doc_id, text, save)
+            if self._doc_hashes.get(doc_id) != before:
+                embedded.append(doc_id)
+
+    index = CountingIndex(str(tmp_path))
+    index.sync({**DOCS, "plan.md": "A new plan."})
+    assert embedded == ["plan.md"]
+    assert index.search("condenser tower", k=1)[0]["doc_id"] == "tower.md"
+
+
+def test_tools_are_listed_once_until_the_server_announces_a_change():
+    session = FakeSession(tools=[READ_DOC])
+    client = connected_client(session)
+
+    async def scenario():
+        await client.list_tools()
+        await client.list_tools()
+        notification = types.ServerNotification(types.ToolListChangedNotification(method="notifications/tools/list_changed"))
+        await client._handle_message(notification)
+        await client.list_tools()
+
+    asyncio.run(scenario())
+    assert session.requests == [("list_tools",), ("list_tools",)]
+
+
+def retrieval_chat(client):
+    return CliChat(doc_client=client, clients={"doc": client}, ai_service=None)
+
+
+def test_queries_naming_a_document_skip_retrieval():
+    client = FakeDocClient(DOCS, tools=[READ_DOC, RETRIEVE])
+    client.results["retrieve"] = [{"doc_id": "tower.md", "score": 0.9, "text": DOCS["tower.md"]}]
+    chat = retrieval_chat(client)
+
+    async def scenario():
+        await chat.list_docs_ids()
+        await chat._add_context("How tall is @tower.md?")
+        await chat._add_context("Summarize plan.md")
+        return await chat._add_context("How tall is the condenser tower?")
+
+    prompt = asyncio.run(scenario())
+    assert [name for name, _ in client.calls] == ["retrieve"]
+    assert '<chunk doc_id="tower.md" score="0.9">' in prompt
+
+
+def test_no_retrieval_without_the_tool():
+    client = FakeDocClient(DOCS, tools=[READ_DOC])
+    asyncio.run(retrieval_chat(client)._add_context("How tall is the condenser tower?"))
+    assert client.calls == []
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from core.scheduler import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    DeadlineExceeded,
+    ModelCallScheduler,
+    RetryPolicy,
+    is_retryable,
+)
+from fakes import QUESTION, FakeModel, gemini, reply
+
+NO_BACKOFF = RetryPolicy(max_attempts=3, base_delay=0.0)
+
+
+class StatusError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def failing(errors, result="ok"):
+    """Call factory raising `errors` in turn, then returning `result`"""
+    errors = list(errors)
+    attempts = []
+
+    async def call():
+        attempts.append(len(attempts) + 1)
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    return call, attempts
+
+
+def test_is_retryable():
+    assert is_retryable(TimeoutError())
+    assert is_retryable(asyncio.TimeoutError())
+    assert is_retryable(ConnectionError())
+    assert is_retryable(StatusError(429))
+    assert is_retryable(StatusError(503))
+    assert not is_retryable(StatusError(400))
+    assert not is_retryable(ValueError())
+
+
+def test_admits_by_priority_then_arrival():
+    scheduler = ModelCallScheduler(requests_per_minute=600)
+    # Empty the bucket so every call queues and is admitted one refill apart
+    scheduler._requests.tokens = 0
+    order = []
+
+    def call(name):
+        async def run():
+            order.append(name)
+        return run
+
+    async def main():
+        await asyncio.gather(
+            scheduler.submit(call("background"), priority=PRIORITY_BACKGROUND),
+            scheduler.submit(call("interactive-1"), priority=PRIORITY_INTERACTIVE),
+            scheduler.submit(call("interactive-2"), priority=PRIORITY_INTERACTIVE),
+        )
+
+    asyncio.run(main())
+    assert order == ["interactive-1", "interactive-2", "background"]
+
+
+@pytest.mark.parametrize("error", [TimeoutError(), asyncio.TimeoutError(), StatusError(503)])
+def test_retries_retryable_errors(error):
+    scheduler = ModelCallScheduler(retry=NO_BACKOFF)
+    call, attempts = failing([error])
+    assert asyncio.run(scheduler.submit(call)) == "ok"
+    assert attempts == [1, 2]
+    assert scheduler.stats()["retries"] == 1
+
+
+def test_does_not_retry_other_errors():
+    scheduler = ModelCallScheduler(retry=NO_BACKOFF)
+    call, attempts = failing([ValueError("bad request")])
+    with pytest.raises(ValueError):
+        asyncio.run(scheduler.submit(call))
+    assert attempts == [1]
+    assert scheduler.stats()["failures"] == 1
+
+
+def test_gives_up_after_max_attempts():
+    scheduler = ModelCallScheduler(retry=NO_BACKOFF)
+    call, attempts = failing([ConnectionError()] * 5)
+    with pytest.raises(ConnectionError):
+        asyncio.run(scheduler.submit(call))
+    assert attempts == [1, 2, 3]
+
+
+def test_deadline_covers_a_slow_call():
+    scheduler = ModelCallScheduler(retry=NO_BACKOFF)
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scheduler.submit(slow, timeout=0.05))
+    assert scheduler.stats()["deadline_exceeded"] == 1
+
+
+def test_deadline_stops_retries_that_would_overrun(monkeypatch):
+    monkeypatch.setattr("core.scheduler.random.uniform", lambda low, high: high)
+    scheduler = ModelCallScheduler(retry=RetryPolicy(max_attempts=5, base_delay=10.0))
+    call, attempts = failing([ConnectionError()] * 5)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scheduler.submit(call, timeout=1.0))
+    assert attempts == [1]
+    assert scheduler.stats()["retries"] == 0
+
+
+def test_deadline_rejects_a_call_the_rate_limit_would_delay():
+    scheduler = ModelCallScheduler(requests_per_minute=1)
+    call, attempts = failing([])
+
+    async def main():
+        await scheduler.submit(call)
+        await scheduler.submit(call, timeout=1.0)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(main())
+    assert attempts == [1]
+    assert scheduler.stats()["queued"] == 0
+
+
+def test_deadline_applies_to_the_gemini_call():
+    provider = gemini(FakeModel([reply("late")] * 4, delay=1.0))
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(provider.chat(QUESTION, timeout=0.05))
+    assert provider.scheduler.stats()["deadline_exceeded"] == 1
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import os
+import sys
+from contextlib import AsyncExitStack
+
+import pytest
+
+from core.sharding import SHARD_TOOLS, HashRing, ShardedMCPClient, shard_names
+from mcp_client import MCPClient
+from mcp_server import SAMPLE_DOCS
+
+DOC_IDS = [f"doc-{i}.md" for i in range(2000)]
+
+
+def test_placement_is_stable():
+    first = HashRing(shard_names(4))
+    second = HashRing(reversed(shard_names(4)))
+    assert [first.node(doc_id) for doc_id in DOC_IDS] == [second.node(doc_id) for doc_id in DOC_IDS]
+
+
+def test_keys_spread_over_every_shard():
+    ring = HashRing(shard_names(4))
+    counts = {shard: 0 for shard in ring.shards}
+    for doc_id in DOC_IDS:
+        counts[ring.node(doc_id)] += 1
+    fair = len(DOC_IDS) / len(counts)
+    assert all(0.5 * fair < count < 1.5 * fair for count in counts.values())
+
+
+def test_adding_a_shard_moves_only_keys_to_it():
+    before = HashRing(shard_names(4))
+    after = HashRing(shard_names(5))
+    moved = before.moved(DOC_IDS, after)
+    assert set(moved.values()) == {"shard-4"}
+    # About 1/5 of the keys should move
+    assert 0.1 < len(moved) / len(DOC_IDS) < 0.3
+
+
+def test_add_is_idempotent():
+    ring = HashRing(["a"])
+    ring.add("a")
+    assert ring.shards == ["a"]
+    assert len(ring._points) == ring.replicas
+
+
+def test_empty_ring_has_no_owner():
+    with pytest.raises(LookupError):
+        HashRing().node("doc.md")
+
+
+# Real shard servers, started as the app starts them
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp_server.py")
+
+
+def shard_client(index: int, count: int) -> MCPClient:
+    env = {**os.environ, "SHARD_INDEX": str(index), "SHARD_COUNT": str(count)}
+    env.pop("DOCS_DIR", None)
+    return MCPClient(command=sys.executable, args=[SERVER], env=env)
+
+
+def with_shards(count: int, scenario):
+    async def run():
+        async with AsyncExitStack() as stack:
+
+            async def start_shard(index: int, count: int) -> MCPClient:
+                return await stack.enter_async_context(shard_client(index, count))
+
+            shards = [await start_shard(index, count) for index in range(count)]
+            return await scenario(ShardedMCPClient(shards, start_shard=start_shard))
+
+    return asyncio.run(run())
+
+
+def text_of(result) -> str:
+    return " ".join(item.text for item in result.content)
+
+
+def test_added_shard_serves_the_moved_docs_with_their_edits():
+    async def scenario(client):
+        await client.call_tool("edit_document", {"doc_id": "spec.txt", "old_str": "equipment", "new_str": "pumps"})
+        moved = await client.add_shard()
+        texts = {
+            doc_id: await client.read_resource(f"docs://documents/{doc_id}")
+            for doc_id in await client.read_resource("docs://documents")
+        }
+        old_shard_ids = await client.clients[0].read_resource("docs://documents")
+        return moved, texts, old_shard_ids
+
+    moved, texts, old_shard_ids = with_shards(2, scenario)
+    assert moved == ["spec.txt"]
+    assert sorted(texts) == sorted(SAMPLE_DOCS)
+    assert texts["spec.txt"] == SAMPLE_DOCS["spec.txt"].replace("equipment", "pumps")
+    assert "spec.txt" not in old_shard_ids
+
+
+def test_cross_shard_bulk_edit_changes_every_shard_or_none():
+    # report.pdf lives on shard-0 and plan.md on shard-1
+    good = {"doc_id": "report.pdf", "pattern": "report", "replacement": "study", "regex": False}
+    bad = {"doc_id": "plan.md", "pattern": "(", "replacement": "", "regex": True}
+    fixed = {**bad, "pattern": "plan", "regex": False}
+
+    async def scenario(client):
+        failed = await client.call_tool("bulk_edit", {"operations": [good, bad]})
+        unchanged = await client.read_resource("docs://documents/report.pdf")
+        applied = await client.call_tool("bulk_edit", {"operations": [good, fixed]})
+        texts = [await client.read_resource(f"docs://documents/{doc_id}") for doc_id in ("report.pdf", "plan.md")]
+        return failed, unchanged, applied, texts
+
+    failed, unchanged, applied, texts = with_shards(2, scenario)
+    assert failed.isError and "invalid pattern" in text_of(failed)
+    assert unchanged == SAMPLE_DOCS["report.pdf"]
+    assert not applied.isError and json.loads(text_of(applied))["applied"] is True
+    assert texts[0].startswith("The study") and "study" not in SAMPLE_DOCS["report.pdf"]
+    assert texts[1] == SAMPLE_DOCS["plan.md"].replace("plan", "")
+
+
+def test_prepared_docs_take_no_other_edit_until_committed():
+    operation = {"doc_id": "report.pdf", "pattern": "report", "replacement": "study", "regex": False}
+
+    async def scenario(client):
+        shard = client.clients[0]
+        prepared = json.loads(text_of(await shard.call_tool("bulk_edit_prepare", {"operations": [operation]})))
+        blocked = await shard.call_tool("edit_document", {"doc_id": "report.pdf", "old_str": "tower", "new_str": "mast"})
+        await shard.call_tool("bulk_edit_commit", {"transaction": prepared["transaction"]})
+        allowed = await shard.call_tool("edit_document", {"doc_id": "report.pdf", "old_str": "tower", "new_str": "mast"})
+        return blocked, allowed, await client.read_resource("docs://documents/report.pdf")
+
+    blocked, allowed, text = with_shards(2, scenario)
+    assert blocked.isError and "pending cross-shard edit" in text_of(blocked)
+    assert not allowed.isError
+    assert text == "The study details the state of a 20m condenser mast."
+
+
+def test_shard_tools_are_hidden_from_the_model():
+    async def scenario(client):
+        return {tool.name for tool in await client.list_tools()}
+
+    names = with_shards(2, scenario)
+    assert "bulk_edit" in names and not names & SHARD_TOOLS
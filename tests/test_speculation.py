@@ -0,0 +1,59 @@
+import asyncio
+
+from mcp import types
+
+from core.speculation import ToolSpeculator
+from fakes import READ_DOC, FakeDocClient
+
+EDIT_DOC = types.Tool(name="edit_document", inputSchema={"type": "object"})
+DOCS = {"plan.md": "The plan.", "spec.txt": "The spec."}
+
+
+def test_candidates_are_listed_doc_ids_in_query_order():
+    speculator = ToolSpeculator(max_calls=2)
+    text = "Compare @spec.txt with plan.md, report.pdf and spec.txt"
+    assert speculator.candidates(text) == ["spec.txt", "plan.md"]
+    assert speculator.candidates(text, {"plan.md"}) == ["plan.md"]
+
+
+def test_the_model_gets_the_speculative_read():
+    client = FakeDocClient(DOCS, tools=[READ_DOC])
+    speculator = ToolSpeculator()
+
+    async def scenario():
+        speculation = speculator.start(client, "What is in plan.md?")
+        result = await speculation.call_tool("read_doc_contents", {"doc_id": "plan.md"})
+        speculation.discard()
+        return result
+
+    result = asyncio.run(scenario())
+    assert result.content[0].text == "The plan."
+    assert client.calls == [("read_doc_contents", {"doc_id": "plan.md"})]
+    assert speculator.stats()["hits"] == 1 and speculator.stats()["hit_rate"] == 1.0
+
+
+def test_nothing_is_started_for_a_tool_not_marked_read_only():
+    client = FakeDocClient(DOCS, tools=[])
+    speculator = ToolSpeculator()
+
+    async def scenario():
+        speculator.start(client, "What is in plan.md?").discard()
+
+    asyncio.run(scenario())
+    assert client.calls == [] and speculator.stats()["started"] == 0
+
+
+def test_an_edit_drops_the_speculative_read_of_its_doc():
+    client = FakeDocClient(DOCS, tools=[READ_DOC, EDIT_DOC])
+    speculator = ToolSpeculator()
+
+    async def scenario():
+        speculation = speculator.start(client, "Fix plan.md and spec.txt")
+        await speculation.call_tool("edit_document", {"doc_id": "plan.md", "old_str": "a", "new_str": "b"})
+        await speculation.call_tool("read_doc_contents", {"doc_id": "plan.md"})
+        speculation.discard()
+
+    asyncio.run(scenario())
+    assert client.calls[-1] == ("read_doc_contents", {"doc_id": "plan.md"})
+    stats = speculator.stats()
+    assert stats["started"] == 2 and stats["hits"] == 0 and stats["wasted"] == 2
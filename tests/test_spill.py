@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from core.chat import Chat
+from core.spill import SpillStore
+from core.store import ConversationStore
+from fakes import FakeClient, FakeModel, gemini, reply
+
+
+@pytest.fixture
+def spill():
+    store = SpillStore(threshold=1000, preview_bytes=100, fetch_bytes=500)
+    yield store
+    store.close()
+
+
+def handle_of(view):
+    return view.rsplit("handle=", 1)[1].split(" ", 1)[0]
+
+
+def test_small_text_is_passed_through(spill):
+    text = "short"
+    assert spill.put(text) is text
+    assert spill.stats()["spilled"] == 0
+
+
+def test_spilled_text_reads_back_in_full(spill):
+    text = "".join(f"line {i} é\n" for i in range(500))
+    view = spill.put(text)
+
+    assert len(view) < 300 and view.startswith(text[:50])
+    handle = handle_of(view)
+    chunks, offset = [], 0
+    while offset is not None:
+        chunk, offset = spill.read(handle, offset)
+        chunks.append(chunk)
+    assert "".join(chunks) == text
+
+
+def test_fetch_names_the_next_offset(spill):
+    view = spill.put("x" * 2000)
+    handle = handle_of(view)
+    first = spill.fetch({"handle": handle, "offset": 100, "length": 500})
+    assert first.startswith("x" * 500) and "offset=600" in first
+    last = spill.fetch({"handle": handle, "offset": 1900})
+    assert last.endswith(f"[End of {handle}, 2000 bytes]")
+
+
+def test_same_text_is_spilled_once(spill):
+    text = "y" * 5000
+    assert spill.put(text) == spill.put(text)
+    assert spill.stats()["spilled"] == 1
+
+
+def test_handles_of_other_stores_are_unknown(spill):
+    other = SpillStore(threshold=1000)
+    try:
+        handle = handle_of(other.put("z" * 5000))
+    finally:
+        other.close()
+    with pytest.raises(ValueError, match="Unknown tool result handle"):
+        spill.read(handle)
+
+
+def test_large_tool_result_leaves_a_small_message_in_history(spill, tmp_path):
+    result = "The plan. " * 10_000
+    provider = gemini(FakeModel([reply("TOOL_CALL: read_doc_contents:doc_id=plan.md")]), spill_store=spill)
+    store = ConversationStore(str(tmp_path))
+    chat = Chat(provider, {"doc": FakeClient(text=result)}, store=store, spill=spill)
+
+    answer = asyncio.run(chat.run("What is in plan.md?"))
+
+    assert answer == result
+    resident = chat.messages[-1]["content"]
+    assert len(resident) < 500
+    text, _ = spill.read(handle_of(resident), 0, len(result.encode()))
+    assert text == result
+    # The journal keeps the full reply
+    assert list(store.iter_history())[-1]["content"] == result
+    store.close()
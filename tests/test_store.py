@@ -0,0 +1,92 @@
+import os
+
+from core.store import JOURNAL_FILE, ConversationStore, PersistentMessages
+
+
+def turn(i):
+    return [
+        {"role": "user", "content": f"question {i}"},
+        {"role": "assistant", "content": f"answer {i}"},
+    ]
+
+
+def open_session(directory, **kwargs):
+    store = ConversationStore(str(directory), session_id="s", **kwargs)
+    return store, PersistentMessages(store)
+
+
+def test_resumed_session_has_every_message(tmp_path):
+    store, messages = open_session(tmp_path)
+    for i in range(3):
+        messages.extend(turn(i))
+    store.close()
+
+    store, resumed = open_session(tmp_path)
+    assert resumed == [message for i in range(3) for message in turn(i)]
+    assert store.message_count == 6
+
+
+def test_resume_reads_the_snapshot_and_the_journal_after_it(tmp_path):
+    store, messages = open_session(tmp_path, snapshot_every=4)
+    for i in range(5):
+        messages.extend(turn(i))
+    store.close()
+
+    store, resumed = open_session(tmp_path, snapshot_every=4)
+    assert resumed == [message for i in range(5) for message in turn(i)]
+    assert store.message_count == 10
+
+
+def test_old_turns_are_paged_out_but_kept_in_the_journal(tmp_path):
+    store, messages = open_session(tmp_path, resident_messages=4, snapshot_every=3)
+    for i in range(10):
+        messages.extend(turn(i))
+
+    assert len(messages) <= 8
+    assert messages[0]["role"] == "user"
+    assert messages[-2:] == turn(9)
+    assert list(store.iter_history()) == [message for i in range(10) for message in turn(i)]
+    store.close()
+
+    store, resumed = open_session(tmp_path, resident_messages=4, snapshot_every=3)
+    assert resumed[-4:] == turn(8) + turn(9)
+    assert store.message_count == 20
+
+
+def test_torn_journal_line_is_skipped(tmp_path):
+    store, messages = open_session(tmp_path)
+    messages.extend(turn(0))
+    store.close()
+    with open(os.path.join(store.path, JOURNAL_FILE), "ab") as f:
+        f.write(b'{"role": "user", "cont')
+
+    _, resumed = open_session(tmp_path)
+    assert resumed == turn(0)
+
+
+def test_resume_reads_originals_of_replaced_messages(tmp_path):
+    store, messages = open_session(tmp_path, snapshot_every=4)
+    messages.extend(turn(0))
+    # A reply spilled by the memory watchdog, before the next snapshot
+    messages[1] = {"role": "assistant", "content": "[spilled]"}
+    messages.extend(turn(1))
+    messages.append({"role": "user", "content": "question 2"})
+    messages[-1] = {"role": "user", "content": "[spilled]"}
+    store.close()
+
+    _, resumed = open_session(tmp_path, snapshot_every=4)
+    assert resumed == turn(0) + turn(1) + turn(2)[:1]
+
+
+def test_messages_appended_after_a_torn_line_are_readable(tmp_path):
+    store, messages = open_session(tmp_path)
+    messages.extend(turn(0))
+    store.close()
+    with open(os.path.join(store.path, JOURNAL_FILE), "ab") as f:
+        f.write(b'{"role": "user", "cont')
+
+    store, messages = open_session(tmp_path)
+    messages.extend(turn(1))
+    store.close()
+    _, resumed = open_session(tmp_path)
+    assert resumed == turn(0) + turn(1)
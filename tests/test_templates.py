@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from core.templates import PromptTemplate
+from fakes import FakeSession, connected_client
+
+
+def test_render_substitutes_every_placeholder():
+    template = PromptTemplate("Read $doc_id, then ${doc_id}s. Costs $$5.")
+    assert template.names == {"doc_id"}
+    assert template.render(doc_id="plan.md") == "Read plan.md, then plan.mds. Costs $5."
+
+
+def test_render_matches_string_template():
+    from string import Template
+
+    text = "<id>\n$doc_id\n</id> and $other"
+    values = {"doc_id": "a.md", "other": "b"}
+    assert PromptTemplate(text).render(**values) == Template(text).substitute(values)
+
+
+def test_missing_argument_is_named():
+    with pytest.raises(KeyError, match="doc_id"):
+        PromptTemplate("Read $doc_id").render()
+
+
+def test_invalid_placeholder_is_rejected():
+    with pytest.raises(ValueError, match="Invalid placeholder"):
+        PromptTemplate("Costs $5")
+
+
+def test_rendered_prompts_are_cached_until_the_doc_changes():
+    session = FakeSession()
+    client = connected_client(session)
+
+    async def scenario():
+        first = await client.get_prompt("summarize", {"doc_id": "plan.md"})
+        again = await client.get_prompt("summarize", {"doc_id": "plan.md"})
+        assert again is first
+        await client.get_prompt("summarize", {"doc_id": "spec.txt"})
+        client.invalidate_doc("plan.md")
+        await client.get_prompt("summarize", {"doc_id": "plan.md"})
+
+    asyncio.run(scenario())
+    assert [request[2]["doc_id"] for request in session.requests] == ["plan.md", "spec.txt", "plan.md"]
+    assert client.prompt_cache_stats == {"hits": 1, "misses": 3}
@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+from mcp import types
+
+from core.validation import SchemaCompiler, ToolValidators, format_errors
+from core.validation import validators as shared
+from fakes import FakeSession, connected_client
+
+
+class Tool:
+    def __init__(self, name, schema):
+        self.name = name
+        self.inputSchema = schema
+
+
+BULK_EDIT = {
+    "type": "object",
+    "properties": {
+        "operations": {"type": "array", "items": {"$ref": "#/$defs/Operation"}},
+        "dry_run": {"type": "boolean", "default": False},
+    },
+    "required": ["operations"],
+    "$defs": {
+        "Operation": {
+            "type": "object",
+            "properties": {
+                "doc_id": {"type": "string"},
+                "pattern": {"type": "string"},
+                "regex": {"type": "boolean"},
+            },
+            "required": ["doc_id", "pattern"],
+        }
+    },
+}
+
+
+def validate(schema, value):
+    errors = []
+    result = SchemaCompiler(schema).compile(schema)(value, "", errors)
+    return result, errors
+
+
+def test_coerces_values_with_a_clear_intent():
+    schema = {
+        "type": "object",
+        "properties": {"k": {"type": "integer"}, "score": {"type": "number"}, "exact": {"type": "boolean"}},
+    }
+    result, errors = validate(schema, {"k": "3", "score": "0.5", "exact": "yes"})
+    assert errors == []
+    assert result == {"k": 3, "score": 0.5, "exact": True}
+
+
+def test_rejects_booleans_for_integers():
+    _, errors = validate({"type": "integer"}, True)
+    assert errors == [{"path": "arguments", "error": "expected an integer, got a boolean"}]
+
+
+def test_reports_every_problem_with_its_path():
+    _, errors = validate(BULK_EDIT, {"operations": [{"doc_id": "plan.md"}, {"pattern": "x", "regex": "maybe"}], "extra": 1})
+    paths = sorted(error["path"] for error in errors)
+    assert paths == ["extra", "operations[0].pattern", "operations[1].doc_id", "operations[1].regex"]
+
+
+def test_parses_json_text_for_arrays_and_objects():
+    operations = [{"doc_id": "plan.md", "pattern": "a"}]
+    result, errors = validate(BULK_EDIT, {"operations": json.dumps(operations)})
+    assert errors == []
+    assert result["operations"] == operations
+
+
+def test_enum_and_any_of():
+    schema = {"anyOf": [{"type": "integer"}, {"type": "string", "enum": ["all"]}]}
+    assert validate(schema, "4") == (4, [])
+    assert validate(schema, "all") == ("all", [])
+    _, errors = validate(schema, "some")
+    assert len(errors) == 1
+
+
+def test_recursive_refs_terminate():
+    schema = {
+        "$ref": "#/$defs/Node",
+        "$defs": {
+            "Node": {
+                "type": "object",
+                "properties": {"name": {"type": "string"}, "children": {"type": "array", "items": {"$ref": "#/$defs/Node"}}},
+            }
+        },
+    }
+    tree = {"name": "root", "children": [{"name": "leaf", "children": []}]}
+    assert validate(schema, tree) == (tree, [])
+
+
+def test_validators_are_cached_per_tool_until_invalidated():
+    validators = ToolValidators()
+    tool = Tool("bulk_edit", BULK_EDIT)
+    validators.validate(tool, {"operations": []})
+    validators.validate(tool, {"operations": []})
+    assert validators.stats["compiled"] == 1
+
+    changed = Tool("bulk_edit", {**BULK_EDIT, "required": []})
+    validators.invalidate([changed.name])
+    _, errors = validators.validate(changed, {})
+    assert errors == []
+    assert validators.stats["compiled"] == 2
+
+
+def test_listing_tools_invalidates_their_validators():
+    tool = types.Tool(name="only_once", inputSchema={"type": "object", "properties": {}})
+    shared.validate(tool, {})
+    compiled = shared.stats["compiled"]
+    asyncio.run(connected_client(FakeSession([tool])).list_tools(refresh=True))
+    shared.validate(tool, {})
+    assert shared.stats["compiled"] == compiled + 1
+
+
+def test_tools_without_a_schema_pass_arguments_through():
+    arguments, errors = ToolValidators().validate(Tool("anything", None), {"x": 1})
+    assert arguments == {"x": 1}
+    assert errors == []
+
+
+def test_format_errors_names_the_tool():
+    text = format_errors("bulk_edit", [{"path": "operations", "error": "required parameter is missing"}])
+    payload = json.loads(text)
+    assert "bulk_edit" in payload["error"]
+    assert payload["details"][0]["path"] == "operations"